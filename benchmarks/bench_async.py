@@ -0,0 +1,131 @@
+"""Idle cost and per-line overhead: threaded SerialController versus the asyncio transport.
+
+Each case reads a pseudo-terminal fed by a separate process, so only the
+receiving side is charged to this process. Reported per case: CPU time per
+wall-clock second (100 % = one core) and reads of the port per second,
+idle and with telemetry lines arriving at each rate, and the CPU cost per
+received line. The threaded controller and AsyncBridge are drained on a
+16 ms tick like the GUI; the asyncio case consumes `lines()` one line at a
+time. POSIX only. Run from the repository root:
+
+    python benchmarks/bench_async.py
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import tty
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stm32_async import AsyncBridge, AsyncSerialController
+from stm32_serial import SerialController
+
+FEEDER = '''
+import os, sys, time
+rate, fd = float(sys.argv[1]), int(sys.argv[2])
+line = b'S:' + b','.join(b'%d' % (2048 + k * 37) for k in range(8)) + b'\\n'
+start, sent = time.perf_counter(), 0
+while True:
+    due = int((time.perf_counter() - start) * rate)
+    if due > sent:
+        os.write(fd, line * (due - sent))
+        sent = due
+    time.sleep(0.002)
+'''
+
+
+def start_feeder(master, rate):
+    if not rate:
+        return None
+    return subprocess.Popen([sys.executable, '-c', FEEDER, str(rate), str(master)], pass_fds=[master])
+
+
+def run_threaded(port, duration, bridge=False):
+    """CPU %, lines received and port reads for a controller drained on a 16 ms tick."""
+    ctrl = AsyncBridge() if bridge else SerialController()
+    ctrl.connect(port)
+    reads = [0]
+    if not bridge:
+        # Count the reader thread's wakeups: every pass of its loop reads the port once
+        ser, read = ctrl.ser, ctrl.ser.read
+
+        def counted_read(size=1):
+            reads[0] += 1
+            return read(size)
+        ser.read = counted_read
+    time.sleep(0.2)
+    ctrl.get_data()
+    start_reads = reads[0] if not bridge else ctrl.core.reads
+    lines = 0
+    start_cpu, start = time.process_time(), time.perf_counter()
+    while time.perf_counter() - start < duration:
+        lines += len(ctrl.get_data())
+        time.sleep(0.016)
+    elapsed = time.perf_counter() - start
+    cpu = (time.process_time() - start_cpu) / elapsed * 100
+    port_reads = (reads[0] if not bridge else ctrl.core.reads) - start_reads
+    if bridge:
+        ctrl.close()
+    else:
+        ctrl.disconnect()
+    return cpu, lines, port_reads / elapsed
+
+
+def run_async(port, duration):
+    async def main():
+        ctrl = AsyncSerialController()
+        await ctrl.connect(port)
+        await asyncio.sleep(0.2)
+        if ctrl._lines:
+            await ctrl.read_lines()  # Drop what arrived while settling, like get_data() above
+        start_reads, lines = ctrl.reads, 0
+
+        async def consume():
+            nonlocal lines
+            async for _ in ctrl.lines():
+                lines += 1
+        consumer = asyncio.get_running_loop().create_task(consume())
+        start_cpu, start = time.process_time(), time.perf_counter()
+        await asyncio.sleep(duration)
+        elapsed = time.perf_counter() - start
+        cpu = (time.process_time() - start_cpu) / elapsed * 100
+        consumer.cancel()
+        await ctrl.disconnect()
+        return cpu, lines, (ctrl.reads - start_reads) / elapsed
+    return asyncio.run(main())
+
+
+CASES = {
+    'threads': lambda port, duration: run_threaded(port, duration),
+    'asyncio': run_async,
+    'bridge': lambda port, duration: run_threaded(port, duration, bridge=True),
+}
+
+
+def measure(case, rate, duration):
+    master, slave = os.openpty()
+    tty.setraw(master)
+    feeder = start_feeder(master, rate)
+    try:
+        return CASES[case](os.ttyname(slave), duration)
+    finally:
+        if feeder is not None:
+            feeder.kill()
+            feeder.wait()
+        os.close(master)
+        os.close(slave)
+
+
+def main(rates=(0, 1000, 20000), duration=2.0):
+    print(f"{'transport':>9} {'lines/s':>7} {'CPU %':>7} {'reads/s':>8} {'received/s':>10} {'us CPU/line':>11}")
+    for rate in rates:
+        for case in CASES:
+            cpu, lines, reads_per_s = measure(case, rate, duration)
+            per_line = cpu / 100 * duration / lines * 1e6 if lines else float('nan')
+            print(f'{case:>9} {rate:>7} {cpu:>7.2f} {reads_per_s:>8.0f} {lines / duration:>10.0f} {per_line:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
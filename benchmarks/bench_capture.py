@@ -0,0 +1,106 @@
+"""Cost of teeing serial traffic to disk with CaptureRecorder, and of replaying it.
+
+Reports the time a `record()` call adds to the reader thread and the
+sustained write throughput for each compression setting, then the index
+build time, seek time and as-fast-as-possible throughput of ReplayPort
+(raw reads, and reads decoded by the ASCII codec), using
+telemetry-like chunks (very repetitive, so compression ratios are
+optimistic). Run from the repository root:
+
+    python benchmarks/bench_capture.py
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stm32_capture import RX, CaptureReader, CaptureRecorder, ReplayPort, zstandard
+from stm32_serial import AsciiCodec
+
+
+def telemetry_chunk(size=4096):
+    line = b'S:' + b','.join(str(2048 + (k * 37) % 2000).encode() for k in range(32)) + b'\n'
+    return (line * (size // len(line) + 1))[:size]
+
+
+def bench(compression, total_mb=64, chunk_size=4096):
+    directory = tempfile.mkdtemp()
+    chunk = telemetry_chunk(chunk_size)
+    count = total_mb * (1 << 20) // chunk_size
+    # Room for the whole burst, so the writer's throughput is measured rather than the drop path
+    recorder = CaptureRecorder(directory, compression=compression, max_bytes=16 << 20,
+                               max_pending=(total_mb + 1) << 20).start()
+    start = time.perf_counter()
+    for _ in range(count):
+        recorder.record(RX, chunk)
+    record_us = (time.perf_counter() - start) / count * 1e6
+    recorder.stop(timeout=60)
+    elapsed = time.perf_counter() - start
+    stats = recorder.stats()
+    on_disk = sum(os.path.getsize(path) for path in recorder.files)
+    shutil.rmtree(directory)
+    return record_us, stats['bytes'] / elapsed / 1e6, on_disk, stats
+
+
+def bench_replay(total_mb=256, chunk_size=4096):
+    directory = tempfile.mkdtemp()
+    chunk = telemetry_chunk(chunk_size)
+    count = total_mb * (1 << 20) // chunk_size
+    recorder = CaptureRecorder(directory, max_bytes=1 << 40, max_pending=64 << 20).start()
+    for i in range(count):
+        # Keep the writer's queue bounded while building the file
+        while not recorder.record(RX, chunk, recorder.started + i * 0.001):
+            time.sleep(0.01)
+    recorder.stop(timeout=60)
+    path = recorder.path
+
+    start = time.perf_counter()
+    reader = CaptureReader(path)
+    index_ms = (time.perf_counter() - start) * 1000
+    positions = [random.uniform(0, reader.duration) for _ in range(10000)]
+    start = time.perf_counter()
+    for seconds in positions:
+        reader.index_at(seconds)
+    seek_us = (time.perf_counter() - start) / len(positions) * 1e6
+    reader.close()
+
+    results = []
+    for decode in (False, True):
+        port, codec, lines = ReplayPort(path, speed=0), AsciiCodec(), 0
+        start = time.perf_counter()
+        while True:
+            data = port.read(port.in_waiting or 1)
+            if not data:
+                break
+            if decode:
+                lines += len(codec.decode(data))
+        elapsed = time.perf_counter() - start
+        results.append((port.bytes_read / elapsed / 1e6, lines / elapsed))
+        port.close()
+    shutil.rmtree(directory)
+    return total_mb, count, index_ms, seek_us, results
+
+
+def main():
+    print(f"{'compression':>11} {'record us':>9} {'MB/s':>7} {'ratio':>6} {'files':>5} {'dropped':>7}")
+    for compression in (None, 'gzip', 'zstd'):
+        if compression == 'zstd' and zstandard is None:
+            print(f"{'zstd':>11}  (zstandard not installed)")
+            continue
+        record_us, throughput, on_disk, stats = bench(compression)
+        ratio = stats['bytes'] / on_disk if on_disk else 0
+        print(f'{str(compression):>11} {record_us:>9.2f} {throughput:>7.1f} {ratio:>6.1f} '
+              f"{stats['files']:>5} {stats['dropped']:>7}")
+
+    total_mb, records, index_ms, seek_us, ((raw_mb_s, _), (decoded_mb_s, lines_s)) = bench_replay()
+    print(f'\nReplay of a {total_mb} MB uncompressed capture ({records} records):')
+    print(f'  index build {index_ms:.0f} ms, seek {seek_us:.2f} us')
+    print(f'  raw reads {raw_mb_s:.0f} MB/s, ASCII decoded {decoded_mb_s:.1f} MB/s ({lines_s:.0f} lines/s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Throughput of each wire codec, plus a round trip through pyserial's loop:// port.
+
+Run from the repository root:
+
+    python benchmarks/bench_codecs.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serial
+
+from stm32_serial import CODECS, CobsCrcCodec
+
+
+def telemetry_stream(codec, frames, samples_per_frame=32):
+    """Encoded MCU telemetry: sample frames interleaved with acks."""
+    chunks = []
+    for i in range(frames):
+        samples = [(i * 7 + k * 13) % 4096 - 2048 for k in range(samples_per_frame)]
+        if isinstance(codec, CobsCrcCodec):
+            chunks.append(codec.encode_samples(samples))
+        else:
+            chunks.append(codec.encode_text('S:' + ','.join(map(str, samples)) + '\n'))
+        if i % 100 == 0:
+            chunks.append(codec.encode_text(f'OK A050F{i % 1000:04d}\n'))
+    return b''.join(chunks)
+
+
+def bench_decode(name, frames=5000, chunk_size=4096):
+    stream = telemetry_stream(CODECS[name](), frames)
+    codec = CODECS[name]()
+    start = time.perf_counter()
+    lines = 0
+    for i in range(0, len(stream), chunk_size):
+        lines += len(codec.decode(stream[i:i + chunk_size]))
+    elapsed = time.perf_counter() - start
+    return len(stream), lines, elapsed, codec.stats.errors
+
+
+def loopback_round_trip(name):
+    """Write a burst through loop:// and check every frame decodes intact."""
+    port = serial.serial_for_url('loop://', timeout=0.1)
+    encoder, decoder = CODECS[name](), CODECS[name]()
+    expected = [f'A{amp:03d}F{freq:04d}' for amp, freq in ((0, 1), (50, 100), (100, 1000))]
+    for line in expected:
+        port.write(encoder.encode_command(int(line[1:4]), int(line[5:9])))
+    received = []
+    while len(received) < len(expected):
+        data = port.read(port.in_waiting or 1)
+        if not data:
+            break
+        received += decoder.decode(data)
+    port.close()
+    return received == expected
+
+
+def main():
+    print(f"{'codec':>6} {'bytes':>9} {'lines':>7} {'MB/s':>7} {'lines/s':>10} {'errors':>6} {'loop://':>8}")
+    for name in CODECS:
+        size, lines, elapsed, errors = bench_decode(name)
+        ok = 'ok' if loopback_round_trip(name) else 'FAIL'
+        print(f'{name:>6} {size:>9} {lines:>7} {size / elapsed / 1e6:>7.2f} {lines / elapsed:>10.0f} {errors:>6} {ok:>8}')
+
+
+if __name__ == '__main__':
+    main()
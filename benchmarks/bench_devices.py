@@ -0,0 +1,96 @@
+"""CPU cost of reading N boards: one SerialController each versus one DeviceManager.
+
+Every board is a pseudo-terminal fed by a separate process, so only the
+reading side is charged to this process. Each case reports the CPU time
+per wall-clock second (100 % = one core), idle and with every board
+sending telemetry lines at `rate` lines/s. POSIX only. Run from the
+repository root:
+
+    python benchmarks/bench_devices.py
+"""
+import os
+import subprocess
+import sys
+import time
+import tty
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stm32_serial import DeviceManager, SerialController
+
+FEEDER = '''
+import os, sys, time
+rate, fds = float(sys.argv[1]), [int(fd) for fd in sys.argv[2:]]
+line = b'S:' + b','.join(b'%d' % (2048 + k * 37) for k in range(32)) + b'\\n'
+start, sent = time.perf_counter(), 0
+while True:
+    due = int((time.perf_counter() - start) * rate)
+    if due > sent:
+        for fd in fds:
+            os.write(fd, line * (due - sent))
+        sent = due
+    time.sleep(0.005)
+'''
+
+
+def open_boards(count):
+    masters, slaves = [], []
+    for _ in range(count):
+        master, slave = os.openpty()
+        tty.setraw(master)
+        masters.append(master)
+        slaves.append(slave)
+    return masters, slaves
+
+
+def cpu_percent(duration):
+    start_cpu, start = time.process_time(), time.perf_counter()
+    time.sleep(duration)
+    return (time.process_time() - start_cpu) / (time.perf_counter() - start) * 100
+
+
+def measure(count, mode, rate, duration):
+    masters, slaves = open_boards(count)
+    names = [os.ttyname(slave) for slave in slaves]
+    if mode == 'threads':
+        ctrls = [SerialController() for _ in names]
+        for ctrl, name in zip(ctrls, names):
+            ctrl.connect(name)
+        drain = lambda: sum(len(ctrl.get_data()) for ctrl in ctrls)
+    else:
+        manager = DeviceManager()
+        for name in names:
+            manager.add(name)
+        drain = lambda: sum(len(lines) for lines in manager.get_data().values())
+    feeder = None
+    if rate:
+        feeder = subprocess.Popen([sys.executable, '-c', FEEDER, str(rate)] + [str(fd) for fd in masters],
+                                  pass_fds=masters)
+    time.sleep(0.2)
+    drain()
+    cpu = cpu_percent(duration)
+    lines = drain()
+    if feeder is not None:
+        feeder.kill()
+        feeder.wait()
+    if mode == 'threads':
+        for ctrl in ctrls:
+            ctrl.disconnect()
+    else:
+        manager.close()
+    for fd in masters + slaves:
+        os.close(fd)
+    return cpu, lines / duration / count
+
+
+def main(counts=(1, 4, 8, 16), rate=1000, duration=2.0):
+    print(f"{'boards':>6} {'reader':>8} {'idle CPU %':>10} {'busy CPU %':>10} {'per board %':>11} {'lines/s/board':>13}")
+    for count in counts:
+        for mode in ('threads', 'manager'):
+            idle, _ = measure(count, mode, 0, duration)
+            busy, lines_per_s = measure(count, mode, rate, duration)
+            print(f'{count:>6} {mode:>8} {idle:>10.2f} {busy:>10.2f} {busy / count:>11.2f} {lines_per_s:>13.0f}')
+
+
+if __name__ == '__main__':
+    main()
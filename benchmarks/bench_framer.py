@@ -0,0 +1,63 @@
+"""Micro-benchmark: LineFramer vs. the original `buffer += data` / split loop.
+
+Run from the repository root:
+
+    python benchmarks/bench_framer.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stm32_serial import LineFramer
+
+
+def legacy_frame(chunks):
+    """The framing loop `_read_serial` used before LineFramer."""
+    lines = []
+    buffer = b''
+    for data in chunks:
+        buffer += data
+        while b'\n' in buffer:
+            line, buffer = buffer.split(b'\n', 1)
+            lines.append(line)
+    return lines
+
+
+def framer_frame(chunks):
+    framer = LineFramer()
+    lines = []
+    for data in chunks:
+        lines.extend(framer.feed(data))
+    return lines
+
+
+def make_chunks(line_count, line_length, chunk_size):
+    """Synthetic telemetry stream cut into fixed-size reads."""
+    line = (b'S:' + b'1234,' * line_length)[:line_length] + b'\n'
+    stream = line * line_count
+    return [stream[i:i + chunk_size] for i in range(0, len(stream), chunk_size)]
+
+
+def main():
+    cases = [
+        # (lines, line length, read size)
+        (1000, 16, 64),
+        (1000, 16, 4096),
+        (10000, 16, 4096),
+        (10000, 64, 16384),
+        (10000, 16, 65536),
+    ]
+    print(f"{'lines':>6} {'len':>4} {'chunk':>6} {'legacy ms':>10} {'framer ms':>10} {'speedup':>8}")
+    for line_count, line_length, chunk_size in cases:
+        chunks = make_chunks(line_count, line_length, chunk_size)
+        assert legacy_frame(chunks) == framer_frame(chunks)
+        runs = 5
+        legacy = min(timeit.repeat(lambda: legacy_frame(chunks), number=1, repeat=runs)) * 1000
+        framer = min(timeit.repeat(lambda: framer_frame(chunks), number=1, repeat=runs)) * 1000
+        print(f'{line_count:>6} {line_length:>4} {chunk_size:>6} {legacy:>10.2f} {framer:>10.2f} {legacy / framer:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
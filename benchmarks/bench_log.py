@@ -0,0 +1,65 @@
+"""Appending to, searching and filtering the monitor's LogStore (stm32_log) as the log grows.
+
+For logs of increasing size, made of received telemetry lines with a sent
+command every 100 lines, reports: append throughput in 100-line ticks,
+memory per line, a search that finds nothing (the whole log is scanned)
+ignoring case, matching case and as a regex, a backward search, filters
+by tag, by text and by both, and fetching the 40 rows a view shows. The
+last column repeats the case-insensitive scan over a plain list of
+strings, for reference. Run from the repository root:
+
+    python benchmarks/bench_log.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stm32_log import LogFilter, LogStore, compile_pattern
+
+
+def build(lines):
+    received = [(f'⬅️ Received: S:{2048 + k},{k * 3},{k * 7}\n', 'received') for k in range(99)]
+    store = LogStore(max_lines=lines)
+    start = time.perf_counter()
+    for tick in range(lines // 100):
+        store.extend(received + [(f'➡️ Transmitted: A050F{tick % 10000:04d}\n', 'sent')])
+    return store, time.perf_counter() - start
+
+
+def timed_ms(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(sizes=(10000, 100000, 1000000)):
+    columns = ['lines', 'append/s', 'B/line', 'miss Aa', 'miss aa', 'regex', 'back', 'tag', 'text',
+               'tag+text', 'rows', 'list scan']
+    print(' '.join(f'{c:>9}' for c in columns) + '   (times in ms)')
+    for lines in sizes:
+        store, elapsed = build(lines)
+        miss_ci, miss_cs = compile_pattern('zzz'), compile_pattern('zzz', ignore_case=False)
+        regex = compile_pattern(r'F99\d9$', regex=True)
+        texts = [store.line(number)[0] for number in range(store.first, store.end)]
+        row = [
+            lines, lines / elapsed, store.nbytes / len(store),
+            timed_ms(lambda: store.search(miss_ci, store.first)),
+            timed_ms(lambda: store.search(miss_cs, store.first)),
+            timed_ms(lambda: store.search(regex, store.first)),
+            timed_ms(lambda: store.search(miss_cs, store.end, backward=True)),
+            timed_ms(lambda: LogFilter(store, tags=['sent']).update()),
+            timed_ms(lambda: LogFilter(store, compile_pattern('transmitted')).update()),
+            timed_ms(lambda: LogFilter(store, compile_pattern('s:2050,'), ['received']).update()),
+            timed_ms(lambda: store.get(range(store.end - 40, store.end))),
+            timed_ms(lambda: [text for text in texts if 'zzz' in text.lower()]),
+        ]
+        print(f'{row[0]:>9} {row[1]:>9.0f} {row[2]:>9.1f} ' + ' '.join(f'{value:>9.2f}' for value in row[3:]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Duty-table generation and upload cost for every baud rate the GUI offers.
+
+Generation is timed uncached and cached. Upload is timed through a real
+SerialController on pyserial's loop:// port (host-side cost) and
+reported as wire time at each baud rate (8N1, 10 bits per byte) for the
+bulk format and for the equivalent one-line-per-entry ASCII upload.
+Run from the repository root:
+
+    python benchmarks/bench_lut.py
+"""
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stm32_dsp
+from stm32_serial import BAUDRATES, CODECS, SerialController
+
+
+def generation_us(length, bits):
+    uncached = stm32_dsp.duty_table.__wrapped__
+    runs = 200
+    cold = min(timeit.repeat(lambda: uncached(75, length, bits, 8), number=runs, repeat=3)) / runs
+    stm32_dsp.duty_table(75, length, bits, 8)
+    warm = min(timeit.repeat(lambda: stm32_dsp.duty_table(75, length, bits, 8), number=runs, repeat=3)) / runs
+    return cold * 1e6, warm * 1e6
+
+
+def loopback_upload_ms(table, codec_name):
+    """Host-side time to push one table through the writer thread on loop://."""
+    ctrl = SerialController(CODECS[codec_name]())
+    ctrl.connect('loop://')
+    expected = len(ctrl.codec.encode_table(table, 12))
+    ctrl.codec.reset()
+    start = time.perf_counter()
+    ctrl.upload_table(table, 12)
+    while ctrl.codec.stats.bytes_in < expected and time.perf_counter() - start < 5:
+        time.sleep(0.0005)
+    elapsed = (time.perf_counter() - start) * 1000
+    ctrl.disconnect()
+    return elapsed, expected
+
+
+def main():
+    print('Generation (A=75 %, dead time 8):')
+    print(f"{'length':>7} {'bits':>4} {'uncached us':>12} {'cached us':>10}")
+    for length in (64, 256, 1024, 4096):
+        for bits in (8, 12, 16):
+            cold, warm = generation_us(length, bits)
+            print(f'{length:>7} {bits:>4} {cold:>12.1f} {warm:>10.2f}')
+
+    print('\nUpload of one table (12 bits):')
+    header = ' '.join(f'{baud:>9}' for baud in BAUDRATES)
+    print(f"{'length':>7} {'format':>12} {'bytes':>6} {'loop ms':>8}  wire ms @ {header}")
+    for length in (256, 1024, 4096):
+        table = stm32_dsp.duty_table(75, length, 12, 8)
+        line_bytes = sum(len(f'D{value:05d}\n') for value in table)
+        for name in CODECS:
+            host_ms, size = loopback_upload_ms(table, name)
+            wire = ' '.join(f'{size * 10 / baud * 1000:>9.1f}' for baud in BAUDRATES)
+            print(f'{length:>7} {name + " bulk":>12} {size:>6} {host_ms:>8.2f}            {wire}')
+        wire = ' '.join(f'{line_bytes * 10 / baud * 1000:>9.1f}' for baud in BAUDRATES)
+        print(f'{length:>7} {"ascii lines":>12} {line_bytes:>6} {"-":>8}            {wire}')
+
+
+if __name__ == '__main__':
+    main()
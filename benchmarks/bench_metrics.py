@@ -0,0 +1,93 @@
+"""Overhead of the pipeline metrics (stm32_metrics) on the read path, and the cost of a scrape.
+
+Reports the cost of each metric operation, then the time the metric
+updates add to each read handled by SerialController._handle_rx() for
+several read sizes: as a share of the whole read (decode and queue
+included), and as CPU when 2 Mbaud arrive in reads of that size. Last,
+how long rendering the Prometheus text and a JSON snapshot takes with 16
+boards registered. Run from the repository root:
+
+    python benchmarks/bench_metrics.py
+"""
+import json
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stm32_metrics import PipelineMetrics, Registry
+from stm32_serial import SerialController
+
+
+def ns_per_call(statement, number=200000):
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number * 1e9
+
+
+def bench_ops():
+    registry = Registry()
+    counter = registry.counter('c')
+    gauge = registry.gauge('g')
+    histogram = registry.histogram('h')
+    return [
+        ('Counter.inc()', ns_per_call(lambda: counter.inc(3))),
+        ('Gauge.set()', ns_per_call(lambda: gauge.set(3))),
+        ('Histogram.observe()', ns_per_call(lambda: histogram.observe(0.003))),
+    ]
+
+
+def bench_read_path(read_size, reads=20000):
+    line = b'S:' + b','.join(b'%d' % (2048 + k * 37) for k in range(32)) + b'\n'
+    stream = line * (read_size * reads // len(line) + 1)
+    chunks = [stream[i:i + read_size] for i in range(0, read_size * reads, read_size)]
+    ctrl = SerialController(metrics=PipelineMetrics(Registry()))
+
+    def handle():
+        for chunk in chunks:
+            ctrl._handle_rx(chunk, 0.0)
+        ctrl.get_data()
+
+    def count():
+        for chunk in chunks:
+            ctrl._count_rx(chunk, 1, 0)
+    handle_ns = min(timeit.repeat(handle, number=1, repeat=5)) / reads * 1e9
+    count_ns = min(timeit.repeat(count, number=1, repeat=5)) / reads * 1e9
+    return handle_ns, count_ns
+
+
+def bench_scrape(boards=16):
+    registry = Registry()
+    for index in range(boards):
+        metrics = PipelineMetrics(registry, device=f'/dev/ttyACM{index}')
+        for value in (1, 100, 4000):
+            metrics.read_sizes.observe(value)
+            metrics.rtt.observe(value / 1e6)
+    start = time.perf_counter()
+    text = registry.render_prometheus()
+    prometheus_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    snapshot = json.dumps(registry.snapshot())
+    json_ms = (time.perf_counter() - start) * 1000
+    return boards, prometheus_ms, len(text), json_ms, len(snapshot)
+
+
+def main():
+    print(f"{'operation':<22} {'ns':>6}")
+    for name, ns in bench_ops():
+        print(f'{name:<22} {ns:>6.0f}')
+
+    print(f"\n{'read bytes':>10} {'read ns':>9} {'metrics ns':>10} {'share':>6} {'CPU at 2 Mbaud':>14}")
+    for read_size in (16, 256, 4096):
+        handle_ns, count_ns = bench_read_path(read_size)
+        reads_per_s = 200000 / read_size  # 2 Mbaud, 10 bits per byte
+        print(f'{read_size:>10} {handle_ns:>9.0f} {count_ns:>10.0f} {count_ns / handle_ns * 100:>5.1f}% '
+              f'{count_ns * reads_per_s / 1e9 * 100:>13.3f}%')
+
+    boards, prometheus_ms, text_size, json_ms, json_size = bench_scrape()
+    print(f'\nScrape with {boards} boards: Prometheus text {prometheus_ms:.2f} ms ({text_size} bytes), '
+          f'JSON snapshot {json_ms:.2f} ms ({json_size} bytes)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+"""Per-stage and end-to-end benchmarks of the serial -> GUI pipeline.
+
+Stages, each measured on its own:
+
+    decode      codec.decode() of telemetry reads, the work `_read_serial` does
+    handoff     LineBatchQueue.put_batch() on a reader thread while a consumer drains
+    drain       SerialController.get_data() with a given number of lines queued
+    render      App._render_to_monitor(): append to the LogStore and redraw the LogView
+                rows (on a Tk Text widget, or fetched only without a display)
+    end_to_end  SerialController on the in-process firmware emulator, read by a 16 ms
+                GUI-like tick that formats, renders and measures arrival-to-render latency
+
+Results can be written as JSON and two result files compared; a metric that
+got worse by more than the threshold is reported and makes the exit status 1.
+Run from the repository root:
+
+    python benchmarks/bench_pipeline.py [--quick] [--json results.json]
+    python benchmarks/bench_pipeline.py --compare before.json after.json [--threshold 10]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stm32_emulator import FirmwareEmulator
+from stm32_log import LogStore
+from stm32_serial import CODECS, LineBatchQueue, SerialController, percentile
+from stm32_serial_gui import TRANSLATIONS, App, LogView
+
+
+# --- Helpers ---
+def telemetry_stream(codec_name, samples_per_line, lines):
+    """What the emulator would send: `lines` telemetry lines, encoded."""
+    emulator = FirmwareEmulator(codec=codec_name, sample_rate=1000 * samples_per_line,
+                                samples_per_line=samples_per_line, baud=0)
+    emulator.start(now=0.0)
+    stream = bytearray()
+    for second in range(1, lines // 1000 + 1):  # 1000 lines at a time stays under the emulator's backlog
+        stream += emulator.read(1 << 30, now=float(second))
+    return bytes(stream)
+
+
+ROWS = 40  # Rows a monitor view shows
+
+
+class StubView:
+    """The part of LogView the monitor uses, for machines without a display: fetches the rows on screen."""
+    def __init__(self, store):
+        self.store = store
+        self.rows = []
+
+    def refresh(self):
+        end = self.store.end
+        self.rows = self.store.get(range(max(self.store.first, end - ROWS), end))
+
+
+class MonitorHost:
+    """Runs the App's monitor rendering methods against a log store and a single view."""
+    _render_to_monitor = App._render_to_monitor
+    _refresh_log = App._refresh_log
+
+    def __init__(self, make_view):
+        self.log_store = LogStore()
+        self.log_filter = None
+        self.log_view = make_view(self.log_store)
+
+
+def make_monitor():
+    """A MonitorHost on a LogView in a (withdrawn) Tk window if there is a display, else on StubView."""
+    try:
+        import tkinter as tk
+        from tkinter import font as tkfont
+        root = tk.Tk()
+        root.withdraw()
+    except Exception:
+        return MonitorHost(StubView), 'stub'
+
+    def make_view(store):
+        view = LogView(root, store, tkfont.nametofont('TkFixedFont'))
+        view.rows = lambda: ROWS  # Never mapped, so it has no height to fit rows to
+        return view
+    return MonitorHost(make_view), 'tk'
+
+
+def result(stage, params, **metrics):
+    return {'stage': stage, 'params': params, 'metrics': {k: round(v, 4) for k, v in metrics.items()}}
+
+
+# --- Stages ---
+def bench_decode(codec_name, samples_per_line, read_size, lines=20000):
+    stream = telemetry_stream(codec_name, samples_per_line, lines)
+    chunks = [stream[i:i + read_size] for i in range(0, len(stream), read_size)]
+    best = None
+    for _ in range(3):
+        codec = CODECS[codec_name]()
+        decoded = 0
+        start = time.perf_counter()
+        for chunk in chunks:
+            decoded += len(codec.decode(chunk))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result('decode', {'codec': codec_name, 'samples_per_line': samples_per_line, 'read_size': read_size},
+                  mb_per_s=len(stream) / best / 1e6, lines_per_s=decoded / best)
+
+
+def bench_handoff(batch_size, lines=200000):
+    batch = [(0.0, 'S:1,2,3')] * batch_size
+    batches = lines // batch_size
+    queue = LineBatchQueue(capacity=lines)
+    consumed = 0
+
+    def produce():
+        for _ in range(batches):
+            queue.put_batch(batch)
+
+    start = time.perf_counter()
+    producer = threading.Thread(target=produce)
+    producer.start()
+    while consumed < batches * batch_size:
+        drained = queue.drain()
+        consumed += len(drained)
+        if not drained:
+            time.sleep(0.0005)
+    elapsed = time.perf_counter() - start
+    producer.join()
+    return result('handoff', {'batch_size': batch_size}, lines_per_s=consumed / elapsed, dropped=queue.dropped)
+
+
+def bench_drain(queued, runs=50):
+    ctrl = SerialController()
+    batch = [(0.0, 'S:1,2,3')] * queued
+    costs = []
+    for _ in range(runs):
+        ctrl.data_queue.put_batch(batch)
+        start = time.perf_counter()
+        ctrl.get_data()
+        costs.append((time.perf_counter() - start) * 1e6)
+    costs.sort()
+    return result('drain', {'queued': queued}, drain_us_p50=percentile(costs, 50),
+                  ns_per_line=percentile(costs, 50) * 1000 / queued)
+
+
+def bench_render(monitor, renderer, lines_per_tick, samples_per_line, ticks=200):
+    line = 'S:' + ','.join(['2048'] * samples_per_line)
+    records = [(TRANSLATIONS['en']['received'].format(line=line), 'received')] * lines_per_tick
+    costs = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        monitor._render_to_monitor(records)
+        costs.append((time.perf_counter() - start) * 1000)
+    costs.sort()
+    return result('render', {'renderer': renderer, 'lines_per_tick': lines_per_tick,
+                             'samples_per_line': samples_per_line},
+                  ms_p50=percentile(costs, 50), ms_p99=percentile(costs, 99),
+                  lines_per_s=lines_per_tick / (sum(costs) / len(costs) / 1000))
+
+
+def bench_end_to_end(monitor, renderer, baud, samples_per_line, line_rate, duration, tick=0.016):
+    """Emulator -> reader thread -> queue -> 16 ms tick -> render, with latency per line."""
+    sample_rate = 1e7 if line_rate == 'max' else line_rate * samples_per_line
+    url = f'emulator://?baud={baud}&sample_rate={sample_rate}&samples_per_line={samples_per_line}'
+    ctrl = SerialController()
+    ctrl.connect(url)
+    received = TRANSLATIONS['en']['received']
+    latencies, ticks, lines = [], [], 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        tick_start = time.perf_counter()
+        data_lines = ctrl.get_data()
+        if data_lines:
+            monitor._render_to_monitor([(received.format(line=line), 'received') for _, line in data_lines])
+            rendered = time.perf_counter()
+            latencies.extend((rendered - arrived) * 1000 for arrived, _ in data_lines)
+            lines += len(data_lines)
+        ticks.append((time.perf_counter() - tick_start) * 1000)
+        time.sleep(max(tick - (time.perf_counter() - tick_start), 0))
+    elapsed = time.perf_counter() - start
+    rx_bytes = ctrl.codec.stats.bytes_in
+    emulator = ctrl.ser.emulator
+    ctrl.disconnect()
+    latencies.sort()
+    ticks.sort()
+    return result('end_to_end', {'renderer': renderer, 'baud': baud, 'samples_per_line': samples_per_line,
+                                 'line_rate': line_rate},
+                  lines_per_s=lines / elapsed, rx_mb_per_s=rx_bytes / elapsed / 1e6,
+                  link_utilization=rx_bytes / elapsed / (baud / 10),
+                  latency_ms_p50=percentile(latencies, 50), latency_ms_p99=percentile(latencies, 99),
+                  tick_ms_p99=percentile(ticks, 99), dropped_lines=ctrl.dropped_lines,
+                  overruns=emulator.overruns)
+
+
+def run_suite(quick=False):
+    results = []
+    for codec_name in CODECS:
+        for samples_per_line in (1, 8, 32):
+            for read_size in (64, 4096):
+                results.append(bench_decode(codec_name, samples_per_line, read_size, 5000 if quick else 20000))
+    for batch_size in (1, 32, 512):
+        results.append(bench_handoff(batch_size, 50000 if quick else 200000))
+    for queued in (100, 10000, 100000):
+        results.append(bench_drain(queued))
+    monitor, renderer = make_monitor()
+    for lines_per_tick in (10, 100, 1000):
+        for samples_per_line in (1, 32):
+            results.append(bench_render(monitor, renderer, lines_per_tick, samples_per_line, 50 if quick else 200))
+    for baud in (115200, 1000000, 2000000):
+        for samples_per_line in (1, 32):
+            for line_rate in (1000, 'max'):
+                results.append(bench_end_to_end(monitor, renderer, baud, samples_per_line, line_rate,
+                                                0.5 if quick else 2.0))
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'machine': platform.machine(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+# --- Reporting ---
+def key(entry):
+    return entry['stage'], json.dumps(entry['params'], sort_keys=True)
+
+
+def print_results(results):
+    for entry in results:
+        params = ' '.join(f'{k}={v}' for k, v in entry['params'].items())
+        metrics = ' '.join(f'{k}={v:g}' for k, v in entry['metrics'].items())
+        print(f"{entry['stage']:<11} {params:<58} {metrics}")
+
+
+def higher_is_better(metric):
+    return metric.endswith('per_s') or metric == 'link_utilization'
+
+
+def compare(before, after, threshold):
+    """Print per-metric changes; return the number of regressions beyond `threshold` percent."""
+    old = {key(entry): entry for entry in before['results']}
+    regressions = 0
+    print(f"Comparing {before['meta'].get('commit')} -> {after['meta'].get('commit')} (threshold {threshold:g} %)")
+    for entry in after['results']:
+        previous = old.get(key(entry))
+        if previous is None:
+            continue
+        params = ' '.join(f'{k}={v}' for k, v in entry['params'].items())
+        for metric, value in entry['metrics'].items():
+            base = previous['metrics'].get(metric)
+            if not base:
+                continue
+            change = (value - base) / abs(base) * 100
+            worse = -change if higher_is_better(metric) else change
+            flag = ''
+            if worse > threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            print(f"{entry['stage']:<11} {params:<58} {metric:<17} {base:>12g} -> {value:>12g} {change:+7.1f} %{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='fewer iterations, for a smoke test')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two result files')
+    parser.add_argument('--threshold', type=float, default=10.0, help='regression threshold in percent')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            before = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            after = json.load(f)
+        return 1 if compare(before, after, args.threshold) else 0
+
+    results = run_suite(args.quick)
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'meta': metadata(), 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""Wall-clock startup of the CLI and GUI paths, each in a fresh interpreter.
+
+Every case runs once to warm the bytecode cache, then `runs` more times;
+the median is reported. Creating the GUI window needs a display and is
+skipped without one. Run from the repository root:
+
+    python benchmarks/bench_startup.py
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ('interpreter only', ['-c', 'pass']),
+    ('import stm32_serial', ['-c', 'import stm32_serial']),
+    ('stm32_cli.py --help', ['stm32_cli.py', '--help']),
+    ('stm32_cli.py send (loop://)', ['stm32_cli.py', '-p', 'loop://', 'send', '50', '100', '--wait', '0']),
+    ('import stm32_serial_gui', ['-c', 'import stm32_serial_gui']),
+    ('GUI window to first idle', ['-c', 'import stm32_serial_gui as g; app = g.App(); app.update(); app.on_closing()']),
+]
+
+
+def median_ms(args, runs):
+    command = [sys.executable] + args
+    if subprocess.run(command, cwd=ROOT, capture_output=True).returncode:
+        return None
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, capture_output=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main(runs=15):
+    print(f"{'case':<30} {'median ms':>9}")
+    for name, args in CASES:
+        result = median_ms(args, runs)
+        print(f'{name:<30} {result:>9.1f}' if result is not None else f'{name:<30} {"failed":>9}  (no display?)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Cost of the opt-in span tracing (stm32_trace) on the read and render paths.
+
+Reports the `TRACER.enabled` test that instrumented code pays when tracing
+is off, then the time per read handled by SerialController._handle_rx()
+and per monitor render (App._render_to_monitor() into the log store and
+view, as in bench_pipeline.py) with tracing off and on. Last, how long
+exporting a full buffer as Chrome trace JSON takes. Run from the
+repository root:
+
+    python benchmarks/bench_trace.py
+"""
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import make_monitor
+from stm32_metrics import PipelineMetrics, Registry
+from stm32_serial import SerialController
+from stm32_trace import TRACER
+
+
+def per_call_ns(fn, calls):
+    return min(timeit.repeat(fn, number=1, repeat=5)) / calls * 1e9
+
+
+def bench_read_path(read_size, reads=20000):
+    line = b'S:' + b','.join(b'%d' % (2048 + k * 37) for k in range(32)) + b'\n'
+    stream = line * (read_size * reads // len(line) + 1)
+    chunks = [stream[i:i + read_size] for i in range(0, read_size * reads, read_size)]
+    ctrl = SerialController(metrics=PipelineMetrics(Registry()))
+
+    def handle():
+        for chunk in chunks:
+            ctrl._handle_rx(chunk, 0.0)
+        ctrl.get_data()
+    return per_call_ns(handle, reads)
+
+
+def bench_render(monitor, lines_per_tick=100, ticks=200):
+    records = [(f'📥 S:{2048 + k},{k}\n', 'received') for k in range(lines_per_tick)]
+
+    def render():
+        for _ in range(ticks):
+            monitor._render_to_monitor(records)
+    return per_call_ns(render, ticks)
+
+
+def off_and_on(bench, *args):
+    """(ns with tracing off, ns with tracing on) for one benchmark."""
+    TRACER.stop()
+    off = bench(*args)
+    TRACER.start()
+    on = bench(*args)
+    TRACER.stop()
+    return off, on
+
+
+def bench_export(spans=TRACER.capacity):
+    TRACER.start()
+    now = time.perf_counter()
+    for index in range(spans):
+        TRACER.complete('serial.read', now, now + 1e-6, bytes=index)
+    TRACER.stop()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'trace.json')
+        start = time.perf_counter()
+        TRACER.export(path)
+        elapsed = time.perf_counter() - start
+        return spans, elapsed, os.path.getsize(path)
+
+
+def main():
+    check_ns = min(timeit.repeat('TRACER.enabled', globals={'TRACER': TRACER}, number=1000000, repeat=5)) * 1e3
+    print(f'TRACER.enabled test: {check_ns:.1f} ns\n')
+
+    print(f"{'path':<18} {'ns off':>9} {'ns on':>9} {'overhead':>9}")
+    for read_size in (16, 256, 4096):
+        off, on = off_and_on(bench_read_path, read_size)
+        print(f'{f"read {read_size} B":<18} {off:>9.0f} {on:>9.0f} {(on - off) / off * 100:>8.1f}%')
+
+    monitor, kind = make_monitor()
+    off, on = off_and_on(bench_render, monitor)
+    print(f'{f"render 100 ({kind})":<18} {off:>9.0f} {on:>9.0f} {(on - off) / off * 100:>8.1f}%')
+
+    spans, elapsed, size = bench_export()
+    print(f'\nExport of {spans} spans: {elapsed * 1000:.0f} ms, {size / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
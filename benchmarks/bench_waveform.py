@@ -0,0 +1,46 @@
+"""Cost of feeding the live waveform per GUI tick at a given sample rate.
+
+Simulates the work `_update_serial_monitor` does for the plot: parse the
+tick's telemetry lines, append them to the ring and build the decimated
+envelope for the canvas. Run from the repository root:
+
+    python benchmarks/bench_waveform.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import stm32_dsp
+
+
+def bench(sample_rate, samples_per_line, tick_ms=16, width=780, height=140, ticks=200):
+    per_tick = int(sample_rate * tick_ms / 1000)
+    phase = np.arange(per_tick) * 2 * np.pi * 50 / sample_rate
+    values = (2048 + 2000 * np.sin(phase)).astype(int).tolist()
+    lines = ['S:' + ','.join(map(str, values[i:i + samples_per_line]))
+             for i in range(0, per_tick, samples_per_line)]
+    ring = stm32_dsp.SampleRing()
+    costs = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        ring.extend(stm32_dsp.parse_samples(lines))
+        stm32_dsp.envelope_coords(ring.latest(8192), width, height)
+        costs.append((time.perf_counter() - start) * 1000)
+    costs.sort()
+    return per_tick, costs[len(costs) // 2], costs[int(len(costs) * 0.99)]
+
+
+def main():
+    print(f"{'samples/s':>10} {'per line':>8} {'per tick':>8} {'p50 ms':>7} {'p99 ms':>7}")
+    for sample_rate in (10000, 100000, 250000):
+        for samples_per_line in (1, 32):
+            per_tick, p50, p99 = bench(sample_rate, samples_per_line)
+            print(f'{sample_rate:>10} {samples_per_line:>8} {per_tick:>8} {p50:>7.2f} {p99:>7.2f}')
+
+
+if __name__ == '__main__':
+    main()
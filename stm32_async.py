@@ -0,0 +1,459 @@
+"""asyncio transport for the STM32 sine generator.
+
+AsyncSerialController reads the port when the event loop reports its file
+descriptor readable (loop.add_reader), so an idle connection costs no
+wakeups at all, and offers awaitable sends and an async iterator of the
+received lines:
+
+    ctrl = AsyncSerialController()
+    await ctrl.connect('/dev/ttyACM0')
+    await ctrl.send_amp_freq(50, 100)
+    async for arrived, line in ctrl.lines():
+        ...
+
+Ports without a file descriptor (emulator://, replay://, loop://, COM ports
+on Windows) are polled every `poll_interval` instead. AsyncBridge runs a
+controller on an event loop thread behind the SerialController interface,
+so the Tk GUI and the CLI can use it unchanged.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import os
+import threading
+import time
+
+import serial
+
+from stm32_capture import RX, TX
+from stm32_serial import (DEFAULT_METRICS, AsciiCodec, ControllerError, LatencyTracker, LineBatchQueue,
+                          SerialController, open_port)
+from stm32_trace import TRACER
+
+
+class AsyncSerialController:
+    """Serial connection driven by an asyncio event loop.
+
+    Received lines wait in a buffer of at most `max_pending` lines. When it
+    is full the port is not read any more until the consumer catches up, so
+    the OS buffers and the USB link push back on the board instead of lines
+    being dropped. Sends are serialized in call order; each returns once its
+    bytes have been handed to the OS (True), or False after calling
+    `on_error(message)`. `on_link_lost(error)` is called if the port fails.
+    All methods must be called from the loop the controller connected on.
+    Metrics are counted as in SerialController.
+    """
+    def __init__(self, codec=None, max_pending=10000, poll_interval=0.01, metrics=None):
+        self.metrics = metrics or DEFAULT_METRICS
+        self._decode_errors = 0
+        self.codec = codec or AsciiCodec()
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self.ser = None
+        self.connected = False
+        self.recorder = None  # Optional CaptureRecorder, fed the raw bytes in both directions
+        self.last_command = None  # (amplitude, frequency) most recently sent
+        self.tx_latency_ms = 0.0
+        self.tx_latency_max_ms = 0.0
+        self.rtt_stats = LatencyTracker()
+        self.ack_timeout = 2.0
+        self._pending_acks = collections.deque(maxlen=16)
+        self._ack_lock = threading.Lock()
+        self.on_link_lost = None
+        self.on_error = None
+        self.reads = 0  # Reads of the port, to see what idling costs
+        self.pauses = 0  # Times reading stopped because the consumer fell behind
+        self._loop = None
+        self._fd = None
+        self._poller = None
+        self._paused = False
+        self._lines = []
+        self._lines_ready = None
+        self._write_lock = None
+
+    # Same round-trip and TX bookkeeping as the threaded controller
+    _match_ack = SerialController._match_ack
+    _count_tx = SerialController._count_tx
+
+    async def connect(self, port, baudrate=115200):
+        """Open the port and start reading it; raises ControllerError if that fails.
+
+        An open connection is closed first, so its reader never shares the loop with the new one.
+        """
+        if self.connected:
+            self._close()
+        try:
+            ser = open_port(port, baudrate, timeout=0)
+        except Exception as e:
+            raise ControllerError(f'Failed to connect to {port}: {e}') from e
+        self._loop = asyncio.get_running_loop()
+        self.ser = ser
+        self.connected = True
+        self.codec.reset()
+        self._decode_errors = 0
+        self.metrics.connects.inc()
+        self.rtt_stats.clear()
+        self._pending_acks.clear()
+        self._lines = []
+        self._lines_ready = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        self._paused = False
+        try:
+            # pyserial opens POSIX ports (and sockets) non-blocking, so the fd can be used directly
+            self._fd = ser.fileno()
+        except Exception:
+            self._fd = None
+        if self._fd is None:
+            self._poller = self._loop.create_task(self._poll(ser))
+        else:
+            self._loop.add_reader(self._fd, self._on_readable)
+        return True
+
+    async def disconnect(self):
+        self._close()
+
+    def _close(self):
+        ser, self.ser = self.ser, None
+        if ser is None:
+            return
+        if self._fd is not None and not self._paused:
+            self._loop.remove_reader(self._fd)
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+        try:
+            ser.close()
+        except Exception:
+            pass
+        self.connected = False
+        self._lines.extend((time.perf_counter(), decoded) for decoded in self.codec.flush())
+        self._lines_ready.set()  # Wake readers so they see the end of the stream
+
+    def _link_lost(self, error):
+        if self.ser is None:
+            return
+        if TRACER.enabled:
+            TRACER.mark('serial.link_lost', port=self.ser.port, error=str(error))
+        self._close()
+        self.metrics.link_lost.inc()
+        print(f"Serial link lost: {error}")
+        if self.on_link_lost:
+            self.on_link_lost(error)
+
+    def set_codec(self, codec):
+        """Switch the wire format; applies to the next bytes read or sent."""
+        codec.reset()
+        self._decode_errors = 0
+        self.codec = codec
+
+    @property
+    def dropped_lines(self):
+        """Always 0: a full buffer pauses reading instead of dropping lines."""
+        return 0
+
+    # --- Reading ---
+    def _pause(self):
+        self._paused = True
+        self.pauses += 1
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+
+    def _resume(self):
+        self._paused = False
+        if self._fd is not None:
+            self._loop.add_reader(self._fd, self._on_readable)
+
+    def _on_readable(self):
+        tracing = TRACER.enabled
+        if tracing:
+            started = time.perf_counter()
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self._link_lost(e)
+            return
+        if not data:
+            self._link_lost(serial.SerialException('device reports readiness to read but returned no data'))
+            return
+        arrived = time.perf_counter()
+        if tracing:
+            TRACER.complete('serial.read', started, arrived, bytes=len(data))
+        self._handle_rx(data, arrived)
+
+    async def _poll(self, ser):
+        while self.ser is ser:
+            if not self._paused:
+                try:
+                    waiting = ser.in_waiting
+                    data = ser.read(waiting) if waiting else b''
+                except (serial.SerialException, OSError) as e:
+                    self._link_lost(e)
+                    return
+                if data:
+                    self._handle_rx(data, time.perf_counter())
+            await asyncio.sleep(self.poll_interval)
+
+    def _handle_rx(self, data, arrived):
+        self.reads += 1
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record(RX, data, arrived)
+        lines = self._lines
+        queued = len(lines)
+        tracing = TRACER.enabled
+        if tracing:
+            started = time.perf_counter()
+        for decoded in self.codec.decode(data):
+            lines.append((arrived, decoded))
+            if self._pending_acks:
+                self._match_ack(decoded, arrived)
+        if tracing:
+            TRACER.complete('codec.decode', started, time.perf_counter(), bytes=len(data), lines=len(lines) - queued)
+        metrics = self.metrics
+        metrics.rx_bytes.inc(len(data))
+        metrics.read_sizes.observe(len(data))
+        metrics.rx_lines.inc(len(lines) - queued)
+        metrics.queue_depth.set(len(lines))
+        errors = self.codec.stats.errors
+        if errors > self._decode_errors:
+            metrics.decode_errors.inc(errors - self._decode_errors)
+            self._decode_errors = errors
+        if lines:
+            self._lines_ready.set()
+            if len(lines) >= self.max_pending and not self._paused:
+                self._pause()
+
+    async def read_lines(self):
+        """Wait for received lines and return all of them, oldest first; [] once disconnected."""
+        while not self._lines and self.connected:
+            self._lines_ready.clear()
+            await self._lines_ready.wait()
+        lines, self._lines = self._lines, []
+        self.metrics.queue_depth.set(0)
+        if self._paused and self.connected:
+            self._resume()
+        return lines
+
+    async def lines(self):
+        """Async iterator of (arrival perf_counter time, line) pairs until the connection ends."""
+        while True:
+            batch = await self.read_lines()
+            if not batch:
+                return
+            for item in batch:
+                yield item
+
+    # --- Writing ---
+    async def send(self, data):
+        return await self._send_encoded(self.codec.encode_text, data)
+
+    async def send_amp_freq(self, amplitude, frequency):
+        with self._ack_lock:
+            self._pending_acks.append((f'A{amplitude:03d}F{frequency:04d}', time.perf_counter()))
+        if await self._send_encoded(self.codec.encode_command, amplitude, frequency):
+            self.last_command = (amplitude, frequency)
+            return True
+        return False
+
+    async def upload_table(self, table, resolution_bits=12):
+        """Stream a PWM duty table to the firmware."""
+        return await self._send_encoded(self.codec.encode_table, table, resolution_bits)
+
+    async def _send_encoded(self, encode, *args):
+        if not self.connected:
+            self._report_error('Serial is not connected!')
+            return False
+        try:
+            payload, queued_at = encode(*args), time.perf_counter()
+            async with self._write_lock:
+                await self._write(self.ser, payload)
+        except (serial.SerialException, OSError) as e:
+            self._link_lost(e)
+            self._report_error(f'Failed to send data: {e}')
+            return False
+        except Exception as e:
+            self.metrics.io_errors.inc()
+            self._report_error(f'Failed to send data: {e}')
+            return False
+        now = time.perf_counter()
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record(TX, payload, now)
+        self._count_tx(payload, now - queued_at)
+        return True
+
+    async def _write(self, ser, payload):
+        if ser is None:
+            raise serial.PortNotOpenError()
+        if self._fd is None:
+            ser.write(payload)
+            return
+        view = memoryview(payload)
+        while view:
+            try:
+                view = view[os.write(self._fd, view):]
+            except BlockingIOError:
+                pass
+            if view:
+                # The OS buffer is full: wait until the port can take more
+                writable = self._loop.create_future()
+                self._loop.add_writer(self._fd, writable.set_result, None)
+                try:
+                    await writable
+                finally:
+                    self._loop.remove_writer(self._fd)
+
+    def _report_error(self, message):
+        if self.on_error:
+            self.on_error(message)
+        else:
+            print(message)
+
+
+# --- Bridge for Threaded Callers ---
+class AsyncBridge:
+    """SerialController interface to an AsyncSerialController on its own event loop thread.
+
+    A task on the loop moves received lines into a LineBatchQueue, which the
+    GUI drains with `get_data()` on its own tick (dropping the oldest lines if
+    it falls behind, as with SerialController). Sends are scheduled on the
+    loop in call order and return at once; `wait_sent()` waits for them.
+    """
+    def __init__(self, codec=None):
+        self.core = AsyncSerialController(codec)
+        self.core.on_link_lost = self._on_link_lost
+        self.core.on_error = self._report_error
+        self.data_queue = LineBatchQueue()
+        self.on_link_lost = None
+        self.on_error = None
+        self.loop = None
+        self._thread = None
+        self._pump = None
+        self._sends = set()
+
+    # --- SerialController attributes ---
+    @property
+    def connected(self):
+        return self.core.connected
+
+    @property
+    def ser(self):
+        return self.core.ser
+
+    @property
+    def codec(self):
+        return self.core.codec
+
+    @property
+    def rtt_stats(self):
+        return self.core.rtt_stats
+
+    @property
+    def last_command(self):
+        return self.core.last_command
+
+    @property
+    def tx_latency_ms(self):
+        return self.core.tx_latency_ms
+
+    @property
+    def tx_latency_max_ms(self):
+        return self.core.tx_latency_max_ms
+
+    @property
+    def recorder(self):
+        return self.core.recorder
+
+    @recorder.setter
+    def recorder(self, recorder):
+        self.core.recorder = recorder
+
+    @property
+    def dropped_lines(self):
+        return self.data_queue.dropped
+
+    def set_codec(self, codec):
+        self.core.set_codec(codec)
+
+    # --- Connection ---
+    def connect(self, port, baudrate=115200):
+        """Open the port on the loop thread; raises ControllerError if that fails."""
+        if self._thread is None:
+            self.loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self._thread.start()
+        return asyncio.run_coroutine_threadsafe(self._connect(port, baudrate), self.loop).result()
+
+    async def _connect(self, port, baudrate):
+        if self._pump is not None:
+            # Let the old pump hand over the last lines of the previous connection and finish
+            await self.core.disconnect()
+            await self._pump
+            self._pump = None
+        await self.core.connect(port, baudrate)
+        self.data_queue.dropped = 0
+        self._pump = asyncio.get_running_loop().create_task(self._run_pump())
+        return True
+
+    async def _run_pump(self):
+        while True:
+            lines = await self.core.read_lines()
+            if not lines:
+                return
+            dropped = self.data_queue.put_batch(lines)
+            if dropped and TRACER.enabled:
+                TRACER.mark('queue.dropped', lines=dropped)
+
+    def disconnect(self):
+        if self._thread is not None:
+            asyncio.run_coroutine_threadsafe(self.core.disconnect(), self.loop).result(timeout=1.0)
+
+    def close(self):
+        """Disconnect and stop the loop thread."""
+        self.disconnect()
+        if self._thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=1.0)
+            self.loop.close()
+            self._thread = None
+
+    def _on_link_lost(self, error):
+        if self.on_link_lost:
+            self.on_link_lost(error)
+
+    def _report_error(self, message):
+        if self.on_error:
+            self.on_error(message)
+        else:
+            print(message)
+
+    # --- Commands ---
+    def send(self, data):
+        return self._submit(self.core.send, data)
+
+    def send_amp_freq(self, amplitude, frequency):
+        return self._submit(self.core.send_amp_freq, amplitude, frequency)
+
+    def upload_table(self, table, resolution_bits=12, chunk_size=4096):
+        return self._submit(self.core.upload_table, table, resolution_bits)
+
+    def _submit(self, method, *args):
+        if not self.connected:
+            self._report_error('Serial is not connected!')
+            return False
+        future = asyncio.run_coroutine_threadsafe(method(*args), self.loop)
+        self._sends.add(future)
+        future.add_done_callback(self._sends.discard)
+        return True
+
+    def wait_sent(self, timeout=1.0):
+        """Wait until everything submitted so far is on its way; False on timeout or failure."""
+        pending = list(self._sends)
+        done, not_done = concurrent.futures.wait(pending, timeout)
+        return not not_done and all(future.result() for future in done)
+
+    def get_data(self):
+        """Get all available data from the queue as (arrival perf_counter time, line) pairs"""
+        return self.data_queue.drain()
@@ -0,0 +1,476 @@
+"""Capture files for the STM32 GUI: recording raw serial traffic to disk and
+replaying it through a serial-like port.
+
+A capture file is a header followed by records:
+
+    header  b'STM32CAP' + '<Bd' (format version, wall-clock time of t = 0)
+    record  '<dBI' (seconds since t = 0, direction RX/TX, payload length) + payload
+
+Payloads are the raw bytes read from or written to the port, before any
+codec, so a capture can be decoded again with whichever codec the board
+was using. Files may be gzip or zstd compressed (zstd needs the optional
+`zstandard` package).
+"""
+import bisect
+import gzip
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from array import array
+
+try:
+    import zstandard  # Optional: faster and smaller than gzip
+except ImportError:
+    zstandard = None
+
+MAGIC = b'STM32CAP'
+VERSION = 1
+HEADER = struct.Struct('<8sBd')
+RECORD = struct.Struct('<dBI')
+RX, TX = 0, 1
+EXTENSIONS = {None: '.cap', 'gzip': '.cap.gz', 'zstd': '.cap.zst'}
+DEFAULT_COMPRESSION = 'zstd' if zstandard is not None else 'gzip'
+
+
+def _open_for_writing(path, compression):
+    if compression == 'gzip':
+        return gzip.open(path, 'wb', compresslevel=1)  # Fast level: throughput matters more here
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(path, 'wb'))
+    return open(path, 'wb')
+
+
+class CaptureRecorder:
+    """Tees serial traffic to capture files on its own writer thread.
+
+    `record()` is called from the serial reader and writer threads and only
+    appends to an in-memory list; every `flush_interval` seconds the writer
+    thread swaps that list out and writes it in one call. If more than
+    `max_pending` bytes are waiting because the disk cannot keep up, new
+    records are dropped and counted instead of blocking the serial threads.
+    Files rotate after `max_bytes` of records or `max_seconds`, whichever
+    comes first (checked after each bulk write); every file has its own
+    header so each one can be replayed on its own.
+    """
+    DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.stm32_serial_gui', 'captures')
+
+    def __init__(self, directory=None, compression=None, max_bytes=256 << 20, max_seconds=3600.0,
+                 flush_interval=0.25, max_pending=32 << 20, prefix='capture'):
+        if compression not in EXTENSIONS:
+            raise ValueError(f'unknown compression {compression!r}')
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError('zstd compression needs the zstandard package')
+        self.directory = directory or self.DEFAULT_DIR
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.prefix = prefix
+        self.started = time.perf_counter()  # Record timestamps are relative to this
+        self.started_wall = time.time()
+        self.files = []
+        self.records = 0
+        self.bytes_written = 0  # Uncompressed, headers included
+        self.dropped = 0
+        self.dropped_bytes = 0
+        self._pending = []
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_bytes = 0
+        self._file_started = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def path(self):
+        """The file currently being written."""
+        return self.files[-1] if self.files else None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._open_next()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Write what is still queued and close the current file."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def record(self, direction, data, timestamp=None):
+        """Queue one chunk of traffic; never blocks on disk. Returns False if it was dropped."""
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        size = len(data)
+        with self._lock:
+            if self._pending_bytes + size > self.max_pending:
+                self.dropped += 1
+                self.dropped_bytes += size
+                return False
+            self._pending.append((timestamp, direction, bytes(data)))
+            self._pending_bytes += size
+        return True
+
+    def stats(self):
+        return {
+            'records': self.records,
+            'bytes': self.bytes_written,
+            'files': len(self.files),
+            'dropped': self.dropped,
+            'dropped_bytes': self.dropped_bytes,
+            'pending_bytes': self._pending_bytes,
+        }
+
+    def _open_next(self):
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        name = f'{self.prefix}-{stamp}-{len(self.files):03d}{EXTENSIONS[self.compression]}'
+        path = os.path.join(self.directory, name)
+        self._file = _open_for_writing(path, self.compression)
+        header = HEADER.pack(MAGIC, VERSION, self.started_wall)
+        self._file.write(header)
+        self.bytes_written += len(header)
+        self._file_bytes = len(header)
+        self._file_started = time.perf_counter()
+        self.files.append(path)
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError as e:
+                print(f"Capture close error: {e}")
+            self._file = None
+
+    def _run(self):
+        while True:
+            stopping = self._stop_event.wait(self.flush_interval)
+            self._flush()
+            if stopping:
+                break
+        self._close_file()
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._pending_bytes = 0
+        if pending:
+            chunk = bytearray()
+            pack, started = RECORD.pack, self.started
+            for timestamp, direction, data in pending:
+                chunk += pack(timestamp - started, direction, len(data))
+                chunk += data
+            try:
+                if self._file is None:
+                    self._open_next()  # Retry after a failed rotation
+                self._file.write(chunk)
+            except (OSError, ValueError) as e:
+                print(f"Capture write error: {e}")
+                with self._lock:
+                    self.dropped += len(pending)
+                    self.dropped_bytes += sum(len(data) for _, _, data in pending)
+                return
+            self.records += len(pending)
+            self.bytes_written += len(chunk)
+            self._file_bytes += len(chunk)
+        if self._file is None or self._file_bytes <= HEADER.size:
+            return  # Never rotate out a file without records
+        if (self._file_bytes >= self.max_bytes
+                or time.perf_counter() - self._file_started >= self.max_seconds):
+            self._close_file()
+            try:
+                self._open_next()
+            except OSError as e:
+                print(f"Capture rotation error: {e}")
+
+
+# --- Replay ---
+class CaptureReader:
+    """Random access to the records of one capture file.
+
+    The records are memory-mapped, so even a multi-GB capture costs one
+    pass to build the index and no copies. Compressed files are first
+    decompressed, a chunk at a time, into an anonymous temporary file that
+    is mapped instead: that needs as much free disk as the uncompressed
+    capture and one pass of decompression before the replay starts, but
+    never holds the capture in RAM. The index is a set of flat arrays
+    (timestamp, offset, length, direction), and `index_at()` bisects the
+    timestamps, so seeking never scans the file. A record truncated by an
+    interrupted recording ends the capture.
+    """
+    CHUNK = 1 << 20  # Bytes decompressed at a time
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._map = None
+        if path.endswith('.gz'):
+            self._file = self._decompress(gzip.open(path, 'rb'))
+        elif path.endswith('.zst'):
+            if zstandard is None:
+                raise ValueError('zstd captures need the zstandard package')
+            self._file = self._decompress(open(path, 'rb'), zstandard.ZstdDecompressor().decompressobj())
+        else:
+            self._file = open(path, 'rb')
+        try:
+            data = self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            self._file.close()
+            raise ValueError(f'{path} is not a capture file')
+        if len(data) < HEADER.size:
+            self.close()
+            raise ValueError(f'{path} is not a capture file')
+        magic, version, self.started_wall = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{path} is not a capture file (or an unsupported version)')
+        self._view = memoryview(data)
+        self.times = array('d')
+        self.offsets = array('Q')  # Start of each payload
+        self.lengths = array('I')
+        self.directions = array('B')
+        self._build_index(data)
+
+    @classmethod
+    def _decompress(cls, source, decompressor=None):
+        """Anonymous temporary file holding the decompressed `source`, which is closed.
+
+        `source` is read a chunk at a time, through `decompressor` if it
+        does not decompress by itself.
+        """
+        out = tempfile.TemporaryFile(prefix='stm32cap-')
+        try:
+            with source:
+                while True:
+                    try:
+                        chunk = source.read1(cls.CHUNK)
+                    except EOFError:  # Truncated gzip stream: keep what was decompressed
+                        break
+                    if not chunk:
+                        break
+                    out.write(chunk if decompressor is None else decompressor.decompress(chunk))
+            out.flush()
+        except BaseException:
+            out.close()
+            raise
+        return out
+
+    def _build_index(self, data):
+        unpack, size, end = RECORD.unpack_from, RECORD.size, len(data)
+        times, offsets, lengths, directions = self.times, self.offsets, self.lengths, self.directions
+        offset = HEADER.size
+        while offset + size <= end:
+            timestamp, direction, length = unpack(data, offset)
+            offset += size
+            if offset + length > end:
+                break
+            times.append(timestamp)
+            offsets.append(offset)
+            lengths.append(length)
+            directions.append(direction)
+            offset += length
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def duration(self):
+        return self.times[-1] - self.times[0] if self.times else 0.0
+
+    def index_at(self, seconds):
+        """Index of the first record at or after `seconds` from the first record."""
+        if not self.times:
+            return 0
+        return bisect.bisect_left(self.times, self.times[0] + seconds)
+
+    def payload(self, index):
+        """Zero-copy view of one record's payload."""
+        offset = self.offsets[index]
+        return self._view[offset:offset + self.lengths[index]]
+
+    def close(self):
+        view = getattr(self, '_view', None)
+        if view is not None:
+            view.release()
+            self._view = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ReplayPort:
+    """A serial-like port that plays back the RX records of a capture.
+
+    It implements the part of the pyserial API SerialController uses, so a
+    replay goes through the same codec, queue hand-off and rendering as a
+    live board. `speed` scales time (1 = real time, 10 = ten times faster,
+    0 = as fast as the reader consumes). Writes are accepted and discarded.
+    At the end the port goes quiet like an idle device and `on_end()` is
+    called once, unless `loop` starts the capture over.
+    """
+    SCHEME = 'replay://'
+    MAX_IN_WAITING = 1 << 16
+
+    def __init__(self, path, speed=1.0, start=0.0, loop=False, timeout=0.01, on_end=None):
+        if speed < 0:
+            raise ValueError('replay speed must not be negative')
+        self.reader = CaptureReader(path)
+        self.port = path
+        self.baudrate = 0
+        self.timeout = timeout
+        self.speed = speed
+        self.loop = loop
+        self.on_end = on_end
+        self.is_open = True
+        self.records_read = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._ended = False
+        self._seek(start)
+
+    @classmethod
+    def from_url(cls, url, timeout=0.01):
+        """Open 'replay://<path>[?speed=N|max][&loop=1][&start=seconds]'."""
+        import urllib.parse  # Only needed for replays; keeps imports of this module light
+        parts = urllib.parse.urlsplit(url)
+        path = urllib.parse.unquote(parts.netloc + parts.path)
+        options = dict(urllib.parse.parse_qsl(parts.query))
+        speed = options.get('speed', '1')
+        return cls(path, speed=0.0 if speed == 'max' else float(speed), start=float(options.get('start', 0)),
+                   loop=options.get('loop', '0') not in ('0', 'false', ''), timeout=timeout)
+
+    def notify_end(self, callback):
+        """Set `on_end`; it is called right away if playback already ended."""
+        with self._lock:
+            self.on_end = callback
+            ended = self._ended
+        if ended:
+            callback()
+
+    # --- Playback position ---
+    def seek(self, seconds):
+        """Continue playback from `seconds` after the first record."""
+        with self._lock:
+            self._seek(seconds)
+
+    def _seek(self, seconds):
+        self._index = self.reader.index_at(seconds)
+        self._offset = 0  # Bytes of the current record already read
+        times = self.reader.times
+        # The first record after the seek point plays immediately
+        self._time_base = times[self._index] if self._index < len(times) else seconds
+        self._clock_base = time.perf_counter()
+        self._ended = False
+
+    @property
+    def position(self):
+        """Seconds from the first record to the next one to be played."""
+        times = self.reader.times
+        return times[self._index] - times[0] if self._index < len(times) else self.reader.duration
+
+    def _capture_time(self):
+        return self._time_base + (time.perf_counter() - self._clock_base) * self.speed
+
+    def _due(self, index, now):
+        return not self.speed or self.reader.times[index] <= now
+
+    # --- pyserial API ---
+    @property
+    def in_waiting(self):
+        """Bytes of due records not read yet (bounded, so this stays cheap)."""
+        with self._lock:
+            reader, count = self.reader, len(self.reader)
+            now = self._capture_time()
+            waiting, index = -self._offset, self._index
+            while index < count and waiting < self.MAX_IN_WAITING and self._due(index, now):
+                if reader.directions[index] == RX:
+                    waiting += reader.lengths[index]
+                index += 1
+            return max(waiting, 0)
+
+    def read(self, size=1):
+        deadline = None if self.timeout is None else time.perf_counter() + self.timeout
+        while True:
+            with self._lock:
+                if not self.is_open:
+                    return b''
+                data, wait = self._take(size)
+            if data:
+                return data
+            now = time.perf_counter()
+            if deadline is not None:
+                if now >= deadline:
+                    return b''
+                wait = deadline - now if wait is None else min(wait, deadline - now)
+            time.sleep(wait if wait is not None else 0.1)
+
+    def _take(self, size):
+        """Up to `size` bytes of due RX data, and the seconds until more is due (None at the end)."""
+        reader, count = self.reader, len(self.reader)
+        directions, lengths = reader.directions, reader.lengths
+        now = self._capture_time()
+        out = bytearray()
+        while len(out) < size and self._index < count:
+            index = self._index
+            if directions[index] != RX:
+                self._index += 1
+                continue
+            if not self._due(index, now):
+                break
+            piece = reader.payload(index)[self._offset:self._offset + size - len(out)]
+            out += piece
+            self._offset += len(piece)
+            if self._offset >= lengths[index]:
+                self._index += 1
+                self._offset = 0
+                self.records_read += 1
+        self.bytes_read += len(out)
+        if self._index < count:
+            return bytes(out), (reader.times[self._index] - now) / self.speed if self.speed else 0.0
+        if self.loop:
+            self._seek(0.0)
+            return bytes(out), 0.0
+        if not self._ended:
+            self._ended = True
+            if self.on_end:
+                self.on_end()
+        return bytes(out), None
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        pass
+
+    def close(self):
+        with self._lock:
+            if self.is_open:
+                self.is_open = False
+                self.reader.close()
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._started
+        return {
+            'position': self.position,
+            'duration': self.reader.duration,
+            'records': self.records_read,
+            'bytes': self.bytes_read,
+            'elapsed': elapsed,
+            'mb_per_s': self.bytes_read / elapsed / 1e6 if elapsed else 0.0,
+            'records_per_s': self.records_read / elapsed if elapsed else 0.0,
+        }
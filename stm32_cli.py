@@ -0,0 +1,229 @@
+"""Command line interface to the STM32 sine generator, without the GUI.
+
+    python stm32_cli.py send 50 100            # one command, prints the ack
+    python stm32_cli.py monitor --duration 10  # print received lines
+    python stm32_cli.py sweep --mode log --start 1 --stop 1000 --steps 200 --dwell 20
+    python stm32_cli.py capture --duration 3600 --compression gzip
+
+The port defaults to the last one the GUI or CLI connected to for a plugged
+in board (see PortProfileStore). Only argparse is imported before the
+arguments are parsed, so `--help` and bad invocations return immediately;
+`--timing` reports where the startup time went.
+"""
+import argparse
+import sys
+import time
+
+_STARTED = time.perf_counter()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='stm32_cli', description='Control the STM32 sine generator over serial.')
+    parser.add_argument('-p', '--port',
+                        help='serial port or URL (socket://, emulator://, replay://file.cap); default: cached profile')
+    parser.add_argument('-b', '--baud', type=int, help='baud rate (default: cached profile or 115200)')
+    parser.add_argument('--codec', default='ascii', choices=['ascii', 'cobs'], help='wire format')
+    parser.add_argument('--transport', default='thread', choices=['thread', 'async'],
+                        help='reader/writer threads, or an asyncio event loop driven by fd readiness')
+    parser.add_argument('--timing', action='store_true', help='report import, connect and total times on stderr')
+    parser.add_argument('--metrics-port', type=int, help='serve Prometheus metrics on localhost at this port')
+    parser.add_argument('--metrics-json', help='append a JSON metrics snapshot to this file periodically')
+    parser.add_argument('--metrics-interval', type=float, default=10.0, help='seconds between JSON snapshots')
+    parser.add_argument('--trace', metavar='PATH',
+                        help='trace the read path while the command runs and write it as Chrome trace JSON')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    send = commands.add_parser('send', help='send one amplitude/frequency command')
+    send.add_argument('amplitude', type=int, help='0-100 %%')
+    send.add_argument('frequency', type=int, help='1-1000 Hz')
+    send.add_argument('--wait', type=float, default=0.5, help='seconds to wait for the reply (0: do not wait)')
+
+    monitor = commands.add_parser('monitor', help='print received lines')
+    monitor.add_argument('--duration', type=float, help='stop after this many seconds (default: until Ctrl+C)')
+    monitor.add_argument('--timestamps', action='store_true', help='prefix each line with its arrival time')
+
+    sweep = commands.add_parser('sweep', help='run a timed frequency/amplitude sweep')
+    sweep.add_argument('--mode', default='log', choices=['linear', 'log', 'stepped'])
+    sweep.add_argument('--start', type=int, default=1, help='first frequency, Hz')
+    sweep.add_argument('--stop', type=int, default=1000, help='last frequency, Hz')
+    sweep.add_argument('--steps', type=int, default=100, help='number of steps (linear and log modes)')
+    sweep.add_argument('--step', type=int, default=10, help='Hz per step (stepped mode)')
+    sweep.add_argument('--dwell', type=float, default=50.0, help='ms per step')
+    sweep.add_argument('--amplitude', type=int, default=50, help='amplitude at the start, %%')
+    sweep.add_argument('--amplitude-end', type=int, help='amplitude at the end, %% (default: constant)')
+
+    capture = commands.add_parser('capture', help='record the raw traffic to capture files')
+    capture.add_argument('-o', '--output', help='directory (default: ~/.stm32_serial_gui/captures)')
+    capture.add_argument('--compression', default='none', choices=['none', 'gzip', 'zstd'])
+    capture.add_argument('--duration', type=float, help='stop after this many seconds (default: until Ctrl+C)')
+    capture.add_argument('--rotate-mb', type=float, default=256.0, help='start a new file after this many MB')
+    capture.add_argument('--rotate-minutes', type=float, default=60.0, help='start a new file after this long')
+    return parser
+
+
+# --- Commands ---
+def cmd_send(ctrl, args):
+    if not (0 <= args.amplitude <= 100 and 1 <= args.frequency <= 1000):
+        print('Amplitude must be 0-100 and frequency 1-1000', file=sys.stderr)
+        return 1
+    if not ctrl.send_amp_freq(args.amplitude, args.frequency) or not ctrl.wait_sent():
+        return 1
+    deadline = time.perf_counter() + args.wait
+    while time.perf_counter() < deadline:
+        for _, line in ctrl.get_data():
+            if not line.startswith('S:'):  # Replies only, not the telemetry stream
+                print(line)
+        if ctrl.rtt_stats.percentiles()['p50']:
+            print(f"RTT: {ctrl.rtt_stats.percentiles()['p50']:.1f} ms")
+            break
+        time.sleep(0.005)
+    return 0
+
+
+def cmd_monitor(ctrl, args):
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    while deadline is None or time.perf_counter() < deadline:
+        records = ctrl.get_data()
+        if records:
+            if args.timestamps:
+                sys.stdout.write(''.join(f'{arrived:.6f} {line}\n' for arrived, line in records))
+            else:
+                sys.stdout.write(''.join(f'{line}\n' for _, line in records))
+            sys.stdout.flush()
+        else:
+            time.sleep(0.01)
+    if ctrl.dropped_lines:
+        print(f'{ctrl.dropped_lines} lines dropped', file=sys.stderr)
+    return 0
+
+
+def cmd_sweep(ctrl, args):
+    from stm32_serial import SweepRunner, sweep_steps
+    try:
+        steps = sweep_steps(args.mode, args.start, args.stop, args.steps, step_size=args.step,
+                            amplitude=args.amplitude, amplitude_end=args.amplitude_end)
+    except ValueError as e:
+        print(f'Invalid sweep: {e}', file=sys.stderr)
+        return 1
+    runner = SweepRunner(ctrl.send_amp_freq, steps, args.dwell / 1000).start()
+    try:
+        while runner.is_running():
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        runner.stop()
+        while runner.is_running():
+            time.sleep(0.01)
+    sent, total = runner.progress
+    jitter = runner.jitter()
+    print(f"Sweep: {sent}/{total} steps, lateness p50/p95/p99/max "
+          f"{jitter['p50']:.3f}/{jitter['p95']:.3f}/{jitter['p99']:.3f}/{jitter['max']:.3f} ms")
+    ctrl.wait_sent()
+    return 0 if sent == total else 1
+
+
+def cmd_capture(ctrl, args):
+    from stm32_capture import CaptureRecorder
+    compression = None if args.compression == 'none' else args.compression
+    try:
+        recorder = CaptureRecorder(args.output, compression=compression, max_bytes=int(args.rotate_mb * 1e6),
+                                   max_seconds=args.rotate_minutes * 60).start()
+    except (OSError, ValueError) as e:
+        print(f'Cannot start recording: {e}', file=sys.stderr)
+        return 1
+    ctrl.recorder = recorder
+    print(f'Recording to {recorder.path}', file=sys.stderr)
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    try:
+        while deadline is None or time.perf_counter() < deadline:
+            ctrl.get_data()  # Nothing is shown; keep the line queue from filling up
+            time.sleep(0.05)
+    finally:
+        ctrl.recorder = None
+        recorder.stop()
+    stats = recorder.stats()
+    print(f"Recorded {stats['records']} records, {stats['bytes'] / 1e6:.1f} MB in {stats['files']} file(s), "
+          f"{stats['dropped']} dropped", file=sys.stderr)
+    return 0
+
+
+COMMANDS = {'send': cmd_send, 'monitor': cmd_monitor, 'sweep': cmd_sweep, 'capture': cmd_capture}
+
+
+def resolve_port(args):
+    """Port and baud from the arguments, falling back to the cached profile of a plugged in board."""
+    if args.port:
+        return args.port, args.baud or 115200
+    import serial.tools.list_ports as list_ports
+    from stm32_serial import PortProfileStore
+    cached = PortProfileStore().lookup(list_ports.comports())
+    if cached is None:
+        return None, None
+    port, baud = cached
+    return port, args.baud or baud
+
+
+def start_exporters(args):
+    """Metrics endpoint and JSON snapshots, if asked for."""
+    exporters = []
+    if args.metrics_port is not None:
+        from stm32_metrics import MetricsServer
+        server = MetricsServer(port=args.metrics_port).start()
+        print(f'Metrics on http://127.0.0.1:{server.port}/metrics', file=sys.stderr)
+        exporters.append(server)
+    if args.metrics_json:
+        from stm32_metrics import SnapshotWriter
+        exporters.append(SnapshotWriter(args.metrics_json, interval=args.metrics_interval).start())
+    return exporters
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    timings = [('startup', time.perf_counter() - _STARTED)]
+
+    start = time.perf_counter()
+    from stm32_serial import CODECS, ControllerError, SerialController
+    timings.append(('import', time.perf_counter() - start))
+
+    port, baud = resolve_port(args)
+    if port is None:
+        print('No port given and no known board plugged in; use --port', file=sys.stderr)
+        return 1
+    if args.transport == 'async':
+        from stm32_async import AsyncBridge
+        ctrl = AsyncBridge(CODECS[args.codec]())
+    else:
+        ctrl = SerialController(CODECS[args.codec]())
+    ctrl.on_error = lambda message: print(message, file=sys.stderr)
+    start = time.perf_counter()
+    try:
+        ctrl.connect(port, baud)
+    except ControllerError as e:
+        print(e, file=sys.stderr)
+        return 1
+    timings.append(('connect', time.perf_counter() - start))
+    exporters = start_exporters(args)
+    if args.trace:
+        from stm32_trace import TRACER
+        TRACER.start()
+
+    start = time.perf_counter()
+    try:
+        status = COMMANDS[args.command](ctrl, args)
+    except KeyboardInterrupt:
+        status = 0
+    finally:
+        ctrl.disconnect()
+        for exporter in exporters:
+            exporter.stop()
+        if args.trace:
+            TRACER.stop()
+            print(f'Trace: {TRACER.export(args.trace)} spans written to {args.trace}', file=sys.stderr)
+    timings.append((args.command, time.perf_counter() - start))
+    if args.timing:
+        timings.append(('total', time.perf_counter() - _STARTED))
+        print('Timing: ' + ', '.join(f'{name} {seconds * 1000:.1f} ms' for name, seconds in timings), file=sys.stderr)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,326 @@
+"""NumPy signal helpers for the STM32 GUI: sample history, plotting, sine analysis
+and PWM duty tables.
+
+This module needs NumPy; the GUI imports it optionally and hides the
+waveform panel when it is not installed. The sine analysis runs fastest on
+NumPy 2.0 or later, or with SciPy installed, whose FFTs cache their plan
+(twiddle factors) per transform length.
+"""
+import collections
+import functools
+import re
+import threading
+import time
+
+import numpy as np
+
+if int(np.__version__.split('.')[0]) >= 2:
+    _rfft = np.fft.rfft
+else:
+    try:
+        from scipy.fft import rfft as _rfft  # Optional: NumPy 1.x's FFT rebuilds its plan on every call
+    except ImportError:
+        _rfft = np.fft.rfft
+
+# A line of telemetry samples: '2048', '1,2,3', '1 2 3' or 'S:1,2,3'
+_SAMPLE_LINE = re.compile(r'^(?:S:)?\s*-?\d+(?:\.\d+)?(?:\s*[,;\s]\s*-?\d+(?:\.\d+)?)*\s*$')
+# Characters a batch of such lines is made of once the prefixes and separators are spaces
+_SAMPLE_TEXT = re.compile(r'[\d\s.\-]*')
+
+
+def parse_samples(lines):
+    """Return the numeric samples found in received lines as one float64 array.
+
+    Lines that are not purely numeric (acks, log messages) are skipped, so
+    e.g. the digits of 'OK A050F0100' never end up on the plot.
+    """
+    if not lines:
+        return np.empty(0)
+    # Fast path: a batch of pure telemetry converts in one C-level call
+    text = _join(lines)
+    if _SAMPLE_TEXT.fullmatch(text):  # Also keeps 'nan', 'inf' and '1e3' off the plot
+        try:
+            return np.array(text.split(), dtype=np.float64)
+        except ValueError:
+            pass
+    numeric = [line for line in lines if _SAMPLE_LINE.match(line)]
+    return np.array(_join(numeric).split(), dtype=np.float64) if numeric else np.empty(0)
+
+
+def _join(lines):
+    return ' '.join(lines).replace('S:', ' ').replace(',', ' ').replace(';', ' ')
+
+
+class SampleRing:
+    """Fixed-size, preallocated sample history with no per-sample Python objects.
+
+    `extend()` copies whole arrays into the ring with at most two slice
+    assignments; `latest()` returns the newest samples in time order.
+    """
+    def __init__(self, capacity=1 << 20, dtype=np.float64):
+        self.capacity = capacity
+        self.total = 0  # Samples ever written, including overwritten ones
+        self._buf = np.zeros(capacity, dtype=dtype)
+        self._head = 0  # Next write position
+        self._lock = threading.Lock()
+
+    def extend(self, samples):
+        samples = np.asarray(samples, dtype=self._buf.dtype)
+        count = len(samples)
+        if not count:
+            return
+        cap = self.capacity
+        with self._lock:
+            if count >= cap:
+                self._buf[:] = samples[-cap:]
+                self._head = 0
+            else:
+                head = self._head
+                end = head + count
+                if end <= cap:
+                    self._buf[head:end] = samples
+                else:
+                    first = cap - head
+                    self._buf[head:] = samples[:first]
+                    self._buf[:count - first] = samples[first:]
+                self._head = end % cap
+            self.total += count
+
+    def latest(self, count):
+        """Copy of the newest `count` samples (fewer if not filled yet), oldest first."""
+        with self._lock:
+            count = min(count, self.total, self.capacity)
+            start = (self._head - count) % self.capacity
+            if start + count <= self.capacity:
+                return self._buf[start:start + count].copy()
+            return np.concatenate((self._buf[start:], self._buf[:self._head]))
+
+    def clear(self):
+        with self._lock:
+            self._head = 0
+            self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+
+def minmax_decimate(samples, width):
+    """Reduce `samples` to per-column (mins, maxs) for a plot `width` pixels wide.
+
+    Every sample still contributes to the envelope, so peaks are never lost,
+    but the output size depends only on the width. The oldest samples that
+    do not fill a whole column are dropped.
+    """
+    count = len(samples)
+    if count <= width:
+        return samples, samples
+    per_column = count // width
+    blocks = samples[count - per_column * width:].reshape(width, per_column)
+    return blocks.min(axis=1), blocks.max(axis=1)
+
+
+def envelope_coords(samples, width, height, margin=2):
+    """Canvas polyline coordinates [x0, y0, x1, y1, ...] tracing the min/max envelope.
+
+    The vertical scale follows the data range of the visible window.
+    """
+    if len(samples) < 2 or width < 2:
+        return []
+    mins, maxs = minmax_decimate(samples, width)
+    low, high = float(mins.min()), float(maxs.max())
+    span = (high - low) or 1.0
+    scale = (height - 2 * margin) / span
+    xs = np.linspace(0, width - 1, len(mins))
+    # Alternate min and max in each column so one polyline draws the whole envelope
+    points = np.empty((len(mins) * 2, 2))
+    points[0::2, 0] = xs
+    points[1::2, 0] = xs
+    points[0::2, 1] = height - margin - (mins - low) * scale
+    points[1::2, 1] = height - margin - (maxs - low) * scale
+    return points.ravel().tolist()
+
+
+# --- Sine Quality Analysis ---
+SineAnalysis = collections.namedtuple('SineAnalysis', [
+    'frequency',       # Hz, interpolated between FFT bins
+    'amplitude',       # Peak amplitude in sample units
+    'amplitude_pct',   # Peak amplitude as % of full scale
+    'thd_pct',         # Total harmonic distortion, % of the fundamental
+    'snr_db',          # Fundamental power over everything but DC and harmonics
+    'frequency_error_pct',  # Against the last commanded frequency, or None
+    'amplitude_error_pct',  # Against the last commanded amplitude (in % points), or None
+    'window_length',
+])
+
+_LOBE = 5  # Bins either side of a peak counted as its energy (main lobe is +/-4)
+
+
+@functools.lru_cache(maxsize=8)
+def _window(length):
+    """4-term Blackman-Harris window and its energy for one FFT length.
+
+    Its -92 dB sidelobes keep leakage of the fundamental out of the THD and
+    noise estimates. The array is read-only so it can be shared.
+    """
+    phase = 2 * np.pi * np.arange(length) / (length - 1)
+    window = 0.35875 - 0.48829 * np.cos(phase) + 0.14128 * np.cos(2 * phase) - 0.01168 * np.cos(3 * phase)
+    window.setflags(write=False)
+    return window, float(np.sum(window ** 2))
+
+
+def analyze_sine(samples, sample_rate, full_scale=2048.0, harmonics=10, commanded=None):
+    """Measure the fundamental, THD and SNR of `samples` with one windowed FFT.
+
+    `commanded` is the last (amplitude %, frequency Hz) sent to the board; when
+    given, the relative errors of the measurement are filled in. The FFT plan
+    is cached per length (by NumPy 2.0+ or SciPy) and the window here, so
+    repeated calls with the same length only pay for the transform itself.
+    Returns None when the fundamental sits within a few bins of DC (analyse
+    more samples for lower frequencies, see SineAnalyzer.length_for()) or of
+    the Nyquist frequency.
+    """
+    length = len(samples)
+    if length < 16:
+        return None
+    window, energy = _window(length)
+    spectrum = _rfft((samples - samples.mean()) * window)
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+    bins = len(power)
+
+    # Fundamental: strongest bin above DC, refined by parabolic interpolation
+    peak = int(np.argmax(power[2:])) + 2
+    if peak <= _LOBE or peak >= bins - _LOBE - 1:
+        return None  # The fundamental's band would run past DC or the top of the spectrum
+    left, centre, right = np.log(power[peak - 1:peak + 2] + 1e-30)
+    curvature = left - 2 * centre + right
+    offset = 0.5 * (left - right) / curvature if curvature else 0.0
+    frequency = (peak + offset) * sample_rate / length
+
+    # Energy of the fundamental and each harmonic in one gather
+    centres = np.rint(np.arange(1, harmonics + 1) * (peak + offset)).astype(int)
+    centres = centres[centres < bins - _LOBE]
+    if not len(centres):
+        return None  # Interpolation moved the fundamental's band past the top of the spectrum
+    index = centres[:, None] + np.arange(-_LOBE, _LOBE + 1)
+    # At low frequencies neighbouring bands overlap: each bin counts once, for the lowest harmonic
+    claimed, first = np.unique(index.ravel(), return_index=True)
+    band_power = np.bincount(first // index.shape[1], weights=power[claimed], minlength=len(centres))
+    fundamental = band_power[0]
+    harmonic_power = band_power[1:].sum()
+    noise = max(power[2:].sum() - power[claimed[claimed >= 2]].sum(), 1e-30)
+
+    # Parseval: a one-sided band holds length * energy * A^2 / 4
+    amplitude = 2 * np.sqrt(fundamental / (length * energy))
+    amplitude_pct = amplitude / full_scale * 100
+    frequency_error = amplitude_error = None
+    if commanded:
+        commanded_amp, commanded_freq = commanded
+        if commanded_freq:
+            frequency_error = float((frequency - commanded_freq) / commanded_freq * 100)
+        amplitude_error = float(amplitude_pct - commanded_amp)
+    return SineAnalysis(
+        frequency=float(frequency),
+        amplitude=float(amplitude),
+        amplitude_pct=float(amplitude_pct),
+        thd_pct=float(np.sqrt(harmonic_power / fundamental) * 100) if fundamental else 0.0,
+        snr_db=float(10 * np.log10(fundamental / noise)) if fundamental else 0.0,
+        frequency_error_pct=frequency_error,
+        amplitude_error_pct=amplitude_error,
+        window_length=length,
+    )
+
+
+class SineAnalyzer:
+    """Runs analyze_sine() over the newest samples of a SampleRing on a worker thread.
+
+    Every `interval` seconds, if new samples arrived, the latest
+    `window_length` samples are analysed and the result is published in
+    `latest`. The GUI only reads that reference, so it never waits on an FFT.
+    `commanded` is a callable returning the last (amplitude, frequency) sent;
+    low commanded frequencies get a longer window so the fundamental stays
+    clear of DC.
+    """
+    def __init__(self, ring, sample_rate, window_length=4096, interval=0.25,
+                 full_scale=2048.0, harmonics=10, commanded=None):
+        self.ring = ring
+        self.sample_rate = sample_rate
+        self.window_length = window_length
+        self.interval = interval
+        self.full_scale = full_scale
+        self.harmonics = harmonics
+        self.commanded = commanded
+        self.latest = None
+        self.compute_ms = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+
+    def analyze_now(self):
+        """Analyse the current window synchronously and return the result."""
+        if self.sample_rate <= 0:
+            return None
+        commanded = self.commanded() if self.commanded else None
+        length = self.length_for(commanded[1] if commanded else None)
+        if len(self.ring) < length:
+            return None
+        samples = self.ring.latest(length)
+        return analyze_sine(samples, self.sample_rate, self.full_scale, self.harmonics, commanded)
+
+    def length_for(self, frequency):
+        """FFT length, a power of two of at least `window_length`, that puts `frequency` clear of DC."""
+        if not frequency or frequency <= 0:
+            return self.window_length
+        needed = int(np.ceil(self.sample_rate * (_LOBE + 3) / frequency))  # Peak 8+ bins above DC
+        return min(max(self.window_length, 1 << (needed - 1).bit_length()), self.ring.capacity)
+
+    def _run(self):
+        seen = -1
+        while not self._stop_event.wait(self.interval):
+            if self.ring.total == seen:
+                continue
+            seen = self.ring.total
+            start = time.perf_counter()
+            try:
+                result = self.analyze_now()
+            except Exception as e:
+                print(f"Analysis error: {e}")
+                continue
+            self.compute_ms = (time.perf_counter() - start) * 1000
+            if result is not None:
+                self.latest = result
+
+
+# --- PWM Duty Tables ---
+@functools.lru_cache(maxsize=64)
+def duty_table(amplitude, length=256, resolution_bits=12, dead_time=0):
+    """PWM compare values for one sine period, centred on half scale.
+
+    `amplitude` is 0-100 % of the usable swing, `resolution_bits` sets the
+    timer period (2**bits - 1 counts) and `dead_time` (counts) keeps every
+    value inside [dead_time, top - dead_time] so complementary outputs never
+    overlap. Built in one vectorized pass and memoized per parameter set;
+    the returned uint16 array is read-only because it is shared.
+    """
+    if not 0 <= amplitude <= 100:
+        raise ValueError('amplitude must be between 0 and 100')
+    if length < 2:
+        raise ValueError('table length must be at least 2')
+    if not 1 <= resolution_bits <= 16:
+        raise ValueError('resolution must be 1 to 16 bits')
+    top = (1 << resolution_bits) - 1
+    if dead_time < 0 or 2 * dead_time >= top:
+        raise ValueError('dead time leaves no room for a duty cycle')
+    swing = (top - 2 * dead_time) / 2 * amplitude / 100
+    phase = np.arange(length) * (2 * np.pi / length)
+    table = np.rint(top / 2 + swing * np.sin(phase))
+    np.clip(table, dead_time, top - dead_time, out=table)
+    table = table.astype(np.uint16)
+    table.setflags(write=False)
+    return table
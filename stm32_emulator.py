@@ -0,0 +1,442 @@
+"""Software stand-in for the STM32 sine generator firmware.
+
+FirmwareEmulator speaks the board's protocol (ASCII `A###F####` lines or
+the COBS/CRC16 frames, duty table uploads) and streams synthetic sine
+telemetry at a configurable sample rate and noise level, paced by the
+emulated baud rate. Faults can be injected: dropped bytes, garbled lines,
+periodic stalls and a disconnect after a while.
+
+It can be reached three ways:
+
+    emulator://?baud=2000000&sample_rate=40000   in-process port for SerialController
+    python stm32_emulator.py pty                  a pseudo-terminal (POSIX), e.g. /dev/pts/5
+    python stm32_emulator.py tcp --listen 7777    then connect to socket://localhost:7777
+"""
+import argparse
+import math
+import os
+import random
+import select
+import socket
+import struct
+import sys
+import time
+
+import serial
+
+from stm32_serial import CODECS, CobsCrcCodec, cobs_decode, crc16_ccitt
+
+_SINE_BITS = 12
+_SINE = [math.sin(2 * math.pi * i / (1 << _SINE_BITS)) for i in range(1 << _SINE_BITS)]
+
+
+class FirmwareEmulator:
+    """The firmware's behaviour, driven by the caller's clock.
+
+    `receive(data)` consumes bytes from the host and queues the replies;
+    `read(size)` generates the telemetry due by now and returns at most what
+    the emulated UART could have sent since the last call. If the host
+    reads slower than the telemetry is produced, whole lines are skipped
+    and counted as overruns, like a firmware TX buffer overflowing. A `baud`
+    of 0 lifts the link limit. Fault rates are probabilities per byte
+    (`drop_rate`) and per line (`garble_rate`).
+    """
+    def __init__(self, codec='ascii', sample_rate=10000, samples_per_line=32, noise=0.0, baud=115200,
+                 amplitude=50, frequency=100, full_scale=2048, telemetry=True, drop_rate=0.0, garble_rate=0.0,
+                 stall_every=0.0, stall_for=0.0, disconnect_after=0.0, seed=None):
+        if codec not in CODECS:
+            raise ValueError(f'unknown codec {codec!r}')
+        self.codec = CODECS[codec]()
+        self.sample_rate = sample_rate
+        self.samples_per_line = samples_per_line
+        self.noise = noise
+        self.baud = baud
+        self.amplitude = amplitude
+        self.frequency = frequency
+        self.full_scale = full_scale
+        self.telemetry = telemetry
+        self.drop_rate = drop_rate
+        self.garble_rate = garble_rate
+        self.stall_every = stall_every
+        self.stall_for = stall_for
+        self.disconnect_after = disconnect_after
+        self.table = None  # (resolution bits, values) of the last uploaded duty table
+        self.commands = 0
+        self.tables = 0
+        self.errors = 0  # Host input that could not be parsed
+        self.lines_out = 0
+        self.bytes_out = 0
+        self.overruns = 0  # Telemetry lines skipped because the link was full
+        self.dropped_bytes = 0
+        self.garbled_lines = 0
+        self._rng = random.Random(seed)
+        self._out = bytearray()
+        self._in = bytearray()
+        self._table_header = None  # (length, bits) while an ASCII table body is expected
+        self._phase = 0.0  # In sine table steps
+        self.start()
+
+    def start(self, now=None):
+        """(Re)start the clocks, e.g. when a host connects."""
+        self._started = time.perf_counter() if now is None else now
+        self._last = self._started
+        self._tokens = 0.0
+        self._lines_due = 0
+        self._out.clear()
+
+    # --- Clock ---
+    @property
+    def bytes_per_second(self):
+        return self.baud / 10 if self.baud else 0  # 8N1: 10 bits per byte
+
+    def disconnected(self, now=None):
+        now = time.perf_counter() if now is None else now
+        return bool(self.disconnect_after) and now - self._started >= self.disconnect_after
+
+    def stalled(self, now=None):
+        if not (self.stall_every and self.stall_for):
+            return False
+        now = time.perf_counter() if now is None else now
+        return (now - self._started) % self.stall_every >= self.stall_every - self.stall_for
+
+    # --- Host -> MCU ---
+    def receive(self, data):
+        if isinstance(self.codec, CobsCrcCodec):
+            for frame in self.codec.framer.feed(data):
+                if frame:
+                    self._handle_frame(frame)
+            return
+        self._in += data
+        while True:
+            if self._table_header is not None:
+                length, bits = self._table_header
+                size = 2 * length + 2
+                if len(self._in) < size:
+                    return
+                body, (crc,) = bytes(self._in[:size - 2]), struct.unpack('<H', self._in[size - 2:size])
+                del self._in[:size]
+                self._table_header = None
+                self._handle_table(bits, body, crc16_ccitt(body) == crc)
+                continue
+            end = self._in.find(b'\n')
+            if end < 0:
+                return
+            line = self._in[:end].decode(errors='replace').strip()
+            del self._in[:end + 1]
+            if line:
+                self._handle_line(line)
+
+    def _handle_line(self, line):
+        if line.startswith('T') and 'B' in line:
+            try:
+                length, bits = (int(part) for part in line[1:].split('B', 1))
+            except ValueError:
+                pass
+            else:
+                self._table_header = (length, bits)
+                return
+        if len(line) == 9 and line[0] == 'A' and line[4] == 'F' and line[1:4].isdigit() and line[5:].isdigit():
+            self._handle_command(int(line[1:4]), int(line[5:]))
+        else:
+            self.errors += 1
+            self._reply(f'ERR {line}')
+
+    def _handle_frame(self, frame):
+        try:
+            raw = cobs_decode(frame)
+        except ValueError:
+            raw = b''
+        if len(raw) < 3 or crc16_ccitt(raw[:-2]) != struct.unpack('<H', raw[-2:])[0]:
+            self.errors += 1
+            self._reply('ERR CRC')
+            return
+        frame_type, body = raw[0], raw[1:-2]
+        if frame_type == CobsCrcCodec.COMMAND and len(body) == 3:
+            self._handle_command(*struct.unpack('<BH', body))
+        elif frame_type == CobsCrcCodec.TABLE and len(body) % 2 == 1:
+            self._handle_table(body[0], body[1:], True)
+        elif frame_type == CobsCrcCodec.TEXT:
+            self.errors += 1
+            self._reply(f'ERR {body.decode(errors="replace")}')
+        else:
+            self.errors += 1
+            self._reply('ERR FRAME')
+
+    def _handle_command(self, amplitude, frequency):
+        command = f'A{amplitude:03d}F{frequency:04d}'
+        if 0 <= amplitude <= 100 and 1 <= frequency <= 1000:
+            self.amplitude, self.frequency = amplitude, frequency
+            self.commands += 1
+            self._reply(f'OK {command}')
+        else:
+            self.errors += 1
+            self._reply(f'ERR {command}')
+
+    def _handle_table(self, bits, body, crc_ok):
+        header = f'T{len(body) // 2:04d}B{bits:02d}'
+        if not crc_ok:
+            self.errors += 1
+            self._reply(f'ERR {header} CRC')
+            return
+        self.table = (bits, struct.unpack(f'<{len(body) // 2}H', body))
+        self.tables += 1
+        self._reply(f'OK {header}')
+
+    # --- MCU -> host ---
+    def _reply(self, text):
+        self._emit(self.codec.encode_text(text + '\n'))
+
+    def _emit(self, frame):
+        """Queue one encoded frame, applying the configured faults."""
+        rng = self._rng
+        if self.garble_rate and rng.random() < self.garble_rate:
+            frame = bytearray(frame)
+            frame[rng.randrange(len(frame))] = rng.randrange(256)
+            self.garbled_lines += 1
+        if self.drop_rate and rng.random() < self.drop_rate * len(frame):
+            index = rng.randrange(len(frame))
+            frame = frame[:index] + frame[index + 1:]
+            self.dropped_bytes += 1
+        self._out += frame
+        self.lines_out += 1
+
+    def _generate(self, now):
+        """Queue the telemetry lines due by `now`, skipping those the link can't carry."""
+        per_line = self.samples_per_line
+        due = int((now - self._started) * self.sample_rate / per_line)
+        count, self._lines_due = due - self._lines_due, due
+        if count <= 0:
+            return
+        # Keep at most ~100 ms of output queued (1 MB without a link limit)
+        backlog = self.bytes_per_second * 0.1 if self.baud else 1 << 20
+        scale = self.full_scale * self.amplitude / 100
+        step = self.frequency / self.sample_rate * len(_SINE)
+        mask = len(_SINE) - 1
+        noise, gauss = self.noise, self._rng.gauss
+        encode_samples = getattr(self.codec, 'encode_samples', None)
+        for index in range(count):
+            if len(self._out) > backlog:
+                # The rest can't be sent either: skip them in one step
+                skipped = count - index
+                self.overruns += skipped
+                self._phase = (self._phase + step * per_line * skipped) % len(_SINE)
+                break
+            phase = self._phase
+            self._phase = (phase + step * per_line) % len(_SINE)
+            values = [int(scale * _SINE[int(phase + i * step) & mask]) for i in range(per_line)]
+            if noise:
+                values = [min(max(int(v + gauss(0, noise)), -32768), 32767) for v in values]
+            if encode_samples is not None:
+                self._emit(encode_samples(values))
+            else:
+                self._emit(self.codec.encode_text('S:' + ','.join(map(str, values)) + '\n'))
+
+    def pending(self, now=None):
+        """Bytes that could be read right now."""
+        now = time.perf_counter() if now is None else now
+        if self.stalled(now):
+            return 0
+        if self.telemetry:
+            self._generate(now)
+        if not self.baud:
+            return len(self._out)
+        return min(len(self._out), int(self._tokens + (now - self._last) * self.bytes_per_second))
+
+    def read(self, size=1 << 16, now=None):
+        now = time.perf_counter() if now is None else now
+        if self.stalled(now):
+            self._last = now  # The UART idles while stalled
+            return b''
+        if self.telemetry:
+            self._generate(now)
+        if self.baud:
+            # Token bucket holding at most 10 ms of line time, so there are no bursts after idling
+            rate = self.bytes_per_second
+            self._tokens = min(self._tokens + (now - self._last) * rate, max(rate * 0.01, 64))
+            self._last = now
+            size = min(size, int(self._tokens))
+        data = bytes(self._out[:size])
+        del self._out[:len(data)]
+        self._tokens -= len(data)
+        self.bytes_out += len(data)
+        return data
+
+    def stats(self):
+        return {
+            'commands': self.commands,
+            'tables': self.tables,
+            'errors': self.errors,
+            'lines_out': self.lines_out,
+            'bytes_out': self.bytes_out,
+            'overruns': self.overruns,
+            'dropped_bytes': self.dropped_bytes,
+            'garbled_lines': self.garbled_lines,
+        }
+
+
+def parse_options(options):
+    """FirmwareEmulator keyword arguments from string options (URL query or command line)."""
+    kwargs = {}
+    for key, convert in (('codec', str), ('sample_rate', float), ('samples_per_line', int), ('noise', float),
+                         ('baud', int), ('amplitude', int), ('frequency', int), ('drop', float),
+                         ('garble', float), ('disconnect', float), ('seed', int)):
+        if options.get(key) not in (None, ''):
+            name = {'drop': 'drop_rate', 'garble': 'garble_rate', 'disconnect': 'disconnect_after'}.get(key, key)
+            kwargs[name] = convert(options[key])
+    if options.get('stall'):
+        every, _, duration = str(options['stall']).partition(':')
+        kwargs['stall_every'], kwargs['stall_for'] = float(every), float(duration or 0.5)
+    if options.get('telemetry') in ('0', 'false'):
+        kwargs['telemetry'] = False
+    return kwargs
+
+
+# --- Transports ---
+class EmulatedPort:
+    """In-process serial-like port backed by a FirmwareEmulator.
+
+    Opened by SerialController for 'emulator://?baud=...&sample_rate=...'
+    (see parse_options for the keys). An injected disconnect raises
+    SerialException, exactly like a pulled USB cable.
+    """
+    SCHEME = 'emulator://'
+
+    def __init__(self, emulator, timeout=0.01):
+        self.emulator = emulator
+        self.port = self.SCHEME
+        self.baudrate = emulator.baud
+        self.timeout = timeout
+        self.is_open = True
+
+    @classmethod
+    def from_url(cls, url, timeout=0.01):
+        import urllib.parse
+        options = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))
+        return cls(FirmwareEmulator(**parse_options(options)), timeout=timeout)
+
+    def _check(self):
+        if not self.is_open:
+            raise serial.PortNotOpenError()
+        if self.emulator.disconnected():
+            raise serial.SerialException('emulated disconnect')
+
+    @property
+    def in_waiting(self):
+        self._check()
+        return self.emulator.pending()
+
+    def read(self, size=1):
+        self._check()
+        deadline = None if self.timeout is None else time.perf_counter() + self.timeout
+        while True:
+            data = self.emulator.read(size)
+            if data or (deadline is not None and time.perf_counter() >= deadline):
+                return data
+            time.sleep(0.0005)
+            self._check()
+
+    def write(self, data):
+        self._check()
+        self.emulator.receive(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+def _pump(emulator, fd_read, fd_write, write):
+    """Shuttle bytes between a file descriptor and the emulator until it disconnects or the peer goes away."""
+    emulator.start()
+    unsent = b''
+    while not emulator.disconnected():
+        readable, _, _ = select.select([fd_read], [], [], 0.001)
+        if readable:
+            try:
+                data = os.read(fd_read, 65536) if isinstance(fd_read, int) else fd_read.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return  # Peer closed
+            emulator.receive(data)
+        if len(unsent) < 65536:  # Otherwise the backlog shows up as overruns in the emulator
+            unsent += emulator.read()
+        if unsent:
+            try:
+                sent = write(unsent)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                return
+            unsent = unsent[sent:]
+
+
+def serve_pty(emulator):
+    """Run the emulator on a new pseudo-terminal; the host opens the printed device."""
+    import tty
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    os.set_blocking(master, False)
+    print(f'Emulated board on {os.ttyname(slave)}', flush=True)
+    try:
+        _pump(emulator, master, master, lambda data: os.write(master, data))
+    finally:
+        os.close(master)
+        os.close(slave)
+
+
+def serve_tcp(make_emulator, host='127.0.0.1', port=7777):
+    """Serve one host at a time on TCP (pyserial URL socket://host:port); each gets a fresh board."""
+    with socket.create_server((host, port)) as server:
+        print(f'Emulated board on socket://{host}:{port}', flush=True)
+        while True:
+            client, address = server.accept()
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client.setblocking(False)
+            emulator = make_emulator()
+            print(f'Host connected from {address[0]}:{address[1]}', flush=True)
+            with client:
+                _pump(emulator, client, client, client.send)
+            print(f'Host gone: {emulator.stats()}', flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='stm32_emulator', description='Emulate the STM32 sine generator.')
+    parser.add_argument('transport', choices=['pty', 'tcp'])
+    parser.add_argument('--listen', default='7777', help='TCP [host:]port (default 7777 on localhost)')
+    parser.add_argument('--codec', default='ascii', choices=list(CODECS))
+    parser.add_argument('--baud', type=int, default=115200, help='emulated link speed, 0 for unlimited')
+    parser.add_argument('--sample-rate', type=float, default=10000.0, help='telemetry samples per second')
+    parser.add_argument('--samples-per-line', type=int, default=32)
+    parser.add_argument('--noise', type=float, default=0.0, help='Gaussian noise, standard deviation in counts')
+    parser.add_argument('--no-telemetry', action='store_true', help='only answer commands')
+    parser.add_argument('--drop', type=float, default=0.0, help='probability of dropping each byte')
+    parser.add_argument('--garble', type=float, default=0.0, help='probability of corrupting each line')
+    parser.add_argument('--stall', help='EVERY:SECONDS, e.g. 5:0.5 stops output 0.5 s out of every 5 s')
+    parser.add_argument('--disconnect', type=float, default=0.0, help='drop the connection after this many seconds')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+    kwargs = parse_options({
+        'codec': args.codec, 'baud': args.baud, 'sample_rate': args.sample_rate,
+        'samples_per_line': args.samples_per_line, 'noise': args.noise, 'drop': args.drop,
+        'garble': args.garble, 'stall': args.stall, 'disconnect': args.disconnect, 'seed': args.seed,
+    })
+    kwargs['telemetry'] = not args.no_telemetry
+    try:
+        if args.transport == 'pty':
+            serve_pty(FirmwareEmulator(**kwargs))
+        else:
+            host, _, port = args.listen.rpartition(':')
+            serve_tcp(lambda: FirmwareEmulator(**kwargs), host or '127.0.0.1', int(port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
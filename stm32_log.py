@@ -0,0 +1,245 @@
+"""Session log of the serial monitor, kept outside Tk and indexed for search.
+
+LogStore appends every monitor line to one UTF-8 bytearray and keeps, per
+line, its end offset, tag and time in typed arrays, plus the line numbers
+of each tag. Searching runs one compiled bytes regex over the blob, so it
+stays in C until a match is found, whatever the number of lines:
+
+    store = LogStore()
+    store.extend([('⬅️ Received: S:1,2\\n', 'received')])
+    pattern = compile_pattern('s:1', regex=False)
+    number = store.search(pattern, store.first)
+    text, tag, when = store.line(number)
+
+Line numbers never change: trimming the oldest lines (beyond `max_lines`)
+or clearing the store only moves `first` forward. LogFilter keeps the line
+numbers matching a pattern, tags and a time window up to date as lines
+are appended, for a view that shows only those.
+"""
+import bisect
+import heapq
+import re
+import time
+from array import array
+
+
+def compile_pattern(text, regex=False, ignore_case=True):
+    """Bytes regex for LogStore searches; raises re.error for an invalid regex.
+
+    Case is folded for ASCII letters only, as the search runs on UTF-8 bytes,
+    and not at all for text without letters (e.g. sample values), which
+    keeps the regex engine's much faster case-sensitive scan.
+    """
+    data = text.encode()
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case and data.lower() != data.upper() else 0)
+    return re.compile(data if regex else re.escape(data), flags)
+
+
+class LogStore:
+    """Append-only log lines: one UTF-8 blob plus per-line offsets, tags and times."""
+    def __init__(self, max_lines=1000000):
+        self.max_lines = max_lines  # Oldest lines are dropped beyond this, 10% at a time
+        self.tag_names = []  # tag id -> tag
+        self._tag_ids = {}  # tag -> tag id
+        self.first = 0  # Number of the oldest line kept
+        self.trimmed = 0  # Lines dropped because of max_lines
+        self._reset()
+
+    def _reset(self):
+        self._blob = bytearray()  # Every line, each ending with '\n'
+        self._base = 0  # Blob offset of the oldest line; offsets below are absolute
+        self._offsets = array('Q', [0])  # Line i ends at _offsets[i + 1] (absolute)
+        self._tags = array('B')
+        self._times = array('d')  # time.time() of each line, never decreasing
+        self._by_tag = {tag_id: array('Q') for tag_id in range(len(self.tag_names))}  # tag id -> line numbers
+
+    def clear(self):
+        """Drop every line; numbering carries on from where it was."""
+        end = self.end
+        self._reset()
+        self.first = end
+
+    def __len__(self):
+        return len(self._tags)
+
+    @property
+    def end(self):
+        """Number the next appended line will get."""
+        return self.first + len(self._tags)
+
+    @property
+    def nbytes(self):
+        """Memory held by the blob and the indexes."""
+        arrays = [self._offsets, self._tags, self._times] + list(self._by_tag.values())
+        return len(self._blob) + sum(len(a) * a.itemsize for a in arrays)
+
+    def _tag_id(self, tag):
+        tag_id = self._tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = self._tag_ids[tag] = len(self.tag_names)
+            self.tag_names.append(tag)
+            self._by_tag[tag_id] = array('Q')
+        return tag_id
+
+    # --- Appending ---
+    def extend(self, records, when=None):
+        """Append (message, tag) records; a message holding several lines adds one line per line."""
+        when = time.time() if when is None else when
+        if self._times and when < self._times[-1]:
+            when = self._times[-1]  # The clock went back: keep the time index sorted
+        blob, offsets, tags, by_tag = self._blob, self._offsets, self._tags, self._by_tag
+        end, number = offsets[-1], self.end
+        for message, tag in records:
+            tag_id = self._tag_id(tag)
+            data = message.encode()
+            if not data.endswith(b'\n'):
+                data += b'\n'
+            blob += data
+            count = data.count(b'\n')
+            if count == 1:
+                end += len(data)
+                offsets.append(end)
+                tags.append(tag_id)
+                by_tag[tag_id].append(number)
+            else:
+                for piece in data.split(b'\n')[:-1]:
+                    end += len(piece) + 1
+                    offsets.append(end)
+                tags.extend(array('B', [tag_id]) * count)
+                by_tag[tag_id].extend(range(number, number + count))
+            number += count
+        self._times.extend(array('d', [when]) * (len(tags) - len(self._times)))
+        if len(tags) > self.max_lines + self.max_lines // 10:
+            self._trim(len(tags) - self.max_lines)
+
+    def _trim(self, count):
+        """Drop the `count` oldest lines in one go."""
+        offsets = self._offsets
+        cut = offsets[count]
+        del self._blob[:cut - self._base]
+        self._base = cut
+        del offsets[:count]
+        del self._tags[:count]
+        del self._times[:count]
+        self.first += count
+        self.trimmed += count
+        for numbers in self._by_tag.values():
+            del numbers[:bisect.bisect_left(numbers, self.first)]
+
+    # --- Reading ---
+    def line(self, number):
+        """(text, tag, time) of one line."""
+        index = number - self.first
+        if not 0 <= index < len(self._tags):
+            raise IndexError(f'line {number} is not in the log')
+        return self._text(index), self.tag_names[self._tags[index]], self._times[index]
+
+    def get(self, numbers):
+        """(text, tag) of each line number, e.g. the rows on screen."""
+        first, tags, names = self.first, self._tags, self.tag_names
+        return [(self._text(number - first), names[tags[number - first]]) for number in numbers]
+
+    def _text(self, index):
+        base = self._base
+        return self._blob[self._offsets[index] - base:self._offsets[index + 1] - base - 1].decode()
+
+    def line_at_time(self, when):
+        """Number of the first line logged at or after `when` (time.time()); `end` if none."""
+        return self.first + bisect.bisect_left(self._times, when)
+
+    # --- Searching ---
+    def tag_lines(self, tags, start=None, stop=None):
+        """Sorted numbers of the lines carrying one of `tags`, between `start` and `stop`."""
+        start = self.first if start is None else start
+        stop = self.end if stop is None else stop
+        ranges = []
+        for tag in tags:
+            tag_id = self._tag_ids.get(tag)
+            if tag_id is not None:
+                numbers = self._by_tag[tag_id]
+                ranges.append(numbers[bisect.bisect_left(numbers, start):bisect.bisect_left(numbers, stop)])
+        if len(ranges) == 1:
+            return ranges[0]
+        return array('Q', heapq.merge(*ranges))
+
+    def matches(self, pattern=None, start=None, stop=None, tags=None):
+        """Yield the numbers of the lines in [start, stop) that match `pattern` and carry one of `tags`.
+
+        `pattern` comes from compile_pattern(); None matches every line, as does `tags=None`.
+        """
+        start = max(self.first, self.first if start is None else start)
+        stop = min(self.end, self.end if stop is None else stop)
+        if start >= stop:
+            return
+        if pattern is None:
+            yield from (range(start, stop) if tags is None else self.tag_lines(tags, start, stop))
+            return
+        tag_ids = None if tags is None else {self._tag_ids.get(tag) for tag in tags}
+        blob, offsets, line_tags, first, base = self._blob, self._offsets, self._tags, self.first, self._base
+        search, locate = pattern.search, bisect.bisect_right
+        pos, endpos = offsets[start - first] - base, offsets[stop - first] - base
+        while True:
+            match = search(blob, pos, endpos)
+            if match is None or match.start() >= endpos:
+                return  # An empty match at endpos belongs to no line in [start, stop)
+            index = locate(offsets, match.start() + base) - 1
+            if tag_ids is None or line_tags[index] in tag_ids:
+                yield first + index
+            pos = offsets[index + 1] - base  # Next line: one hit per line is enough
+
+    def search(self, pattern, start, backward=False, tags=None, since=None):
+        """Number of the nearest matching line from `start` (inclusive) onwards, or before it if `backward`.
+
+        Only lines carrying one of `tags` and logged at or after `since`
+        count. Returns None without a match.
+        """
+        lowest = self.first if since is None else self.line_at_time(since)
+        if not backward:
+            return next(self.matches(pattern, max(start, lowest), None, tags), None)
+        stop, step = min(start, self.end), 65536
+        while stop > lowest:
+            # Regexes only run forwards: take the last match of ever earlier blocks
+            block_start, found = max(lowest, stop - step), None
+            for found in self.matches(pattern, block_start, stop, tags):
+                pass
+            if found is not None:
+                return found
+            stop = block_start
+        return None
+
+
+class LogFilter:
+    """Numbers of the lines of a LogStore matching a pattern, tags and a time window, kept up to date.
+
+    `window` is in seconds back from now; None keeps every line. update()
+    only tests the lines appended since the previous call, and at most
+    `limit` of them, so a filter over a long log can be built a slice per
+    GUI tick while `pending` is non-zero.
+    """
+    def __init__(self, store, pattern=None, tags=None, window=None):
+        self.store = store
+        self.pattern = pattern
+        self.tags = tags
+        self.window = window
+        self.index = array('Q')
+        self._end = store.first  # Lines before this were already tested
+
+    @property
+    def pending(self):
+        """Lines not tested yet."""
+        return self.store.end - max(self._end, self.store.first)
+
+    def update(self, now=None, limit=None):
+        """Test new lines (up to `limit`), drop the ones trimmed or out of the window; returns `index`."""
+        store, index = self.store, self.index
+        start = max(self._end, store.first)
+        stop = store.end if limit is None else min(store.end, start + limit)
+        if stop > start:
+            index.extend(store.matches(self.pattern, start, stop, self.tags))
+        self._end = stop
+        oldest = store.first
+        if self.window is not None:
+            oldest = max(oldest, store.line_at_time((time.time() if now is None else now) - self.window))
+        if index and index[0] < oldest:
+            del index[:bisect.bisect_left(index, oldest)]
+        return index
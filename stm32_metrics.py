@@ -0,0 +1,313 @@
+"""Low-overhead metrics for the serial pipeline, exported for Prometheus and as JSON.
+
+    from stm32_metrics import REGISTRY
+    rx_bytes = REGISTRY.counter('stm32_bytes_total', 'Bytes through the serial port', direction='rx')
+    rx_bytes.inc(len(data))
+
+Updating a metric is a few attribute operations without a lock, cheap
+enough to leave on in the read path (see benchmarks/bench_metrics.py).
+Each metric should be updated from one thread at a time; concurrent
+increments from several threads can occasionally lose one. Gauges can
+instead be backed by a function called only when the metrics are
+collected. MetricsServer serves the Prometheus text format on a local port
+and SnapshotWriter appends JSON snapshots to a file; the modules they need
+are imported when they start.
+"""
+import bisect
+import threading
+import time
+
+# Histogram bucket upper bounds
+SIZE_BUCKETS = (1, 4, 16, 64, 256, 1024, 4096, 16384, 65536)
+SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+# --- Metric Types ---
+class Counter:
+    """A value that only goes up."""
+    kind = 'counter'
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, self.labels, self.value
+
+    def snapshot(self):
+        return {'value': self.value}
+
+
+class Gauge:
+    """A value that goes up and down, set directly or read from `fn` at collection time."""
+    kind = 'gauge'
+
+    def __init__(self, name, help, labels, fn=None):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.fn = fn
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.fn() if self.fn is not None else self.value
+
+    def samples(self):
+        yield self.name, self.labels, self.get()
+
+    def snapshot(self):
+        return {'value': self.get()}
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum and count."""
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels, buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            yield self.name + '_bucket', dict(self.labels, le=_format_value(bound)), cumulative
+        yield self.name + '_sum', self.labels, self.sum
+        yield self.name + '_count', self.labels, self.count
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (0-1); 0 without observations."""
+        if not self.count:
+            return 0
+        rank, cumulative = q * self.count, 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        return {'count': self.count, 'sum': self.sum, 'p50': self.quantile(0.5), 'p99': self.quantile(0.99),
+                'buckets': dict(zip([_format_value(b) for b in self.buckets] + ['+Inf'], self.counts))}
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# --- Registry ---
+class Registry:
+    """Named metrics, created on first use and shared by everyone asking for the same name and labels."""
+    def __init__(self):
+        self._metrics = {}  # (name, sorted label items) -> metric
+        self._lock = threading.Lock()  # Only taken to create metrics and to collect them
+
+    def _get(self, cls, name, help, labels, **options):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = cls(name, help, labels, **options)
+            elif not isinstance(metric, cls):
+                raise ValueError(f'{name} is already registered as a {metric.kind}')
+        return metric
+
+    def counter(self, name, help='', **labels):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help='', fn=None, **labels):
+        gauge = self._get(Gauge, name, help, labels)
+        if fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name, help='', buckets=SECONDS_BUCKETS, **labels):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def metrics(self):
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines, described = [], set()
+        for metric in self.metrics():
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f'# HELP {metric.name} {metric.help}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                if labels:
+                    name += '{' + ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items()) + '}'
+                lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """All metrics as a JSON-serializable dict."""
+        return {
+            'time': time.time(),
+            'metrics': [dict(name=metric.name, type=metric.kind, labels=metric.labels, **metric.snapshot())
+                        for metric in self.metrics()],
+        }
+
+
+# The registry the pipeline reports to unless told otherwise
+REGISTRY = Registry()
+
+
+class PipelineMetrics:
+    """The metrics one serial connection updates; `labels` tell connections apart."""
+    def __init__(self, registry=None, **labels):
+        registry = registry or REGISTRY
+        self.rx_bytes = registry.counter('stm32_bytes_total', 'Bytes through the serial port',
+                                         direction='rx', **labels)
+        self.tx_bytes = registry.counter('stm32_bytes_total', 'Bytes through the serial port',
+                                         direction='tx', **labels)
+        self.rx_lines = registry.counter('stm32_lines_total', 'Lines or frames received, commands written',
+                                         direction='rx', **labels)
+        self.tx_lines = registry.counter('stm32_lines_total', 'Lines or frames received, commands written',
+                                         direction='tx', **labels)
+        self.read_sizes = registry.histogram('stm32_read_chunk_bytes', 'Bytes returned per read of the port',
+                                             buckets=SIZE_BUCKETS, **labels)
+        self.queue_depth = registry.gauge('stm32_queue_depth_lines', 'Received lines waiting for the consumer',
+                                          **labels)
+        self.dropped = registry.counter('stm32_dropped_lines_total',
+                                        'Lines discarded because the consumer fell behind', **labels)
+        self.decode_errors = registry.counter('stm32_decode_errors_total', 'Frames the codec rejected', **labels)
+        self.io_errors = registry.counter('stm32_io_errors_total', 'Unexpected read and write errors', **labels)
+        self.connects = registry.counter('stm32_connects_total', 'Successful connections', **labels)
+        self.link_lost = registry.counter('stm32_link_lost_total', 'Ports that failed while connected', **labels)
+        self.tx_latency = registry.histogram('stm32_tx_latency_seconds', 'Command queued to its bytes written',
+                                             **labels)
+        self.rtt = registry.histogram('stm32_rtt_seconds', 'Command sent to its acknowledgement received',
+                                      **labels)
+
+
+# --- Export ---
+class MetricsServer:
+    """Serves a registry on a daemon thread: /metrics (Prometheus text) and /metrics.json.
+
+    Binds to localhost by default; `port=0` picks a free port (see `self.port`).
+    """
+    def __init__(self, registry=None, host='127.0.0.1', port=9464):
+        self.registry = registry or REGISTRY
+        self.host = host
+        self.port = port
+        self._server = None
+
+    def start(self):
+        import json
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                if path == '/metrics':
+                    body, content_type = registry.render_prometheus(), 'text/plain; version=0.0.4; charset=utf-8'
+                elif path == '/metrics.json':
+                    body, content_type = json.dumps(registry.snapshot()), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the console
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class SnapshotWriter:
+    """Appends a JSON snapshot of a registry to `path` every `interval` seconds, one per line.
+
+    Each snapshot also carries `rates`: the per-second increase of every
+    counter since the previous snapshot.
+    """
+    def __init__(self, path, registry=None, interval=10.0):
+        self.path = path
+        self.registry = registry or REGISTRY
+        self.interval = interval
+        self.written = 0
+        self._previous = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """Stop, after writing one last snapshot."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def write(self):
+        import json
+        snapshot = self.registry.snapshot()
+        counters = {(m['name'], json.dumps(m['labels'], sort_keys=True)): m['value']
+                    for m in snapshot['metrics'] if m['type'] == 'counter'}
+        if self._previous is not None:
+            previous_time, previous = self._previous
+            elapsed = max(snapshot['time'] - previous_time, 1e-9)
+            snapshot['rates'] = [{'name': name, 'labels': json.loads(labels),
+                                  'per_s': (value - previous.get((name, labels), 0)) / elapsed}
+                                 for (name, labels), value in counters.items()]
+        self._previous = (snapshot['time'], counters)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(snapshot) + '\n')
+        self.written += 1
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._write_safely()
+        self._write_safely()
+
+    def _write_safely(self):
+        try:
+            self.write()
+        except (OSError, ValueError) as e:
+            print(f"Metrics snapshot error: {e}")
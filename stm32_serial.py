@@ -0,0 +1,1405 @@
+"""Serial transport and controller shared by the STM32 GUI and command line.
+
+Nothing in this module imports tkinter, so it can be used from scripts, CI
+and benchmarks without a display. Modules only some commands need
+(concurrent.futures, json, selectors) are imported where they are used to
+keep startup short.
+"""
+import binascii
+import collections
+import math
+import os
+import queue
+import struct
+import sys
+import threading
+from array import array
+import time
+
+import serial
+import serial.tools.list_ports
+
+from stm32_capture import RX, TX, ReplayPort
+from stm32_metrics import PipelineMetrics
+from stm32_trace import TRACER
+
+# Baud rates offered by the GUI, in the order autoconnect tries them
+BAUDRATES = (9600, 19200, 38400, 57600, 115200, 230400, 500000, 1000000, 2000000)
+
+
+# --- Line Framing ---
+class LineFramer:
+    """Splits a raw byte stream into delimiter-terminated lines.
+
+    Chunks are appended to a single bytearray and every delimiter in the new
+    data is found in one pass. Consumed bytes are released with one front
+    deletion per chunk (O(1) for bytearray), so a burst of N lines costs O(N)
+    instead of the O(N^2) of re-splitting an immutable buffer.
+    """
+    def __init__(self, delimiter=b'\n', max_line_length=4096):
+        if not delimiter:
+            raise ValueError('delimiter must not be empty')
+        self.delimiter = bytes(delimiter)
+        self.max_line_length = max_line_length
+        self.overflows = 0  # Lines cut because they exceeded max_line_length
+        self._buf = bytearray()
+        self._scan_from = 0  # Offset in _buf that still needs searching
+
+    def feed(self, data):
+        """Append a chunk and return the list of complete lines (without delimiter).
+
+        Lines longer than `max_line_length` are cut into pieces of that
+        length, at the same places however the stream was split into chunks.
+        """
+        buf = self._buf
+        buf += data
+        delim = self.delimiter
+        step = len(delim)
+        limit = self.max_line_length
+        lines = []
+        start = 0
+        pos = buf.find(delim, self._scan_from)
+        if pos != -1:
+            with memoryview(buf) as view:
+                while pos != -1:
+                    if limit and pos - start > limit:
+                        start = self._cut(view, start, pos, lines)
+                    lines.append(view[start:pos].tobytes())
+                    start = pos + step
+                    pos = buf.find(delim, start)
+            del buf[:start]
+
+        # Guard against a sender that never terminates its lines. The last
+        # step - 1 bytes may begin a delimiter, so they are not cut off yet.
+        known = len(buf) - step + 1
+        if limit and known > limit:
+            with memoryview(buf) as view:
+                start = self._cut(view, 0, known, lines)
+            del buf[:start]
+
+        # A delimiter may straddle the next chunk boundary
+        self._scan_from = max(len(buf) - step + 1, 0)
+        return lines
+
+    def _cut(self, view, start, end, lines):
+        """Append `limit`-sized pieces of view[start:end] while more than `limit` bytes remain; returns the new start."""
+        limit = self.max_line_length
+        while end - start > limit:
+            lines.append(view[start:start + limit].tobytes())
+            start += limit
+            self.overflows += 1
+        return start
+
+    def flush(self):
+        """Return any unterminated trailing bytes and reset the framer."""
+        tail = bytes(self._buf)
+        self.reset()
+        return tail
+
+    def reset(self):
+        self._buf.clear()
+        self._scan_from = 0
+
+    @property
+    def pending(self):
+        """Number of buffered bytes not yet terminated by a delimiter."""
+        return len(self._buf)
+
+
+# --- Reader to GUI Hand-off ---
+class LineBatchQueue:
+    """Bounded swap-buffer between the reader thread and the GUI.
+
+    The reader publishes every line of a read with one `put_batch()` and the
+    GUI takes everything since its last tick with one `drain()`, so each side
+    pays one lock acquisition per batch rather than per line. When more than
+    `capacity` lines are waiting the oldest are discarded and counted in
+    `dropped`; `put_batch()` returns how many it discarded.
+    """
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self.dropped = 0
+        self._lines = []
+        self._lock = threading.Lock()
+
+    def put_batch(self, lines):
+        if not lines:
+            return 0
+        with self._lock:
+            pending = self._lines
+            pending.extend(lines)
+            excess = len(pending) - self.capacity
+            if excess > 0:
+                del pending[:excess]
+                self.dropped += excess
+                return excess
+        return 0
+
+    def put(self, line):
+        self.put_batch((line,))
+
+    def drain(self):
+        """Return all pending lines, oldest first, and leave the queue empty."""
+        with self._lock:
+            lines, self._lines = self._lines, []
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._lines = []
+
+    def __len__(self):
+        return len(self._lines)
+
+
+# --- Latency Statistics ---
+def percentile(sorted_values, q):
+    """Linear-interpolated q-th percentile (0-100) of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+class LatencyTracker:
+    """Rolling window of latency samples in milliseconds.
+
+    Safe to feed from one thread while another reads percentiles.
+    """
+    def __init__(self, window=1000):
+        self._samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, ms):
+        with self._lock:
+            self._samples.append(ms)
+
+    def extend(self, values):
+        with self._lock:
+            self._samples.extend(values)
+
+    def percentiles(self, quantiles=(50, 95, 99)):
+        """Return {'p50': ..., 'p95': ..., 'p99': ...} over the current window."""
+        with self._lock:
+            values = sorted(self._samples)
+        return {f'p{q}': percentile(values, q) for q in quantiles}
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def __len__(self):
+        return len(self._samples)
+
+
+# --- Port Probing ---
+def looks_like_text(line, min_length=2):
+    """True if a framed line is plausible firmware output (mostly printable ASCII)."""
+    line = line.strip()
+    if len(line) < min_length:
+        return False
+    printable = sum(1 for b in line if 32 <= b < 127 or b == 9)
+    return printable >= 0.95 * len(line)
+
+
+class PortProber:
+    """Finds the port/baud pair an STM32 is talking on without blocking the caller.
+
+    Ports are probed in parallel on a worker pool; baud rates on one port are
+    tried in turn. A candidate is confirmed when valid framed traffic (or a
+    reply to `handshake`, if given) arrives within `deadline` seconds, so a
+    port that merely opens is not mistaken for the right baud rate.
+
+    `on_result(port, baud, status)` is called from the worker threads as each
+    candidate finishes, and `on_done(winner, silent_ports)` once at the end.
+    The first confirmed pair wins and stops the remaining probes.
+    """
+    CONFIRMED = 'confirmed'
+    SILENT = 'silent'  # Opened fine but no valid traffic before the deadline
+    FAILED = 'failed'  # Could not be opened
+
+    def __init__(self, ports, baudrates=BAUDRATES, on_result=None, on_done=None,
+                 deadline=0.3, handshake=None, max_workers=8):
+        self.ports = list(ports)
+        self.baudrates = list(baudrates)
+        self.on_result = on_result
+        self.on_done = on_done
+        self.deadline = deadline
+        self.handshake = handshake
+        self.max_workers = max_workers
+        self.winner = None
+        self.silent_ports = []
+        self._found = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._found.set()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        if self.ports:
+            from concurrent.futures import ThreadPoolExecutor
+            workers = min(self.max_workers, len(self.ports))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(self._probe_port, self.ports))
+        if self.on_done:
+            self.on_done(self.winner, self.silent_ports)
+
+    def _probe_port(self, port):
+        for baud in self.baudrates:
+            if self._found.is_set():
+                return
+            status = self._probe_baud(port, baud)
+            if status == self.CONFIRMED:
+                with self._lock:
+                    if self.winner is None:
+                        self.winner = (port, baud)
+                        self._found.set()
+                    else:
+                        return
+            elif status == self.SILENT:
+                with self._lock:
+                    if port not in self.silent_ports:
+                        self.silent_ports.append(port)
+            if self.on_result:
+                self.on_result(port, baud, status)
+            if status != self.SILENT:
+                return  # Confirmed, or the port cannot be opened at any baud
+
+    def _probe_baud(self, port, baud):
+        try:
+            ser = serial.Serial(port, baud, timeout=0.02, write_timeout=0.2)
+        except Exception:
+            return self.FAILED
+        try:
+            ser.reset_input_buffer()
+            if self.handshake:
+                ser.write(self.handshake)
+            framer = LineFramer(max_line_length=256)
+            valid = invalid = 0
+            end = time.perf_counter() + self.deadline
+            while time.perf_counter() < end and not self._found.is_set():
+                data = ser.read(ser.in_waiting or 1)
+                if not data:
+                    continue
+                for line in framer.feed(data):
+                    if looks_like_text(line):
+                        valid += 1
+                    elif line.strip():
+                        invalid += 1
+                if valid and valid >= invalid:
+                    return self.CONFIRMED
+            return self.SILENT
+        except Exception:
+            return self.FAILED
+        finally:
+            try:
+                ser.close()
+            except Exception:
+                pass
+
+
+# --- Cached Port Profiles ---
+def device_key(port_info):
+    """Stable identity of a USB serial adapter ('VID:PID:SERIAL'), or None for non-USB ports."""
+    if getattr(port_info, 'vid', None) is None:
+        return None
+    return f'{port_info.vid:04X}:{port_info.pid or 0:04X}:{port_info.serial_number or ""}'
+
+
+class PortProfileStore:
+    """Remembers the last working port and baud rate of each USB device.
+
+    Profiles live in a small JSON file keyed by device_key(). An entry expires
+    when its port now belongs to a different device, or when it has not been
+    used for `max_age` seconds.
+    """
+    DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.stm32_serial_gui', 'profiles.json')
+
+    def __init__(self, path=None, max_age=30 * 24 * 3600):
+        self.path = path or self.DEFAULT_PATH
+        self.max_age = max_age
+        self.profiles = self._load()
+
+    def _load(self):
+        import json
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                profiles = json.load(f)
+            return profiles if isinstance(profiles, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        import json
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.profiles, f, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Could not save port profiles: {e}")
+
+    def lookup(self, port_infos):
+        """Return (device, baud) for the first remembered device currently plugged in.
+
+        `port_infos` are the entries of serial.tools.list_ports.comports().
+        Stale entries found on the way are expired and the store is saved.
+        """
+        now = time.time()
+        plugged = {}
+        by_device = {}
+        for info in port_infos:
+            key = device_key(info)
+            by_device[info.device] = key
+            if key is not None:
+                plugged[key] = info.device
+
+        expired = [key for key, entry in self.profiles.items()
+                   if now - entry.get('last_used', 0) > self.max_age
+                   or (entry.get('port') in by_device and by_device[entry['port']] != key)]
+        for key in expired:
+            del self.profiles[key]
+        if expired:
+            self.save()
+
+        for key, entry in sorted(self.profiles.items(), key=lambda item: -item[1].get('last_used', 0)):
+            if key in plugged:
+                # The device may have been re-enumerated under another name
+                return plugged[key], int(entry['baud'])
+        return None
+
+    def remember(self, port_info, baud):
+        """Record a successful connection; non-USB ports are ignored."""
+        key = device_key(port_info)
+        if key is None:
+            return
+        self.profiles[key] = {'port': port_info.device, 'baud': int(baud), 'last_used': time.time()}
+        self.save()
+
+    def forget(self, port_info):
+        if self.profiles.pop(device_key(port_info), None) is not None:
+            self.save()
+
+
+# --- Hot-plug Detection ---
+class PortWatcher:
+    """Background thread that reports serial ports appearing and disappearing.
+
+    comports() is polled every `interval` seconds and only the set of
+    (device, device_key) pairs is compared, so an idle poll costs one
+    enumeration and a set difference. `on_change(added, removed, ports)`
+    is called on the watcher thread with port info lists, only when the
+    snapshot actually changed.
+    """
+    def __init__(self, on_change, interval=1.0):
+        self.on_change = on_change
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._snapshot = {}
+
+    def start(self):
+        self._snapshot = self._take_snapshot()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+
+    @staticmethod
+    def _take_snapshot():
+        return {(info.device, device_key(info)): info for info in serial.tools.list_ports.comports()}
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                snapshot = self._take_snapshot()
+            except Exception as e:
+                print(f"Port enumeration error: {e}")
+                continue
+            if snapshot.keys() == self._snapshot.keys():
+                continue
+            added = [snapshot[k] for k in snapshot.keys() - self._snapshot.keys()]
+            removed = [self._snapshot[k] for k in self._snapshot.keys() - snapshot.keys()]
+            self._snapshot = snapshot
+            self.on_change(added, removed, list(snapshot.values()))
+
+
+# --- Wire Codecs ---
+def crc16_ccitt(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF), as computed by the STM32 HAL."""
+    return binascii.crc_hqx(data, crc)
+
+
+def cobs_encode(data):
+    """Consistent Overhead Byte Stuffing: the result contains no zero bytes."""
+    out = bytearray()
+    for block in bytes(data).split(b'\x00'):
+        while len(block) >= 254:
+            out.append(0xFF)
+            out += block[:254]
+            block = block[254:]
+        out.append(len(block) + 1)
+        out += block
+    return bytes(out)
+
+
+def cobs_decode(data):
+    """Inverse of cobs_encode(); raises ValueError on malformed input."""
+    out = bytearray()
+    index, length = 0, len(data)
+    while index < length:
+        code = data[index]
+        if code == 0:
+            raise ValueError('zero byte inside COBS frame')
+        end = index + code
+        if end > length:
+            raise ValueError('truncated COBS block')
+        out += data[index + 1:end]
+        index = end
+        if code < 0xFF and index < length:
+            out.append(0)
+    return bytes(out)
+
+
+def table_bytes(table):
+    """Little-endian uint16 bytes of a duty table (NumPy array or any int sequence)."""
+    if hasattr(table, 'astype'):
+        return table.astype('<u2').tobytes()
+    values = array('H', table)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+class CodecStats:
+    """Throughput and error counters of one codec instance."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.frames_in = 0
+        self.frames_out = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+
+    def snapshot(self):
+        """Counters plus average rates since the last reset."""
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'frames_in': self.frames_in,
+            'frames_out': self.frames_out,
+            'errors': self.errors,
+            'rx_bytes_per_s': self.bytes_in / elapsed,
+            'tx_bytes_per_s': self.bytes_out / elapsed,
+            'rx_frames_per_s': self.frames_in / elapsed,
+        }
+
+
+class AsciiCodec:
+    """Newline-terminated ASCII lines: the firmware's native `A###F####` protocol."""
+    name = 'ascii'
+
+    def __init__(self, max_line_length=4096):
+        self.framer = LineFramer(b'\n', max_line_length)
+        self.stats = CodecStats()
+
+    def encode_text(self, text):
+        data = text.encode()
+        self.stats.bytes_out += len(data)
+        self.stats.frames_out += 1
+        return data
+
+    def encode_command(self, amplitude, frequency):
+        return self.encode_text(f'A{amplitude:03d}F{frequency:04d}\n')
+
+    def encode_table(self, table, resolution_bits):
+        """Header line 'T<length>B<bits>' then the raw uint16 LE values and their CRC16."""
+        body = table_bytes(table)
+        data = (f'T{len(body) // 2:04d}B{resolution_bits:02d}\n'.encode()
+                + body + struct.pack('<H', crc16_ccitt(body)))
+        self.stats.bytes_out += len(data)
+        self.stats.frames_out += 1
+        return data
+
+    def decode(self, data):
+        """Feed received bytes; return the complete, non-empty lines as text."""
+        stats = self.stats
+        stats.bytes_in += len(data)
+        tracing = TRACER.enabled
+        if tracing:
+            started = time.perf_counter()
+        framed = self.framer.feed(data)
+        if tracing:
+            split = time.perf_counter()
+            TRACER.complete('codec.split', started, split, frames=len(framed))
+        lines = []
+        for line in framed:
+            try:
+                text = line.decode()
+            except UnicodeDecodeError:
+                stats.errors += 1
+                text = line.decode(errors='ignore')
+            text = text.strip()
+            if text:
+                lines.append(text)
+        stats.frames_in += len(lines)
+        if tracing:
+            TRACER.complete('codec.text', split, time.perf_counter(), lines=len(lines))
+        return lines
+
+    def flush(self):
+        """Decode whatever is left in the framer, e.g. when the port closes."""
+        text = self.framer.flush().decode(errors='ignore').strip()
+        return [text] if text else []
+
+    def reset(self):
+        self.framer.reset()
+        self.stats.reset()
+
+
+class CobsCrcCodec:
+    """Compact binary framing: COBS(type + body + CRC16 little-endian) + 0x00.
+
+    Frame types:
+      0x01 command  amplitude u8, frequency u16 (host -> MCU)
+      0x02 text     UTF-8 (both directions, e.g. acks)
+      0x03 samples  int16 array (MCU -> host), decoded as 'S:v1,v2,...'
+      0x04 table    resolution u8, uint16 duty values (host -> MCU)
+    A frame that fails COBS or CRC checks is dropped and counted in
+    `stats.errors` instead of being passed on corrupted.
+    """
+    name = 'cobs'
+    COMMAND = 0x01
+    TEXT = 0x02
+    SAMPLES = 0x03
+    TABLE = 0x04
+
+    def __init__(self, max_frame_length=8192):
+        self.framer = LineFramer(b'\x00', max_frame_length)
+        self.stats = CodecStats()
+
+    def encode_frame(self, frame_type, body=b''):
+        payload = bytes((frame_type,)) + bytes(body)
+        frame = cobs_encode(payload + struct.pack('<H', crc16_ccitt(payload))) + b'\x00'
+        self.stats.bytes_out += len(frame)
+        self.stats.frames_out += 1
+        return frame
+
+    def encode_text(self, text):
+        return self.encode_frame(self.TEXT, text.rstrip('\r\n').encode())
+
+    def encode_command(self, amplitude, frequency):
+        return self.encode_frame(self.COMMAND, struct.pack('<BH', amplitude, frequency))
+
+    def encode_table(self, table, resolution_bits):
+        return self.encode_frame(self.TABLE, bytes((resolution_bits,)) + table_bytes(table))
+
+    def encode_samples(self, samples):
+        body = array('h', samples)
+        if sys.byteorder == 'big':
+            body.byteswap()
+        return self.encode_frame(self.SAMPLES, body.tobytes())
+
+    def decode(self, data):
+        """Feed received bytes; return decoded frames as text lines."""
+        stats = self.stats
+        stats.bytes_in += len(data)
+        tracing = TRACER.enabled
+        if tracing:
+            started = time.perf_counter()
+        framed = self.framer.feed(data)
+        if tracing:
+            split = time.perf_counter()
+            TRACER.complete('codec.split', started, split, frames=len(framed))
+        lines = []
+        for frame in framed:
+            if not frame:
+                continue  # Back-to-back delimiters
+            text = self._decode_frame(frame)
+            if text is None:
+                stats.errors += 1
+            elif text:
+                lines.append(text)
+        stats.frames_in += len(lines)
+        if tracing:
+            TRACER.complete('codec.frames', split, time.perf_counter(), lines=len(lines))
+        return lines
+
+    def _decode_frame(self, frame):
+        try:
+            raw = cobs_decode(frame)
+        except ValueError:
+            return None
+        if len(raw) < 3:
+            return None
+        payload, (crc,) = raw[:-2], struct.unpack('<H', raw[-2:])
+        if crc16_ccitt(payload) != crc:
+            return None
+        frame_type, body = payload[0], payload[1:]
+        if frame_type == self.TEXT:
+            return body.decode(errors='ignore').strip()
+        if frame_type == self.SAMPLES:
+            if len(body) % 2:
+                return None
+            samples = array('h')
+            samples.frombytes(body)
+            if sys.byteorder == 'big':
+                samples.byteswap()
+            return 'S:' + ','.join(map(str, samples))
+        if frame_type == self.COMMAND and len(body) == 3:
+            amplitude, frequency = struct.unpack('<BH', body)
+            return f'A{amplitude:03d}F{frequency:04d}'
+        return None
+
+    def flush(self):
+        self.framer.reset()  # A partial binary frame can't be recovered
+        return []
+
+    def reset(self):
+        self.framer.reset()
+        self.stats.reset()
+
+
+# Codecs selectable by name in the GUI and CLI
+CODECS = {
+    AsciiCodec.name: AsciiCodec,
+    CobsCrcCodec.name: CobsCrcCodec,
+}
+
+
+# --- Serial Controller with Threading ---
+class ControllerError(Exception):
+    """A serial operation failed; the message is meant to be shown to the user."""
+
+
+def open_port(port, baudrate=115200, timeout=0.01, write_timeout=1):
+    """Open a serial port, a pyserial URL (loop://, socket://), replay://file or emulator://."""
+    if port.startswith(ReplayPort.SCHEME):
+        # A recorded capture played back through the same pipeline
+        return ReplayPort.from_url(port, timeout=timeout)
+    if port.startswith('emulator://'):
+        # In-process firmware emulator, for testing without a board
+        from stm32_emulator import EmulatedPort
+        return EmulatedPort.from_url(port, timeout=timeout)
+    return serial.serial_for_url(port, baudrate, timeout=timeout, write_timeout=write_timeout)
+
+
+# Shared by controllers that were not given metrics of their own
+DEFAULT_METRICS = PipelineMetrics()
+
+
+class SerialController:
+    """Handles serial port connection, disconnection, and data transfer with threading.
+
+    Reads and writes run on separate threads so that outgoing commands never
+    wait behind an in-progress read. `self.lock` only guards opening and
+    closing the port. If the port fails (e.g. the USB cable is pulled) the
+    threads stop, the port is closed and `on_link_lost(error)` is called from
+    the failing thread. Bytes on the wire are produced and parsed by
+    `self.codec` (ASCII lines unless another codec is set).
+
+    Nothing here shows dialogs: `connect()` raises ControllerError, and
+    sends that fail return False after calling `on_error(message)` (which
+    may run on a worker thread; the message is printed if it is not set).
+    Traffic, errors and latencies are counted in `metrics` (a
+    PipelineMetrics; one without labels is shared by default).
+    """
+    def __init__(self, codec=None, metrics=None):
+        self.metrics = metrics or DEFAULT_METRICS
+        self._decode_errors = 0  # codec.stats.errors already counted in metrics
+        self.codec = codec or AsciiCodec()
+        self.ser = None
+        self.connected = False
+        self.read_thread = None
+        self.write_thread = None
+        self.stop_event = threading.Event()
+        self.data_queue = LineBatchQueue()
+        self.tx_queue = queue.Queue()
+        self.lock = threading.Lock()
+        # Command-to-wire latency: time from send() to the bytes leaving the port
+        self.tx_latency_ms = 0.0
+        self.tx_latency_max_ms = 0.0
+        # Round trip from send_amp_freq() to the firmware's echo/ack
+        self.rtt_stats = LatencyTracker()
+        self.ack_timeout = 2.0  # s; unanswered commands older than this are forgotten
+        self._pending_acks = collections.deque(maxlen=16)
+        self._ack_lock = threading.Lock()
+        self.on_link_lost = None
+        self.on_error = None
+        self.recorder = None  # Optional CaptureRecorder, fed the raw bytes in both directions
+        self.last_command = None  # (amplitude, frequency) most recently sent
+
+    def connect(self, port, baudrate=115200, start_reader=True):
+        """Open the port and start the I/O threads; raises ControllerError if that fails.
+
+        With `start_reader=False` no reader thread is started and whoever
+        reads the port passes the bytes to `_handle_rx()` (see DeviceManager).
+        An open connection is closed first, so its threads never share a port.
+        """
+        if self.connected:
+            self.disconnect()
+        try:
+            with self.lock:
+                self.ser = open_port(port, baudrate, timeout=0.01)  # Non-blocking with short timeout
+                self.connected = True
+                self.codec.reset()
+                self._decode_errors = 0
+                self.metrics.connects.inc()
+                # Fresh per-connection state, so threads of an earlier connection can't touch this one
+                self.stop_event = threading.Event()
+                self.tx_queue = queue.Queue()
+                self.data_queue.dropped = 0
+                self.tx_latency_ms = 0.0
+                self.tx_latency_max_ms = 0.0
+                self.rtt_stats.clear()
+                with self._ack_lock:
+                    self._pending_acks.clear()
+                
+                # Start the reading and writing threads
+                self.read_thread = None
+                if start_reader:
+                    self.read_thread = threading.Thread(
+                        target=self._read_serial, 
+                        args=(self.ser, self.stop_event),
+                        daemon=True
+                    )
+                    self.read_thread.start()
+                self.write_thread = threading.Thread(
+                    target=self._write_serial,
+                    args=(self.ser, self.stop_event, self.tx_queue),
+                    daemon=True
+                )
+                self.write_thread.start()
+                return True
+        except Exception as e:
+            raise ControllerError(f'Failed to connect to {port}: {e}') from e
+
+    def disconnect(self):
+        self.stop_event.set()
+        self.tx_queue.put(None)  # Wake the writer thread
+        if self.read_thread and self.read_thread.is_alive():
+            self.read_thread.join(timeout=0.1)
+        if self.write_thread and self.write_thread.is_alive():
+            self.write_thread.join(timeout=0.1)
+            
+        with self.lock:
+            if self.ser and self.ser.is_open:
+                self.ser.close()
+            self.ser = None
+            self.connected = False
+
+    def set_codec(self, codec):
+        """Switch the wire format; applies to the next bytes read or sent."""
+        codec.reset()
+        self._decode_errors = 0
+        self.codec = codec
+
+    def send(self, data):
+        return self._send_encoded(self.codec.encode_text, data)
+
+    def send_amp_freq(self, amplitude, frequency):
+        with self._ack_lock:
+            self._pending_acks.append((f'A{amplitude:03d}F{frequency:04d}', time.perf_counter()))
+        if self._send_encoded(self.codec.encode_command, amplitude, frequency):
+            self.last_command = (amplitude, frequency)
+            return True
+        return False
+
+    def upload_table(self, table, resolution_bits=12, chunk_size=4096):
+        """Stream a PWM duty table to the firmware in large writes instead of line by line."""
+        return self._send_encoded(self.codec.encode_table, table, resolution_bits, chunk_size=chunk_size)
+
+    def _send_encoded(self, encode, *args, chunk_size=None):
+        if self.connected:
+            try:
+                payload, queued_at = encode(*args), time.perf_counter()
+                if chunk_size:
+                    for start in range(0, len(payload), chunk_size):
+                        self.tx_queue.put((payload[start:start + chunk_size], queued_at))
+                else:
+                    self.tx_queue.put((payload, queued_at))
+                return True
+            except Exception as e:
+                self._report_error(f'Failed to send data: {e}')
+                return False
+        else:
+            self._report_error('Serial is not connected!')
+            return False
+
+    def _report_error(self, message):
+        if self.on_error:
+            self.on_error(message)
+        else:
+            print(message)
+
+    def wait_sent(self, timeout=1.0):
+        """Wait until everything queued so far is on the wire; False on timeout."""
+        deadline = time.perf_counter() + timeout
+        while self.tx_queue.unfinished_tasks:
+            if not self.connected or time.perf_counter() >= deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def get_data(self):
+        """Get all available data from the queue as (arrival perf_counter time, line) pairs"""
+        lines = self.data_queue.drain()
+        self.metrics.queue_depth.set(0)
+        return lines
+
+    @property
+    def dropped_lines(self):
+        """Lines discarded because the GUI fell behind the reader."""
+        return self.data_queue.dropped
+
+    def _link_lost(self, ser, error):
+        """Tear down a connection whose port failed underneath the I/O threads."""
+        with self.lock:
+            if self.ser is not ser:
+                return  # Already disconnected or reconnected
+            self.stop_event.set()
+            self.tx_queue.put(None)
+            try:
+                ser.close()
+            except Exception:
+                pass
+            self.ser = None
+            self.connected = False
+        self.metrics.link_lost.inc()
+        if TRACER.enabled:
+            TRACER.mark('serial.link_lost', port=ser.port, error=str(error))
+        print(f"Serial link lost: {error}")
+        if self.on_link_lost:
+            self.on_link_lost(error)
+
+    def _write_serial(self, ser, stop_event, tx_queue):
+        """Thread function to write queued commands without blocking the reader"""
+        while not stop_event.is_set():
+            item = tx_queue.get()
+            if item is None:
+                break
+            data, queued_at = item
+            try:
+                ser.write(data)
+                ser.flush()  # Wait until the bytes are actually on the wire
+                now = time.perf_counter()
+                recorder = self.recorder
+                if recorder is not None:
+                    recorder.record(TX, data, now)
+                self._count_tx(data, now - queued_at)
+            except (serial.SerialException, OSError) as e:
+                if not stop_event.is_set():
+                    self._link_lost(ser, e)
+                break
+            except Exception as e:
+                self.metrics.io_errors.inc()
+                print(f"Serial write error: {e}")
+            finally:
+                tx_queue.task_done()
+
+    def _match_ack(self, line, now):
+        """Record the round-trip time if `line` echoes or acknowledges a pending command."""
+        with self._ack_lock:
+            pending = self._pending_acks
+            while pending and now - pending[0][1] > self.ack_timeout:
+                pending.popleft()
+            if not pending:
+                return
+            for index, (cmd, sent_at) in enumerate(pending):
+                if cmd in line:
+                    break
+            else:
+                if not line.upper().startswith(('OK', 'ACK')):
+                    return
+                index, (cmd, sent_at) = 0, pending[0]
+            # Commands sent before the acknowledged one will not be answered any more
+            for _ in range(index + 1):
+                pending.popleft()
+        self.rtt_stats.add((now - sent_at) * 1000)
+        self.metrics.rtt.observe(now - sent_at)
+
+    def _count_tx(self, data, latency):
+        """Update the TX latency fields and metrics for one write that took `latency` seconds."""
+        metrics = self.metrics
+        metrics.tx_bytes.inc(len(data))
+        metrics.tx_lines.inc()
+        metrics.tx_latency.observe(latency)
+        self.tx_latency_ms = latency * 1000
+        self.tx_latency_max_ms = max(self.tx_latency_max_ms, self.tx_latency_ms)
+
+    def _count_rx(self, data, lines, dropped):
+        """Update the RX metrics for one read that produced `lines` lines."""
+        metrics = self.metrics
+        metrics.rx_bytes.inc(len(data))
+        metrics.read_sizes.observe(len(data))
+        metrics.rx_lines.inc(lines)
+        if dropped:
+            metrics.dropped.inc(dropped)
+        metrics.queue_depth.set(len(self.data_queue))
+        errors = self.codec.stats.errors
+        if errors > self._decode_errors:
+            metrics.decode_errors.inc(errors - self._decode_errors)
+            self._decode_errors = errors
+
+    def _handle_rx(self, data, arrived):
+        """Record, decode and publish one read's worth of bytes as a single batch."""
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record(RX, data, arrived)
+        tracing = TRACER.enabled
+        if tracing:
+            started = time.perf_counter()
+        decoded_lines = self.codec.decode(data)
+        if tracing:
+            decoded_at = time.perf_counter()
+            TRACER.complete('codec.decode', started, decoded_at, bytes=len(data), lines=len(decoded_lines))
+        batch = []
+        for decoded in decoded_lines:
+            batch.append((arrived, decoded))
+            if self._pending_acks:
+                self._match_ack(decoded, arrived)
+        dropped = self.data_queue.put_batch(batch)
+        if tracing:
+            TRACER.complete('queue.put_batch', decoded_at, time.perf_counter(), lines=len(batch), dropped=dropped)
+            if dropped:
+                TRACER.mark('queue.dropped', lines=dropped)
+        self._count_rx(data, len(batch), dropped)
+
+    def _flush_rx(self):
+        """Publish whatever the codec still holds when the connection ends."""
+        self.data_queue.put_batch([(time.perf_counter(), decoded) for decoded in self.codec.flush()])
+
+    def _read_serial(self, ser, stop_event):
+        """Thread function to read serial data in real-time"""
+        while not stop_event.is_set():
+            try:
+                # Read all available data
+                tracing = TRACER.enabled
+                if tracing:
+                    started = time.perf_counter()
+                data = ser.read(ser.in_waiting or 1)
+                if data:
+                    arrived = time.perf_counter()
+                    if tracing:
+                        TRACER.complete('serial.read', started, arrived, bytes=len(data))
+                    self._handle_rx(data, arrived)
+            except (serial.SerialException, OSError) as e:
+                # The device went away: stop here instead of retrying a dead port
+                if not stop_event.is_set():
+                    self._link_lost(ser, e)
+                break
+            except Exception as e:
+                if stop_event.is_set():
+                    break
+                self.metrics.io_errors.inc()
+                print(f"Serial read error: {e}")
+                time.sleep(0.1)
+
+        # Process any remaining data in buffer
+        self._flush_rx()
+
+
+
+# --- Multi-Board Device Manager ---
+class DeviceManager:
+    """Drives many boards from one process, reading all of them on a single thread.
+
+    Each board is a SerialController connected with `start_reader=False`: it
+    keeps its own codec, line queue, RTT statistics and writer thread, but
+    not a reader. Ports with a file descriptor (serial devices on POSIX,
+    socket://) are registered with a selector and only read when they have
+    data, so idle boards cost nothing; the others (emulator://, replay://,
+    loop://, COM ports on Windows) are polled by the same thread every
+    `poll_interval`. Writers stay per board so that a stuck write to one
+    board never holds up a group command to the rest.
+
+    Commands take a target: None or 'all', a group name, a board name or a
+    list of board names. Callbacks get the board name first and run on the
+    reader thread.
+    """
+    def __init__(self, poll_interval=0.01):
+        import selectors
+        import socket
+        self.poll_interval = poll_interval
+        self.devices = {}  # name -> SerialController, in the order they were added
+        self.groups = {}  # group name -> set of board names
+        self.on_link_lost = None  # (name, error)
+        self.on_error = None  # (name, message)
+        self.wakeups = 0  # Reader loop iterations, to see what idling costs
+        self._event_read = selectors.EVENT_READ
+        self._selector = selectors.DefaultSelector()
+        self._fds = {}  # name -> registered file descriptor
+        self._polled = {}  # name -> SerialController whose port has no file descriptor
+        self._lock = threading.Lock()
+        # Wakes the reader when a polled board is added or the manager closes
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._selector.register(self._wake_r, self._event_read, None)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add(self, port, baudrate=115200, name=None, codec=None, group=None):
+        """Connect a board and start reading it; raises ControllerError if that fails."""
+        name = name or port
+        if name in self.devices:
+            raise ControllerError(f'{name} is already connected')
+        ctrl = SerialController(codec, metrics=PipelineMetrics(device=name))
+        ctrl.on_link_lost = lambda error: self._on_link_lost(name, error)
+        ctrl.on_error = lambda message: self._report_error(name, message)
+        ctrl.connect(port, baudrate, start_reader=False)
+        try:
+            fd = ctrl.ser.fileno()
+        except Exception:
+            fd = None
+        with self._lock:
+            self.devices[name] = ctrl
+            if fd is None:
+                self._polled[name] = ctrl
+            else:
+                if fd in self._selector.get_map():
+                    self._selector.unregister(fd)  # Left behind by a board whose link was lost
+                self._selector.register(fd, self._event_read, name)
+                self._fds[name] = fd
+            if group:
+                self.groups.setdefault(group, set()).add(name)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._wake()
+        return ctrl
+
+    def remove(self, name):
+        """Disconnect a board and forget it."""
+        with self._lock:
+            ctrl = self._forget(name)
+        if ctrl is not None:
+            ctrl.disconnect()
+
+    def add_to_group(self, group, name):
+        with self._lock:
+            self.groups.setdefault(group, set()).add(name)
+
+    def close(self):
+        """Disconnect every board and stop the reader; the manager can't be used afterwards."""
+        self._stop_event.set()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        for name in list(self.devices):
+            self.remove(name)
+        self._selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def _forget(self, name):
+        """Drop a board from the reader and the groups; the caller holds `_lock`."""
+        ctrl = self.devices.pop(name, None)
+        self._polled.pop(name, None)
+        fd = self._fds.pop(name, None)
+        if fd is not None:
+            key = self._selector.get_map().get(fd)
+            if key is not None and key.data == name:
+                self._selector.unregister(fd)
+        for members in self.groups.values():
+            members.discard(name)
+        return ctrl
+
+    def _on_link_lost(self, name, error):
+        with self._lock:
+            self._forget(name)
+        if self.on_link_lost:
+            self.on_link_lost(name, error)
+
+    def _report_error(self, name, message):
+        if self.on_error:
+            self.on_error(name, message)
+        else:
+            print(f'{name}: {message}')
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            pass  # Already closed, or the buffer is full and a wakeup is pending anyway
+
+    # --- Commands ---
+    def targets(self, target=None):
+        """Names of the boards `target` refers to, in the order they were added."""
+        with self._lock:
+            if target is None or target == 'all':
+                return list(self.devices)
+            if isinstance(target, str):
+                members = self.groups.get(target, {target})
+            else:
+                members = set(target)
+            return [name for name in self.devices if name in members]
+
+    def send_amp_freq(self, amplitude, frequency, target=None):
+        """Queue the command on every targeted board; returns {name: queued}."""
+        return {name: self.devices[name].send_amp_freq(amplitude, frequency) for name in self.targets(target)}
+
+    def send(self, data, target=None):
+        return {name: self.devices[name].send(data) for name in self.targets(target)}
+
+    def get_data(self):
+        """{name: [(arrival time, line), ...]} of everything received since the last call."""
+        return {name: ctrl.get_data() for name, ctrl in list(self.devices.items())}
+
+    def stats(self):
+        result = {}
+        for name, ctrl in list(self.devices.items()):
+            result[name] = {
+                'port': ctrl.ser.port if ctrl.ser is not None else None,
+                'rx_bytes': ctrl.codec.stats.bytes_in,
+                'dropped': ctrl.dropped_lines,
+                'rtt_p50_ms': ctrl.rtt_stats.percentiles()['p50'],
+                'polled': name in self._polled,
+            }
+        return result
+
+    # --- Reader ---
+    def _run(self):
+        selector, stop_event = self._selector, self._stop_event
+        while not stop_event.is_set():
+            # Block until a port is readable, unless some ports have to be polled
+            events = selector.select(self.poll_interval if self._polled else None)
+            self.wakeups += 1
+            for key, _ in events:
+                if key.data is None:
+                    try:
+                        self._wake_r.recv(4096)
+                    except OSError:
+                        pass
+                    continue
+                ctrl = self.devices.get(key.data)
+                if ctrl is not None:
+                    self._read(ctrl, polled=False)
+            for ctrl in list(self._polled.values()):
+                self._read(ctrl, polled=True)
+
+    def _read(self, ctrl, polled):
+        ser = ctrl.ser
+        if ser is None:
+            return
+        tracing = TRACER.enabled
+        if tracing:
+            started = time.perf_counter()
+        try:
+            size = ser.in_waiting
+            if not size:
+                if polled:
+                    return
+                size = 1  # Readable without data: let read() report a hang-up
+            data = ser.read(size)
+        except (serial.SerialException, OSError) as e:
+            ctrl._link_lost(ser, e)
+            return
+        except Exception as e:
+            ctrl.metrics.io_errors.inc()
+            print(f"Serial read error: {e}")
+            return
+        if data:
+            arrived = time.perf_counter()
+            if tracing:
+                TRACER.complete('serial.read', started, arrived, bytes=len(data), port=ser.port)
+            ctrl._handle_rx(data, arrived)
+
+
+# --- Command Coalescing ---
+class CommandCoalescer:
+    """Rate-limits amplitude/frequency updates, keeping only the newest pending values.
+
+    `submit()` never blocks; it overwrites whatever has not been sent yet, per
+    parameter. A worker thread calls `send(amplitude, frequency)` at most
+    `max_rate` times per second and always sends the last submitted values
+    once submissions stop (trailing flush). Values equal to the last command
+    the board got are not re-sent; call `forget()` whenever its settings
+    change outside this stream (an explicit send, a sweep, a reconnect).
+    `sent` and `coalesced` count what went out and what was merged away.
+    """
+    def __init__(self, send, max_rate=20.0):
+        self.send = send
+        self.max_rate = max_rate
+        self.submitted = 0
+        self.sent = 0
+        self.coalesced = 0
+        self._pending = {}
+        self._last_sent = {}
+        self._next_send = 0.0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, amplitude=None, frequency=None):
+        with self._cond:
+            self.submitted += 1
+            if self._pending:
+                self.coalesced += 1
+            if amplitude is not None:
+                self._pending['amplitude'] = amplitude
+            if frequency is not None:
+                self._pending['frequency'] = frequency
+            self._cond.notify()
+
+    def forget(self, command=None):
+        """The board was set to `command` (amplitude, frequency) by other means, or to unknown values if None."""
+        with self._cond:
+            self._last_sent = {} if command is None else dict(zip(('amplitude', 'frequency'), command))
+
+    @property
+    def synced(self):
+        """True while the board's values are known, so submitting one parameter is enough."""
+        return len(self._last_sent) == 2
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def stats(self):
+        return {'submitted': self.submitted, 'sent': self.sent, 'coalesced': self.coalesced}
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                # Hold the pending values until the rate limit allows the next send
+                delay = self._next_send - time.perf_counter()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                command = dict(self._last_sent, **self._pending)
+                self._pending = {}
+            if len(command) < 2 or command == self._last_sent:
+                with self._cond:
+                    self.coalesced += 1
+                continue
+            if self.send(command['amplitude'], command['frequency']):
+                with self._cond:
+                    self.sent += 1
+                    self._last_sent = command
+            self._next_send = time.perf_counter() + 1.0 / self.max_rate
+
+
+# --- Frequency/Amplitude Sweeps ---
+SWEEP_MODES = ('linear', 'log', 'stepped')
+
+
+def sweep_steps(mode, start, stop, steps=100, step_size=None, amplitude=50, amplitude_end=None):
+    """(amplitude, frequency) integer pairs for a sweep from `start` to `stop` Hz.
+
+    'linear' and 'log' spread `steps` points evenly on a linear or logarithmic
+    axis; 'stepped' advances by `step_size` Hz and ends on `stop` even when
+    the range is not a multiple of the step. The amplitude ramps linearly
+    from `amplitude` to `amplitude_end` (constant if None). Values are clamped
+    to what the A###F#### command accepts.
+    """
+    if mode not in SWEEP_MODES:
+        raise ValueError(f'unknown sweep mode {mode!r}')
+    if not (1 <= start <= 1000 and 1 <= stop <= 1000):
+        raise ValueError('sweep frequencies must be between 1 and 1000 Hz')
+    if mode == 'stepped':
+        if step_size is None or step_size < 1:
+            raise ValueError('a stepped sweep needs a step of at least 1 Hz')
+        step_size *= 1 if stop >= start else -1
+        frequencies = [start + i * step_size for i in range(int((stop - start) / step_size) + 1)]
+        if frequencies[-1] != stop:
+            frequencies.append(stop)  # A last, shorter step
+    else:
+        if steps < 2:
+            raise ValueError('a sweep needs at least 2 steps')
+        if mode == 'linear':
+            frequencies = [start + (stop - start) * i / (steps - 1) for i in range(steps)]
+        else:
+            ratio = math.log(stop / start)
+            frequencies = [start * math.exp(ratio * i / (steps - 1)) for i in range(steps)]
+    if amplitude_end is None:
+        amplitude_end = amplitude
+    count = len(frequencies)
+    result = []
+    for i, frequency in enumerate(frequencies):
+        amp = amplitude + (amplitude_end - amplitude) * i / max(count - 1, 1)
+        result.append((min(max(int(round(amp)), 0), 100), min(max(int(round(frequency)), 1), 1000)))
+    return result
+
+
+class SweepRunner:
+    """Sends (amplitude, frequency) steps on an absolute deadline schedule.
+
+    Step i is due at t0 + i * dwell, so late steps never push later ones
+    back and the error does not accumulate over thousands of steps. The
+    worker sleeps on an Event until `spin` seconds before each deadline and
+    busy-waits the rest. Every step records its intended and actual send
+    time; `jitter()` summarises the lateness when the sweep is done.
+    """
+    def __init__(self, send, steps, dwell, spin=0.002, on_done=None):
+        self.send = send
+        self.steps = list(steps)
+        self.dwell = dwell
+        self.spin = spin
+        self.on_done = on_done
+        self.records = []  # (index, intended, actual, amplitude, frequency, ok)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def progress(self):
+        return len(self.records), len(self.steps)
+
+    def jitter(self):
+        """Lateness of actual versus intended send times, in milliseconds."""
+        late = sorted((actual - intended) * 1000 for _, intended, actual, _, _, _ in self.records)
+        result = {f'p{q}': percentile(late, q) for q in (50, 95, 99)}
+        result['max'] = late[-1] if late else 0.0
+        result['mean'] = sum(late) / len(late) if late else 0.0
+        return result
+
+    def _run(self):
+        start = time.perf_counter() + self.spin  # Leave time to settle into the first deadline
+        for index, (amplitude, frequency) in enumerate(self.steps):
+            deadline = start + index * self.dwell
+            remaining = deadline - time.perf_counter()
+            if remaining > self.spin and self._stop_event.wait(remaining - self.spin):
+                break
+            while time.perf_counter() < deadline:
+                pass
+            if self._stop_event.is_set():
+                break
+            actual = time.perf_counter()
+            ok = self.send(amplitude, frequency)
+            self.records.append((index, deadline, actual, amplitude, frequency, ok))
+        if self.on_done:
+            self.on_done(self)
@@ -1,12 +1,27 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+from tkinter import ttk, messagebox, scrolledtext, filedialog
 import serial
 import serial.tools.list_ports
 from tkinter import font as tkfont
-import threading
+import bisect
 import queue
+import re
+import threading
 import time
 
+from stm32_serial import (BAUDRATES, CODECS, SWEEP_MODES, CommandCoalescer, ControllerError, DeviceManager,
+                          LatencyTracker, PortProber, PortProfileStore, PortWatcher, SerialController, SweepRunner,
+                          device_key, sweep_steps)
+from stm32_capture import DEFAULT_COMPRESSION, CaptureRecorder, ReplayPort
+from stm32_log import LogFilter, LogStore, compile_pattern
+from stm32_metrics import REGISTRY
+from stm32_trace import TRACER
+
+try:
+    import stm32_dsp  # Needs NumPy; the waveform panel is hidden without it
+except ImportError:
+    stm32_dsp = None
+
 # --- Constants for Futuristic Theming ---
 DARK_THEME = {
      "bg": "#121212", #121212
@@ -54,7 +69,11 @@ TRANSLATIONS = {
         'status_connected': 'Connected',
         'rx': 'RX: {count} msgs',
         'tx': 'TX: {count} msgs',
-        'latency': 'Latency: {ms} ms',
+        'latency': 'Latency p50/p95/p99: {p50:.1f}/{p95:.1f}/{p99:.1f} ms',
+        'rtt': 'RTT p50/p95/p99: {p50:.1f}/{p95:.1f}/{p99:.1f} ms',
+        'wire_latency': 'Cmd→wire: {ms:.2f} ms',
+        'dropped': 'Dropped: {count}',
+        'tick': 'Tick: {interval} ms / {render:.1f} ms',
         'connection_protocol': 'CONNECTION PROTOCOL',
         'port': 'PORT:',
         'baudrate': 'BAUDRATE:',
@@ -65,7 +84,66 @@ TRANSLATIONS = {
         'transmit': '🚀 TRANSMIT SIGNAL PARAMETERS',
         'transmit_success': '✅ TRANSMISSION SUCCESS',
         'serial_monitor': 'REAL-TIME COMMUNICATION CONSOLE',
+        'live_drag': '⚡ LIVE ON DRAG',
+        'live_stats': 'Live: {sent} sent / {coalesced} coalesced',
+        'sweep': 'SWEEP:',
+        'sweep_steps': 'STEPS',
+        'sweep_step': 'HZ/STEP',
+        'sweep_dwell': 'MS/STEP',
+        'sweep_amp_end': 'AMP →',
+        'sweep_start': '〰️ SWEEP',
+        'sweep_stop': '■ STOP {index}/{steps}',
+        'sweep_started': '〰️ Sweep started: {mode} {start}→{stop} Hz, {steps} steps, {dwell} ms/step\n',
+        'sweep_done': '〰️ Sweep finished: {sent}/{steps} steps, lateness p50/p95/p99/max {p50:.3f}/{p95:.3f}/{p99:.3f}/{max:.3f} ms\n',
+        'error_sweep': 'Invalid sweep parameters: {error}',
+        'waveform': 'LIVE WAVEFORM',
+        'duty_table': 'DUTY TABLE:',
+        'table_length': 'LENGTH',
+        'table_bits': 'BITS',
+        'dead_time': 'DEAD TIME',
+        'upload_table': '📈 UPLOAD TABLE',
+        'table_uploaded': '➡️ Uploaded duty table: {length} × {bits} bits, A={amp}%, dead time {dead} ({size} bytes)\n',
+        'error_table': 'Invalid duty table parameters: {error}',
+        'sample_rate': 'SAMPLE RATE (Hz):',
+        'analysis': 'f = {freq:.2f} Hz ({freq_err})   A = {amp:.1f} % ({amp_err})   THD = {thd:.2f} %   SNR = {snr:.1f} dB',
+        'analysis_waiting': 'Waiting for samples...',
         'clear_terminal': '🧹 CLEAR TERMINAL',
+        'record': '⏺ RECORD',
+        'record_stop': '⏹ STOP',
+        'record_saving': '⏳ SAVING...',
+        'record_stats': 'REC {mb:.1f} MB, {dropped} dropped',
+        'record_started': '⏺ Recording raw traffic to {path}\n',
+        'record_stopped': '⏹ Recording stopped: {records} records, {mb:.1f} MB in {files} file(s), {dropped} dropped\n',
+        'capture_error': 'Capture Error',
+        'replay': '📂 REPLAY',
+        'replay_stop': '⏹ {position:.1f} / {duration:.1f} s',
+        'replay_speed': 'SPEED:',
+        'replay_done': '📂 Replay finished: {records} records, {mb:.2f} MB in {elapsed:.2f} s ({mb_per_s:.2f} MB/s, {records_per_s:.0f} records/s)\n',
+        'error_record': 'Cannot start recording: {error}',
+        'trace': '🔬 TRACE',
+        'trace_stop': '🔬 SAVE TRACE ({spans})',
+        'trace_started': '🔬 Tracing the read and render paths\n',
+        'trace_saved': '🔬 Trace saved: {spans} spans to {path} (open in chrome://tracing or ui.perfetto.dev)\n',
+        'trace_error': 'Trace Error',
+        'error_trace': 'Cannot save the trace: {error}',
+        'log_search': 'SEARCH:',
+        'log_regex': 'REGEX',
+        'log_case': 'Aa',
+        'log_only': 'ONLY MATCHES',
+        'log_tag': 'TYPE:',
+        'log_window': 'LAST:',
+        'log_tag_all': 'ALL',
+        'log_tag_received': 'RECEIVED',
+        'log_tag_sent': 'SENT',
+        'log_tag_system': 'SYSTEM',
+        'log_tag_info': 'INFO',
+        'log_tag_warning': 'WARNING',
+        'log_tag_error': 'ERROR',
+        'log_lines': '{shown} / {total} lines',
+        'log_filtering': 'Filtering... {percent:.0f} %',
+        'log_match': 'Match at line {line}',
+        'log_no_match': 'No match',
+        'log_bad_regex': 'Invalid regex: {error}',
         'terminal_cleared': '✨ TERMINAL CLEARED',
         'send': 'SEND',
         'theme_toggle': '🌓 TOGGLE QUANTUM THEME',
@@ -85,6 +163,31 @@ TRANSLATIONS = {
         'disconnected': 'Disconnected',
         'connected': 'Connected',
         'autoconnect': '🔍 AUTO CONNECT',
+        'probe_started': '🔍 Probing {count} port(s)...\n',
+        'probe_confirmed': '🔍 {port} @ {baud} bps: traffic detected\n',
+        'probe_failed': '🔍 {port}: cannot be opened\n',
+        'probe_fallback': '🔍 No traffic detected, using silent port {port} @ {baud} bps\n',
+        'probe_none': 'No available COM port/baudrate for autoconnect\n',
+        'profile_hit': '💾 Using cached profile {port} @ {baud} bps\n',
+        'time_to_connect': '⏱️ Connected in {ms:.0f} ms ({method})\n',
+        'codec': 'CODEC:',
+        'codec_stats': '{codec}: RX {rx:.1f} kB/s, TX {tx:.1f} kB/s, {errors} err',
+        'port_added': '🔌 Port added: {port}\n',
+        'port_removed': '🔌 Port removed: {port}\n',
+        'link_lost': '⚠️ Serial link lost: {error}\n',
+        'reconnecting': '🔁 Reconnecting to {port} (attempt {attempt})...\n',
+        'reconnect_failed': '❌ Giving up reconnecting to {port}\n',
+        'boards': '🧩 BOARDS',
+        'boards_title': '🧩 STM32 Boards',
+        'board_group': 'GROUP:',
+        'board_add': '➕ ADD',
+        'board_remove': '➖ REMOVE',
+        'board_target': 'TARGET:',
+        'board_all': 'all boards',
+        'board_amp': 'AMP %',
+        'board_freq': 'FREQ Hz',
+        'board_stats': '{lines} lines, RX {kb:.1f} kB, {dropped} dropped, RTT p50 {rtt:.1f} ms',
+        'board_none': 'No connected board matches {target}',
     },
     'fr': {
         'title': '⚡ INTERFACE SÉRIE TEMPS RÉEL STM32',
@@ -92,7 +195,11 @@ TRANSLATIONS = {
         'status_connected': 'Connecté',
         'rx': 'RX : {count} msgs',
         'tx': 'TX : {count} msgs',
-        'latency': 'Latence : {ms} ms',
+        'latency': 'Latence p50/p95/p99 : {p50:.1f}/{p95:.1f}/{p99:.1f} ms',
+        'rtt': 'Aller-retour p50/p95/p99 : {p50:.1f}/{p95:.1f}/{p99:.1f} ms',
+        'wire_latency': 'Cmd→ligne : {ms:.2f} ms',
+        'dropped': 'Perdus : {count}',
+        'tick': 'Cycle : {interval} ms / {render:.1f} ms',
         'connection_protocol': 'PROTOCOLE DE CONNEXION',
         'port': 'PORT :',
         'baudrate': 'BAUDRATE :',
@@ -103,7 +210,66 @@ TRANSLATIONS = {
         'transmit': '🚀 TRANSMETTRE LES PARAMÈTRES',
         'transmit_success': '✅ TRANSMISSION RÉUSSIE',
         'serial_monitor': 'CONSOLE DE COMMUNICATION TEMPS RÉEL',
+        'live_drag': '⚡ ENVOI EN DIRECT',
+        'live_stats': 'Direct : {sent} envoyées / {coalesced} fusionnées',
+        'sweep': 'BALAYAGE :',
+        'sweep_steps': 'PAS',
+        'sweep_step': 'HZ/PAS',
+        'sweep_dwell': 'MS/PAS',
+        'sweep_amp_end': 'AMP →',
+        'sweep_start': '〰️ BALAYER',
+        'sweep_stop': '■ ARRÊT {index}/{steps}',
+        'sweep_started': '〰️ Balayage lancé : {mode} {start}→{stop} Hz, {steps} pas, {dwell} ms/pas\n',
+        'sweep_done': '〰️ Balayage terminé : {sent}/{steps} pas, retard p50/p95/p99/max {p50:.3f}/{p95:.3f}/{p99:.3f}/{max:.3f} ms\n',
+        'error_sweep': 'Paramètres de balayage invalides : {error}',
+        'waveform': 'FORME D\'ONDE EN DIRECT',
+        'duty_table': 'TABLE DE RAPPORT CYCLIQUE :',
+        'table_length': 'LONGUEUR',
+        'table_bits': 'BITS',
+        'dead_time': 'TEMPS MORT',
+        'upload_table': '📈 ENVOYER LA TABLE',
+        'table_uploaded': '➡️ Table envoyée : {length} × {bits} bits, A={amp}%, temps mort {dead} ({size} octets)\n',
+        'error_table': 'Paramètres de table invalides : {error}',
+        'sample_rate': 'ÉCHANTILLONNAGE (Hz) :',
+        'analysis': 'f = {freq:.2f} Hz ({freq_err})   A = {amp:.1f} % ({amp_err})   DHT = {thd:.2f} %   RSB = {snr:.1f} dB',
+        'analysis_waiting': 'En attente d\'échantillons...',
         'clear_terminal': '🧹 EFFACER TERMINAL',
+        'record': '⏺ ENREGISTRER',
+        'record_stop': '⏹ ARRÊTER',
+        'record_saving': '⏳ ÉCRITURE...',
+        'record_stats': 'ENR {mb:.1f} Mo, {dropped} perdus',
+        'record_started': '⏺ Enregistrement du trafic brut dans {path}\n',
+        'record_stopped': '⏹ Enregistrement arrêté : {records} enregistrements, {mb:.1f} Mo dans {files} fichier(s), {dropped} perdus\n',
+        'capture_error': 'Erreur de capture',
+        'replay': '📂 REJOUER',
+        'replay_stop': '⏹ {position:.1f} / {duration:.1f} s',
+        'replay_speed': 'VITESSE :',
+        'replay_done': '📂 Relecture terminée : {records} enregistrements, {mb:.2f} Mo en {elapsed:.2f} s ({mb_per_s:.2f} Mo/s, {records_per_s:.0f} enr./s)\n',
+        'error_record': 'Impossible de démarrer l\'enregistrement : {error}',
+        'trace': '🔬 TRACE',
+        'trace_stop': '🔬 SAUVER LA TRACE ({spans})',
+        'trace_started': '🔬 Traçage des chemins de lecture et d\'affichage\n',
+        'trace_saved': '🔬 Trace enregistrée : {spans} intervalles dans {path} (à ouvrir dans chrome://tracing ou ui.perfetto.dev)\n',
+        'trace_error': 'Erreur de trace',
+        'error_trace': 'Impossible d\'enregistrer la trace : {error}',
+        'log_search': 'RECHERCHE :',
+        'log_regex': 'REGEX',
+        'log_case': 'Aa',
+        'log_only': 'RÉSULTATS SEULS',
+        'log_tag': 'TYPE :',
+        'log_window': 'DERNIÈRES :',
+        'log_tag_all': 'TOUS',
+        'log_tag_received': 'REÇUS',
+        'log_tag_sent': 'ENVOYÉS',
+        'log_tag_system': 'SYSTÈME',
+        'log_tag_info': 'INFO',
+        'log_tag_warning': 'AVERTISSEMENTS',
+        'log_tag_error': 'ERREURS',
+        'log_lines': '{shown} / {total} lignes',
+        'log_filtering': 'Filtrage... {percent:.0f} %',
+        'log_match': 'Résultat à la ligne {line}',
+        'log_no_match': 'Aucun résultat',
+        'log_bad_regex': 'Regex invalide : {error}',
         'terminal_cleared': '✨ TERMINAL EFFACÉ',
         'send': 'ENVOYER',
         'theme_toggle': '🌓 THÈME QUANTIQUE',
@@ -123,117 +289,416 @@ TRANSLATIONS = {
         'disconnected': 'Déconnecté',
         'connected': 'Connecté',
         'autoconnect': '🔍 AUTO-CONNEXION',
+        'probe_started': '🔍 Analyse de {count} port(s)...\n',
+        'probe_confirmed': '🔍 {port} @ {baud} bps : trafic détecté\n',
+        'probe_failed': '🔍 {port} : ouverture impossible\n',
+        'probe_fallback': '🔍 Aucun trafic détecté, utilisation du port silencieux {port} @ {baud} bps\n',
+        'probe_none': 'Aucun port COM/baudrate disponible pour la connexion automatique\n',
+        'profile_hit': '💾 Profil en cache utilisé : {port} @ {baud} bps\n',
+        'time_to_connect': '⏱️ Connecté en {ms:.0f} ms ({method})\n',
+        'codec': 'CODEC :',
+        'codec_stats': '{codec} : RX {rx:.1f} ko/s, TX {tx:.1f} ko/s, {errors} err',
+        'port_added': '🔌 Port ajouté : {port}\n',
+        'port_removed': '🔌 Port retiré : {port}\n',
+        'link_lost': '⚠️ Liaison série perdue : {error}\n',
+        'reconnecting': '🔁 Reconnexion à {port} (tentative {attempt})...\n',
+        'reconnect_failed': '❌ Abandon de la reconnexion à {port}\n',
+        'boards': '🧩 CARTES',
+        'boards_title': '🧩 Cartes STM32',
+        'board_group': 'GROUPE :',
+        'board_add': '➕ AJOUTER',
+        'board_remove': '➖ RETIRER',
+        'board_target': 'CIBLE :',
+        'board_all': 'toutes les cartes',
+        'board_amp': 'AMP %',
+        'board_freq': 'FRÉQ Hz',
+        'board_stats': '{lines} lignes, RX {kb:.1f} ko, {dropped} perdues, aller-retour p50 {rtt:.1f} ms',
+        'board_none': 'Aucune carte connectée ne correspond à {target}',
     }
 }
 
-# --- Serial Controller with Threading ---
-class SerialController:
-    """Handles serial port connection, disconnection, and data transfer with threading."""
-    def __init__(self):
-        self.ser = None
-        self.connected = False
-        self.read_thread = None
-        self.stop_event = threading.Event()
-        self.data_queue = queue.Queue()
-        self.lock = threading.Lock()
-        self.last_read_time = 0
-        self.data_buffer = b''
-
-    def connect(self, port, baudrate=115200):
-        try:
-            with self.lock:
-                self.ser = serial.Serial(
-                    port, 
-                    baudrate, 
-                    timeout=0.01,  # Non-blocking with short timeout
-                    write_timeout=1
-                )
-                self.connected = True
-                self.stop_event.clear()
-                
-                # Start the reading thread
-                self.read_thread = threading.Thread(
-                    target=self._read_serial, 
-                    daemon=True
-                )
-                self.read_thread.start()
-                return True
-        except Exception as e:
-            messagebox.showerror('Connection Error', f'Failed to connect: {e}')
-            return False
+# --- GUI Refresh Scheduling ---
+class AdaptiveScheduler:
+    """Picks the delay before the next GUI tick from the load seen in the last one.
 
-    def disconnect(self):
-        self.stop_event.set()
-        if self.read_thread and self.read_thread.is_alive():
-            self.read_thread.join(timeout=0.1)
-            
-        with self.lock:
-            if self.ser and self.ser.is_open:
-                self.ser.close()
-            self.ser = None
-            self.connected = False
-
-    def send(self, data):
-        if self.connected:
-            try:
-                with self.lock:
-                    self.ser.write(data.encode())
-                return True
-            except Exception as e:
-                messagebox.showerror('Transmission Error', f'Failed to send data: {e}')
-                return False
+    Idle ticks back off geometrically up to `idle_interval_ms` to save CPU.
+    Busy ticks tighten toward `frame_budget_ms`, minus the measured render
+    time, but never below the render time itself so Tk keeps handling input.
+    """
+    def __init__(self, base_interval_ms=50, min_interval_ms=10, idle_interval_ms=500,
+                 frame_budget_ms=16, idle_backoff=1.5):
+        self.base_interval_ms = base_interval_ms
+        self.min_interval_ms = min_interval_ms
+        self.idle_interval_ms = idle_interval_ms
+        self.frame_budget_ms = frame_budget_ms
+        self.idle_backoff = idle_backoff
+        self.interval_ms = base_interval_ms
+        self.last_render_ms = 0.0
+        self.avg_render_ms = 0.0
+
+    def update(self, busy, render_ms):
+        """Record one tick and return the next interval in whole milliseconds."""
+        self.last_render_ms = render_ms
+        self.avg_render_ms += 0.2 * (render_ms - self.avg_render_ms)
+        if busy:
+            self.interval_ms = max(self.frame_budget_ms - self.avg_render_ms,
+                                   self.avg_render_ms, self.min_interval_ms)
         else:
-            messagebox.showwarning('Transmission Error', 'Serial is not connected!')
-            return False
+            self.interval_ms = min(self.interval_ms * self.idle_backoff, self.idle_interval_ms)
+        return int(round(self.interval_ms))
 
-    def send_amp_freq(self, amplitude, frequency):
-        print(f"Sending amplitude: {amplitude}, frequency: {frequency}")
-        cmd = f'A{amplitude:03d}F{frequency:04d}\n'
-        return self.send(cmd)
+    def reset(self):
+        """Drop back to the base interval, e.g. after user activity."""
+        self.interval_ms = self.base_interval_ms
 
-    def get_data(self):
-        """Get all available data from the queue"""
-        data_lines = []
-        while not self.data_queue.empty():
-            try:
-                data_lines.append(self.data_queue.get_nowait())
-            except queue.Empty:
-                break
-        return data_lines
+# --- Monitor Log View ---
+# Tags the monitor filter offers, and its time windows (label, seconds back from now)
+LOG_TAGS = ('received', 'sent', 'system', 'info', 'warning', 'error')
+LOG_WINDOWS = (('∞', None), ('10 s', 10), ('1 min', 60), ('10 min', 600), ('1 h', 3600))
 
-    def _read_serial(self):
-        """Thread function to read serial data in real-time"""
-        buffer = b''
-        while not self.stop_event.is_set() and self.connected:
-            try:
-                with self.lock:
-                    if self.ser and self.ser.is_open:
-                        # Read all available data
-                        data = self.ser.read(self.ser.in_waiting or 1)
-                        if data:
-                            buffer += data
-                            # Process complete lines
-                            while b'\n' in buffer:
-                                line, buffer = buffer.split(b'\n', 1)
-                                decoded = line.decode(errors='ignore').strip()
-                                if decoded:
-                                    self.data_queue.put(decoded)
-                    else:
-                        time.sleep(0.01)  # Short sleep if not connected
-            except Exception as e:
-                print(f"Serial read error: {e}")
-                time.sleep(0.1)
-
-        # Process any remaining data in buffer
-        if buffer:
-            decoded = buffer.decode(errors='ignore').strip()
-            if decoded:
-                self.data_queue.put(decoded)
+
+class LogView(ttk.Frame):
+    """Shows a LogStore in a Text widget that only holds the rows on screen.
+
+    Scrolling, resizing and new lines re-insert just the visible rows, so a
+    refresh costs the same with a hundred or a million lines logged. When
+    `index` is set (sorted line numbers, e.g. LogFilter.index), only those
+    lines are shown.
+    """
+    def __init__(self, parent, store, font):
+        super().__init__(parent)
+        self.store = store
+        self.index = None
+        self.top = 0  # Position of the first visible row among the lines shown
+        self.follow = True  # Keep the newest line in view while scrolled to the bottom
+        self.highlight = None  # Line number marked with the 'match' tag
+        self._linespace = font.metrics('linespace')
+        self._drawn = None  # What the Text holds, to skip redrawing the same rows
+
+        self.text = tk.Text(self, height=10, state='disabled', wrap='none', relief='flat', borderwidth=0,
+                            font=font, padx=10, pady=10)
+        self.yscroll = ttk.Scrollbar(self, orient='vertical', command=self._on_scrollbar)
+        self.xscroll = ttk.Scrollbar(self, orient='horizontal', command=self.text.xview)
+        self.text.config(xscrollcommand=self.xscroll.set)
+        self.text.grid(row=0, column=0, sticky='nsew')
+        self.yscroll.grid(row=0, column=1, sticky='ns')
+        self.xscroll.grid(row=1, column=0, sticky='ew')
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.text.bind('<Configure>', lambda event: self.refresh())
+        self.text.bind('<MouseWheel>', lambda event: self._scroll_by(-3 if event.delta > 0 else 3))
+        self.text.bind('<Button-4>', lambda event: self._scroll_by(-3))
+        self.text.bind('<Button-5>', lambda event: self._scroll_by(3))
+        self.text.bind('<Prior>', lambda event: self._scroll_by(-self.rows()))
+        self.text.bind('<Next>', lambda event: self._scroll_by(self.rows()))
+        self.text.bind('<Control-Home>', lambda event: self._scroll_by(-len(self)))
+        self.text.bind('<Control-End>', lambda event: self._scroll_by(len(self)))
+
+    def __len__(self):
+        return len(self.index) if self.index is not None else len(self.store)
+
+    def rows(self):
+        """Rows that fit in the widget."""
+        height = self.text.winfo_height() - 2 * int(self.text.cget('pady'))
+        return max(1, height // self._linespace)
+
+    def line_at(self, position):
+        return self.index[position] if self.index is not None else self.store.first + position
+
+    def position_of(self, number):
+        """Position of a line among those shown, or of the first one shown after it."""
+        if self.index is not None:
+            return bisect.bisect_left(self.index, number)
+        return number - self.store.first
+
+    def refresh(self):
+        """Redraw the visible rows if they changed, then the scrollbar; call after new lines."""
+        count, rows = len(self), self.rows()
+        bottom = max(0, count - rows)
+        self.top = bottom if self.follow else min(self.top, bottom)
+        shown = min(rows, count - self.top)
+        if shown:
+            first, last = self.line_at(self.top), self.line_at(self.top + shown - 1)
+        else:
+            first = last = self.store.end
+        drawn = (None if self.index is None else id(self.index), first, last, shown, self.highlight)
+        if drawn != self._drawn:
+            self._drawn = drawn
+            if self.index is None:
+                numbers = range(first, first + shown)
+            else:
+                numbers = self.index[self.top:self.top + shown]
+            self._draw(numbers)
+        self.yscroll.set(*((self.top / count, (self.top + shown) / count) if count else (0.0, 1.0)))
+
+    def _draw(self, numbers):
+        chunks, run, run_tag = [], [], None
+        for line, tag in self.store.get(numbers):
+            if tag != run_tag and run:
+                chunks += ('\n'.join(run) + '\n', run_tag)
+                run = []
+            run_tag = tag
+            run.append(line)
+        if run:
+            chunks += ('\n'.join(run), run_tag)
+        text = self.text
+        x = text.xview()[0]
+        text.config(state='normal')
+        text.delete('1.0', 'end')
+        if chunks:
+            text.insert('end', *chunks)
+        if self.highlight in numbers:
+            row = list(numbers).index(self.highlight) + 1
+            text.tag_add('match', f'{row}.0', f'{row}.end')
+        text.config(state='disabled')
+        text.xview_moveto(x)
+
+    def scroll_to(self, top):
+        count, rows = len(self), self.rows()
+        self.top = max(0, min(int(top), count - rows))
+        self.follow = self.top >= count - rows
+        self.refresh()
+
+    def _scroll_by(self, rows):
+        self.scroll_to(self.top + rows)
+        return 'break'  # Nothing for the Text's own bindings to scroll
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll_to(float(amount) * len(self))
+        elif action == 'scroll':
+            self._scroll_by(int(amount) * (self.rows() if unit == 'pages' else 1))
+
+    def show(self, number):
+        """Highlight line `number` and scroll it to the middle of the view."""
+        self.highlight = number
+        self.scroll_to(self.position_of(number) - self.rows() // 2)
+        self.follow = False
+
+
+# --- Multi-Board Window ---
+class DeviceWindow(tk.Toplevel):
+    """One monitor tab per board of a DeviceManager, and commands sent to a group of boards.
+
+    Closing the window only hides it: the boards stay connected and their
+    lines keep being drained into the tabs until they are removed.
+    """
+    def __init__(self, app, manager):
+        super().__init__(app)
+        self.app = app
+        self.manager = manager
+        self.scrollback_lines = 2000  # Per tab; oldest lines are trimmed beyond this
+        self.monitors = {}  # board name -> {'tab', 'text', 'stats', 'lines'}
+        self._ticks = 0
+        self.geometry('760x560')
+        self.minsize(600, 400)
+        self._create_widgets()
+        self.change_language()
+        self.apply_theme()
+        self.protocol('WM_DELETE_WINDOW', self.withdraw)
+        self._job = self.after(50, self._update)
+
+    def _create_widgets(self):
+        trans = self.app.trans
+        frame = ttk.Frame(self, style='Bordered.TFrame')
+        frame.pack(fill='both', expand=True, padx=10, pady=10)
+        self.labels = {}
+
+        # Adding a board
+        add_row = ttk.Frame(frame)
+        add_row.pack(fill='x', pady=5)
+        self.labels['port'] = ttk.Label(add_row)
+        self.labels['port'].pack(side='left', padx=(0, 5))
+        ports = [port.device for port in serial.tools.list_ports.comports()] + ['emulator://']
+        self.port_var = tk.StringVar(value=ports[0])
+        ttk.Combobox(add_row, values=ports, textvariable=self.port_var, width=22).pack(side='left', padx=(0, 10))
+        self.labels['baudrate'] = ttk.Label(add_row)
+        self.labels['baudrate'].pack(side='left', padx=(0, 5))
+        self.baud_var = tk.StringVar(value='115200')
+        ttk.Combobox(add_row, values=[str(baud) for baud in BAUDRATES], textvariable=self.baud_var,
+                     state='readonly', width=8).pack(side='left', padx=(0, 10))
+        self.labels['board_group'] = ttk.Label(add_row)
+        self.labels['board_group'].pack(side='left', padx=(0, 5))
+        self.group_var = tk.StringVar()
+        ttk.Entry(add_row, textvariable=self.group_var, width=8, style='TEntry').pack(side='left', padx=(0, 10))
+        self.labels['board_add'] = ttk.Button(add_row, command=self.add_board, style='Success.TButton')
+        self.labels['board_add'].pack(side='right')
+
+        # Group commands
+        send_row = ttk.Frame(frame)
+        send_row.pack(fill='x', pady=5)
+        self.labels['board_target'] = ttk.Label(send_row)
+        self.labels['board_target'].pack(side='left', padx=(0, 5))
+        self.target_var = tk.StringVar(value=trans['board_all'])
+        self.target_menu = ttk.Combobox(send_row, textvariable=self.target_var, state='readonly', width=18)
+        self.target_menu.pack(side='left', padx=(0, 10))
+        self.amp_var = tk.StringVar(value=str(self.app.amp_var.get()))
+        self.freq_var = tk.StringVar(value=str(self.app.freq_var.get()))
+        for key, var in (('board_amp', self.amp_var), ('board_freq', self.freq_var)):
+            self.labels[key] = ttk.Label(send_row)
+            self.labels[key].pack(side='left', padx=(0, 5))
+            ttk.Entry(send_row, textvariable=var, width=6, justify='center', style='TEntry').pack(side='left',
+                                                                                               padx=(0, 10))
+        self.labels['send'] = ttk.Button(send_row, command=self.send_command, style='Accent.TButton')
+        self.labels['send'].pack(side='right')
+
+        self.notebook = ttk.Notebook(frame)
+        self.notebook.pack(fill='both', expand=True, pady=5)
+
+    def change_language(self):
+        trans = self.app.trans
+        self.title(trans['boards_title'])
+        for key, widget in self.labels.items():
+            widget.config(text=trans[key])
+        for monitor in self.monitors.values():
+            monitor['remove'].config(text=trans['board_remove'])
+        self._refresh_targets()
+        self._update_stats()
+
+    def apply_theme(self):
+        theme = self.app.theme
+        self.configure(bg=theme["bg"])
+        for monitor in self.monitors.values():
+            self._theme_text(monitor['text'])
+
+    def _theme_text(self, text):
+        theme = self.app.theme
+        text.configure(bg=theme["text_area_bg"], fg=theme["text_area_fg"], insertbackground=theme["text_insert_bg"])
+        for tag, color in (('info', 'secondary'), ('sent', 'primary'), ('received', 'success'),
+                           ('error', 'error'), ('warning', 'warning'), ('system', 'accent')):
+            text.tag_config(tag, foreground=theme[color])
+
+    def _refresh_targets(self):
+        """Offer all boards, each group and each board as command targets."""
+        previous = self.target_var.get()
+        values = [self.app.trans['board_all']] + sorted(self.manager.groups) + list(self.monitors)
+        self.target_menu.config(values=values)
+        if previous not in values:
+            self.target_var.set(values[0])
+
+    # --- Boards ---
+    def add_board(self):
+        port, baud, group = self.port_var.get().strip(), self.baud_var.get(), self.group_var.get().strip()
+        if not port or not baud:
+            messagebox.showerror(self.app.trans['connection_error'], self.app.trans['error_select_port_baud'],
+                                 parent=self)
+            return
+        if port in self.monitors and port not in self.manager.devices:
+            self.remove_board(port)  # Its link was lost; the tab makes room for the new connection
+        name, suffix = port, 2
+        while name in self.monitors:  # e.g. several emulator:// boards
+            name, suffix = f'{port}#{suffix}', suffix + 1
+        try:
+            self.manager.add(port, int(baud), name=name, codec=CODECS[self.app.codec_var.get()](),
+                             group=group or None)
+        except ControllerError as e:
+            messagebox.showerror(self.app.trans['connection_error'], str(e), parent=self)
+            return
+        tab = ttk.Frame(self.notebook)
+        text = scrolledtext.ScrolledText(tab, height=10, state='disabled', wrap='word', relief='flat',
+                                         borderwidth=0, font=self.app.mono_font, padx=10, pady=10)
+        text.pack(fill='both', expand=True, padx=5, pady=5)
+        self._theme_text(text)
+        bottom = ttk.Frame(tab)
+        bottom.pack(fill='x', padx=5, pady=(0, 5))
+        stats = ttk.Label(bottom, text='', style='Status.TLabel')
+        stats.pack(side='left')
+        remove = ttk.Button(bottom, text=self.app.trans['board_remove'], style='Error.TButton',
+                            command=lambda: self.remove_board(name))
+        remove.pack(side='right')
+        self.notebook.add(tab, text=name if not group else f'{name} [{group}]')
+        self.notebook.select(tab)
+        self.monitors[name] = {'tab': tab, 'text': text, 'stats': stats, 'remove': remove, 'lines': 0}
+        self._refresh_targets()
+        self._append(name, self.app.trans['connected_msg'].format(port=port, baud=baud), 'system')
+
+    def remove_board(self, name):
+        self.manager.remove(name)
+        monitor = self.monitors.pop(name, None)
+        if monitor is not None:
+            self.notebook.forget(monitor['tab'])
+            monitor['tab'].destroy()
+        self._refresh_targets()
+
+    def on_link_lost(self, name, error):
+        """The board stays in its tab, greyed out, until it is removed."""
+        monitor = self.monitors.get(name)
+        if monitor is None:
+            return
+        self._append(name, self.app.trans['link_lost'].format(error=error), 'error')
+        self.notebook.tab(monitor['tab'], text=f'⚠️ {name}')
+        self._refresh_targets()
+
+    def send_command(self):
+        trans = self.app.trans
+        try:
+            amplitude, frequency = int(self.amp_var.get()), int(self.freq_var.get())
+        except ValueError:
+            amplitude, frequency = -1, -1
+        if not 0 <= amplitude <= 100:
+            messagebox.showerror(trans['transmission_error'], trans['error_amp'], parent=self)
+            return
+        if not 1 <= frequency <= 1000:
+            messagebox.showerror(trans['transmission_error'], trans['error_freq'], parent=self)
+            return
+        target = self.target_var.get()
+        results = self.manager.send_amp_freq(amplitude, frequency,
+                                             None if target == trans['board_all'] else target)
+        if not results:
+            messagebox.showerror(trans['transmission_error'], trans['board_none'].format(target=target), parent=self)
+            return
+        for name, ok in results.items():
+            if ok:
+                self._append(name, trans['transmitted'].format(amp=amplitude, freq=frequency), 'sent')
+
+    # --- Monitors ---
+    def _append(self, name, message, tag):
+        text = self.monitors[name]['text']
+        follow = text.yview()[1] >= 1.0
+        text.config(state='normal')
+        text.insert('end', message, tag)
+        lines = int(text.index('end-1c').split('.')[0]) - 1
+        limit = self.scrollback_lines
+        if lines > limit + limit // 10:
+            text.delete('1.0', f'{lines - limit + 1}.0')
+        text.config(state='disabled')
+        if follow:
+            text.see('end')
+
+    def _update(self):
+        """Drain every board with one insert per board, then refresh the statistics now and then."""
+        received = self.app.trans['received']
+        for name, records in self.manager.get_data().items():
+            if records and name in self.monitors:
+                self.monitors[name]['lines'] += len(records)
+                self._append(name, ''.join(received.format(line=line) for _, line in records), 'received')
+        self._ticks += 1
+        if self._ticks % 10 == 0:
+            self._update_stats()
+        self._job = self.after(50, self._update)
+
+    def _update_stats(self):
+        stats = self.manager.stats()
+        for name, monitor in self.monitors.items():
+            board = stats.get(name)
+            if board is not None:
+                monitor['stats'].config(text=self.app.trans['board_stats'].format(
+                    lines=monitor['lines'], kb=board['rx_bytes'] / 1000, dropped=board['dropped'],
+                    rtt=board['rtt_p50_ms']))
+
+    def close(self):
+        self.after_cancel(self._job)
+        self.destroy()
 
 # --- Main Application ---
 class App(tk.Tk):
-    """The main application window with real-time performance."""
-    def __init__(self):
+    """The main application window with real-time performance.
+
+    `transport='async'` drives the port from an asyncio event loop thread
+    (stm32_async.AsyncBridge) instead of the reader/writer threads.
+    """
+    def __init__(self, transport='thread'):
         super().__init__()
         self.title('⚡ STM32 Real-Time Serial Interface')
         self.geometry('800x850')
@@ -241,17 +706,78 @@ class App(tk.Tk):
         self.minsize(700, 750)
         
         # Performance metrics
-        self.update_interval = 50  # ms (20 updates per second)
+        self.scheduler = AdaptiveScheduler(base_interval_ms=50)
+        self.update_interval = self.scheduler.interval_ms  # ms, chosen per tick
+        # Serial arrival -> rendered in the monitor, per line
+        self.latency_stats = LatencyTracker()
         self.last_update = 0
         self.received_count = 0
         self.sent_count = 0
+        self.render_time = REGISTRY.histogram('stm32_gui_tick_seconds', 'GUI tick: drain, render and plot')
+        self.tick_interval = REGISTRY.gauge('stm32_gui_tick_interval_seconds', 'Delay before the next GUI tick')
+        self.reconnects = REGISTRY.counter('stm32_reconnects_total', 'Automatic reconnections after a link loss')
+
+        # Serial monitor: every line goes to the store, the view only draws the rows on screen
+        self.log_store = LogStore(max_lines=1000000)
+        self.log_filter = None  # LogFilter while a tag, time window or "only matches" filter is set
+        self.log_filter_batch = 200000  # Lines a filter tests per tick while it is being built
+        self.log_pattern = None  # Compiled search box text
+        self.log_query_error = None  # Why the search box text is not a valid regex
+        self._log_query_job = None
+
+        # Live waveform: parsed samples are kept in a NumPy ring (if available)
+        self.sample_ring = stm32_dsp.SampleRing() if stm32_dsp else None
+        self.plot_window = 8192  # Newest samples shown, decimated to the canvas width
+        self.analyzer = None
+        self._shown_analysis = None
 
         # Custom font for futuristic look
         self.custom_font = tkfont.Font(family="Segoe UI", size=10)
         self.title_font = tkfont.Font(family="Segoe UI", size=12, weight="bold")
         self.mono_font = tkfont.Font(family="Consolas", size=10)
 
-        self.serial_ctrl = SerialController()
+        if transport == 'async':
+            from stm32_async import AsyncBridge  # asyncio is only imported when asked for
+            self.serial_ctrl = AsyncBridge()
+        else:
+            self.serial_ctrl = SerialController()
+        # Slider drags go through here so the UART only sees the newest values
+        self.live_max_rate = 20.0  # commands per second while dragging
+        self.coalescer = CommandCoalescer(self._send_live, max_rate=self.live_max_rate)
+        # Timed frequency/amplitude sweep, driven against absolute deadlines
+        self.sweep = None
+        # Raw traffic recording (see toggle_recording)
+        self.capture_compression = DEFAULT_COMPRESSION
+        self._stopping_recorder = None  # Recorder still writing out its queue on a worker thread
+        self._closing = False
+        # Extra boards driven side by side (see show_boards), created on first use
+        self.device_manager = None
+        self.device_window = None
+        if self.sample_ring is not None:
+            # FFT/THD of the received sine, a few times per second on its own thread
+            self.analyzer = stm32_dsp.SineAnalyzer(
+                self.sample_ring, sample_rate=10000, commanded=lambda: self.serial_ctrl.last_command
+            ).start()
+        # Events posted by background workers, handled on the Tk thread
+        self._ui_events = queue.Queue()
+        self._prober = None
+        # Last working port/baud per USB device, for instant reconnects
+        self.profiles = PortProfileStore()
+        self._autoconnect_started = None
+        # Hot-plug handling: the device to reconnect to, and the backoff state
+        self._connected_device = None  # (device_key or None, port, baud)
+        self._reconnect_target = None
+        self._reconnect_job = None
+        self._reconnect_attempts = 0
+        self.reconnect_backoff = (0.5, 8.0)  # s: first delay, longest delay
+        self.max_reconnect_attempts = 8
+        self.reconnect_count = 0
+        self.serial_ctrl.on_link_lost = lambda error: self._ui_events.put(('link_lost', (str(error),)))
+        # Send failures can come from worker threads, so dialogs are shown from the event queue
+        self.serial_ctrl.on_error = lambda message: self._ui_events.put(('controller_error', (message,)))
+        self.port_watcher = PortWatcher(
+            lambda added, removed, ports: self._ui_events.put(('ports_changed', (added, removed, ports)))
+        )
         self.is_dark = True
         self.theme = DARK_THEME
 
@@ -264,10 +790,11 @@ class App(tk.Tk):
         self._apply_theme()
         self._set_connection_state(False)
         
-        # Try autoconnect at startup
+        # Try autoconnect at startup, then follow ports being plugged and unplugged
         self.after(300, self.autoconnect_serial)
+        self.port_watcher.start()
         # Start the GUI update loop
-        self.after(self.update_interval, self._update_serial_monitor)
+        self._monitor_job = self.after(self.update_interval, self._update_serial_monitor)
 
     def _setup_styles(self):
         """Configures all ttk styles based on the current theme."""
@@ -371,16 +898,38 @@ class App(tk.Tk):
         # Performance metrics
         metrics_frame = ttk.Frame(self.main_frame)
         metrics_frame.pack(fill='x', pady=5)
+        counters_row = ttk.Frame(metrics_frame)
+        counters_row.pack(fill='x')
+        timing_row = ttk.Frame(metrics_frame)
+        timing_row.pack(fill='x')
         
-        self.rx_label = ttk.Label(metrics_frame, text=self.trans['rx'].format(count=0), style='Status.TLabel')
+        self.rx_label = ttk.Label(counters_row, text=self.trans['rx'].format(count=0), style='Status.TLabel')
         self.rx_label.pack(side='left', padx=5)
         
-        self.tx_label = ttk.Label(metrics_frame, text=self.trans['tx'].format(count=0), style='Status.TLabel')
+        self.tx_label = ttk.Label(counters_row, text=self.trans['tx'].format(count=0), style='Status.TLabel')
         self.tx_label.pack(side='left', padx=5)
+
+        self.dropped_label = ttk.Label(counters_row, text=self.trans['dropped'].format(count=0), style='Status.TLabel')
+        self.dropped_label.pack(side='left', padx=5)
         
-        self.latency_label = ttk.Label(metrics_frame, text=self.trans['latency'].format(ms=0), style='Status.TLabel')
+        self.latency_label = ttk.Label(timing_row, text=self.trans['latency'].format(p50=0, p95=0, p99=0),
+                                       style='Status.TLabel')
         self.latency_label.pack(side='right', padx=5)
 
+        self.rtt_label = ttk.Label(timing_row, text=self.trans['rtt'].format(p50=0, p95=0, p99=0),
+                                   style='Status.TLabel')
+        self.rtt_label.pack(side='right', padx=5)
+
+        self.codec_stats_label = ttk.Label(timing_row, text='', style='Status.TLabel')
+        self.codec_stats_label.pack(side='left', padx=5)
+
+        self.wire_label = ttk.Label(counters_row, text=self.trans['wire_latency'].format(ms=0), style='Status.TLabel')
+        self.wire_label.pack(side='right', padx=5)
+
+        self.tick_label = ttk.Label(counters_row, text=self.trans['tick'].format(interval=self.update_interval, render=0),
+                                    style='Status.TLabel')
+        self.tick_label.pack(side='right', padx=5)
+
         # --- Serial Configuration Frame ---
         config_frame = ttk.LabelFrame(self.main_frame, text=self.trans['connection_protocol'])
         config_frame.pack(fill='x', pady=5)
@@ -400,7 +949,7 @@ class App(tk.Tk):
         self.refresh_btn.grid(row=0, column=2, padx=5, pady=5, sticky='w')
 
         # Baudrate selection
-        baudrates = ["9600", "19200", "38400", "57600", "115200", "230400", "500000", "1000000", "2000000"]
+        baudrates = [str(baud) for baud in BAUDRATES]
         self.baud_var = tk.StringVar(value="115200")
         ttk.Label(config_frame, text=self.trans['baudrate']).grid(row=0, column=3, padx=5, pady=5, sticky='e')
         self.baud_menu = ttk.Combobox(config_frame, values=baudrates, textvariable=self.baud_var, 
@@ -421,6 +970,25 @@ class App(tk.Tk):
                                           command=self.autoconnect_serial, style='TButton')
         self.autoconnect_btn.grid(row=0, column=7, padx=5, pady=5, sticky='ew')
 
+        # Wire codec selection
+        self.codec_var = tk.StringVar(value=self.serial_ctrl.codec.name)
+        self.codec_label = ttk.Label(config_frame, text=self.trans['codec'])
+        self.codec_label.grid(row=1, column=0, padx=5, pady=5, sticky='e')
+        self.codec_menu = ttk.Combobox(config_frame, values=list(CODECS), textvariable=self.codec_var,
+                                       state='readonly', width=12)
+        self.codec_menu.grid(row=1, column=1, padx=5, pady=5, sticky='ew')
+        self.codec_menu.bind('<<ComboboxSelected>>', self.change_codec)
+
+        # Capture replay
+        self.replay_speed_label = ttk.Label(config_frame, text=self.trans['replay_speed'])
+        self.replay_speed_label.grid(row=1, column=3, padx=5, pady=5, sticky='e')
+        self.replay_speed_var = tk.StringVar(value='1')
+        ttk.Combobox(config_frame, values=['0.5', '1', '2', '10', '100', 'max'], textvariable=self.replay_speed_var,
+                     state='readonly', width=6).grid(row=1, column=4, padx=5, pady=5, sticky='ew')
+        self.replay_btn = ttk.Button(config_frame, text=self.trans['replay'], command=self.toggle_replay,
+                                     style='TButton')
+        self.replay_btn.grid(row=1, column=5, padx=5, pady=5, sticky='ew')
+
         # --- Control Panel ---
         control_frame = ttk.Frame(self.main_frame)
         control_frame.pack(fill='x', pady=10)
@@ -454,29 +1022,147 @@ class App(tk.Tk):
                                   justify='center', style='TEntry')
         self.freq_entry.grid(row=1, column=0, pady=(0, 10))
 
+        # Live-on-drag sending
+        live_row = ttk.Frame(control_frame)
+        live_row.grid(row=1, column=0, columnspan=2, sticky='ew', pady=(5, 0))
+        self.live_var = tk.BooleanVar(value=False)
+        self.live_check = ttk.Checkbutton(live_row, text=self.trans['live_drag'], variable=self.live_var)
+        self.live_check.pack(side='left')
+        self.live_label = ttk.Label(live_row, text=self.trans['live_stats'].format(sent=0, coalesced=0),
+                                    style='Status.TLabel')
+        self.live_label.pack(side='left', padx=10)
+
         # Send button
         self.send_btn = ttk.Button(self.main_frame, text=self.trans['transmit'], 
                                  command=self.send_command, 
                                  style='Accent.TButton')
         self.send_btn.pack(fill='x', pady=10, ipady=10)
 
+        # --- Frequency/Amplitude Sweep ---
+        sweep_frame = ttk.Frame(self.main_frame)
+        sweep_frame.pack(fill='x', pady=(0, 10))
+        self.sweep_labels = {}
+        self.sweep_labels['sweep'] = ttk.Label(sweep_frame, text=self.trans['sweep'])
+        self.sweep_labels['sweep'].pack(side='left', padx=(0, 5))
+        self.sweep_mode_var = tk.StringVar(value='log')
+        ttk.Combobox(sweep_frame, values=list(SWEEP_MODES), textvariable=self.sweep_mode_var,
+                     state='readonly', width=7).pack(side='left', padx=(0, 5))
+        self.sweep_start_var = tk.StringVar(value='1')
+        self.sweep_stop_var = tk.StringVar(value='1000')
+        ttk.Entry(sweep_frame, textvariable=self.sweep_start_var, width=5, justify='center',
+                  style='TEntry').pack(side='left')
+        ttk.Label(sweep_frame, text='→').pack(side='left', padx=2)
+        ttk.Entry(sweep_frame, textvariable=self.sweep_stop_var, width=5, justify='center',
+                  style='TEntry').pack(side='left', padx=(0, 10))
+        self.sweep_steps_var = tk.StringVar(value='100')
+        self.sweep_step_var = tk.StringVar(value='10')  # Hz per step, stepped mode only
+        self.sweep_dwell_var = tk.StringVar(value='50')
+        self.sweep_amp_end_var = tk.StringVar(value='')
+        for key, var in (('sweep_steps', self.sweep_steps_var), ('sweep_step', self.sweep_step_var),
+                         ('sweep_dwell', self.sweep_dwell_var), ('sweep_amp_end', self.sweep_amp_end_var)):
+            self.sweep_labels[key] = ttk.Label(sweep_frame, text=self.trans[key])
+            self.sweep_labels[key].pack(side='left', padx=(0, 5))
+            ttk.Entry(sweep_frame, textvariable=var, width=5, justify='center',
+                      style='TEntry').pack(side='left', padx=(0, 10))
+        self.sweep_btn = ttk.Button(sweep_frame, text=self.trans['sweep_start'],
+                                    command=self.toggle_sweep, style='TButton')
+        self.sweep_btn.pack(side='right')
+
+        # --- Duty Table Upload (needs NumPy) ---
+        self.upload_table_btn = None
+        if stm32_dsp is not None:
+            lut_frame = ttk.Frame(self.main_frame)
+            lut_frame.pack(fill='x', pady=(0, 10))
+            self.lut_labels = {}
+            for key in ('duty_table', 'table_length'):
+                self.lut_labels[key] = ttk.Label(lut_frame, text=self.trans[key])
+                self.lut_labels[key].pack(side='left', padx=(0, 5))
+            self.lut_length_var = tk.StringVar(value='256')
+            ttk.Combobox(lut_frame, values=['64', '128', '256', '512', '1024', '2048', '4096'],
+                         textvariable=self.lut_length_var, state='readonly', width=6).pack(side='left', padx=(0, 10))
+            self.lut_labels['table_bits'] = ttk.Label(lut_frame, text=self.trans['table_bits'])
+            self.lut_labels['table_bits'].pack(side='left', padx=(0, 5))
+            self.lut_bits_var = tk.StringVar(value='12')
+            ttk.Combobox(lut_frame, values=['8', '10', '12', '14', '16'], textvariable=self.lut_bits_var,
+                         state='readonly', width=4).pack(side='left', padx=(0, 10))
+            self.lut_labels['dead_time'] = ttk.Label(lut_frame, text=self.trans['dead_time'])
+            self.lut_labels['dead_time'].pack(side='left', padx=(0, 5))
+            self.lut_dead_var = tk.StringVar(value='0')
+            ttk.Entry(lut_frame, textvariable=self.lut_dead_var, width=6, justify='center',
+                      style='TEntry').pack(side='left', padx=(0, 10))
+            self.upload_table_btn = ttk.Button(lut_frame, text=self.trans['upload_table'],
+                                               command=self.upload_duty_table, style='TButton')
+            self.upload_table_btn.pack(side='right')
+
+        # --- Live Waveform ---
+        self.plot_canvas = None
+        if self.sample_ring is not None:
+            self.plot_frame = ttk.LabelFrame(self.main_frame, text=self.trans['waveform'])
+            self.plot_frame.pack(fill='x', pady=5)
+            self.plot_canvas = tk.Canvas(self.plot_frame, height=140, highlightthickness=0, borderwidth=0)
+            self.plot_canvas.pack(fill='x', expand=True, padx=5, pady=5)
+            self.plot_line = self.plot_canvas.create_line(0, 0, 0, 0, width=1)
+
+            analysis_row = ttk.Frame(self.plot_frame)
+            analysis_row.pack(fill='x', padx=5, pady=(0, 5))
+            self.sample_rate_label = ttk.Label(analysis_row, text=self.trans['sample_rate'])
+            self.sample_rate_label.pack(side='left')
+            self.sample_rate_var = tk.StringVar(value=str(self.analyzer.sample_rate))
+            self.sample_rate_var.trace_add('write', self._on_sample_rate_change)
+            ttk.Entry(analysis_row, textvariable=self.sample_rate_var, width=8, justify='center',
+                      style='TEntry').pack(side='left', padx=5)
+            self.analysis_label = ttk.Label(analysis_row, text=self.trans['analysis_waiting'], style='Status.TLabel')
+            self.analysis_label.pack(side='left', padx=10)
+
         # --- Serial Monitor ---
         monitor_frame = ttk.LabelFrame(self.main_frame, text=self.trans['serial_monitor'])
         monitor_frame.pack(fill='both', expand=True, pady=5)
+        self.monitor_frame = monitor_frame
         
-        # Text area with custom tags for coloring
-        self.uart_text = scrolledtext.ScrolledText(
-            monitor_frame, 
-            height=10, 
-            state='disabled', 
-            wrap='word', 
-            relief='flat', 
-            borderwidth=0,
-            font=self.mono_font,
-            padx=10,
-            pady=10
-        )
-        self.uart_text.pack(fill='both', expand=True, padx=5, pady=5)
+        # Search and filters over the whole log
+        search_frame = ttk.Frame(monitor_frame)
+        search_frame.pack(fill='x', padx=5, pady=(5, 0))
+        self.log_labels = {}
+        self.log_labels['log_search'] = ttk.Label(search_frame, text=self.trans['log_search'])
+        self.log_labels['log_search'].pack(side='left', padx=(0, 5))
+        self.log_search_var = tk.StringVar()
+        self.log_search_var.trace_add('write', self._on_log_query)
+        search_entry = ttk.Entry(search_frame, textvariable=self.log_search_var, width=24, style='TEntry')
+        search_entry.pack(side='left', padx=(0, 5))
+        search_entry.bind('<Return>', lambda e: self.find_in_log())
+        search_entry.bind('<Shift-Return>', lambda e: self.find_in_log(backward=True))
+        ttk.Button(search_frame, text='▲', width=3, command=lambda: self.find_in_log(backward=True),
+                   style='TButton').pack(side='left')
+        ttk.Button(search_frame, text='▼', width=3, command=self.find_in_log,
+                   style='TButton').pack(side='left', padx=(0, 10))
+        self.log_regex_var = tk.BooleanVar(value=False)
+        self.log_case_var = tk.BooleanVar(value=False)
+        self.log_only_var = tk.BooleanVar(value=False)
+        for key, var in (('log_regex', self.log_regex_var), ('log_case', self.log_case_var),
+                         ('log_only', self.log_only_var)):
+            self.log_labels[key] = ttk.Checkbutton(search_frame, text=self.trans[key], variable=var,
+                                                   command=self._on_log_query)
+            self.log_labels[key].pack(side='left', padx=(0, 10))
+        self.log_labels['log_tag'] = ttk.Label(search_frame, text=self.trans['log_tag'])
+        self.log_labels['log_tag'].pack(side='left', padx=(0, 5))
+        self.log_tag_menu = ttk.Combobox(search_frame, state='readonly', width=14)
+        self.log_tag_menu.pack(side='left', padx=(0, 10))
+        self.log_tag_menu.bind('<<ComboboxSelected>>', self._on_log_query)
+        self.log_labels['log_window'] = ttk.Label(search_frame, text=self.trans['log_window'])
+        self.log_labels['log_window'].pack(side='left', padx=(0, 5))
+        self.log_window_var = tk.StringVar(value=LOG_WINDOWS[0][0])
+        window_menu = ttk.Combobox(search_frame, values=[label for label, _ in LOG_WINDOWS],
+                                   textvariable=self.log_window_var, state='readonly', width=7)
+        window_menu.pack(side='left', padx=(0, 10))
+        window_menu.bind('<<ComboboxSelected>>', self._on_log_query)
+        self.log_status_label = ttk.Label(search_frame, text='', style='Status.TLabel')
+        self.log_status_label.pack(side='left')
+        self._set_log_tag_names()
+
+        # Virtualized log, with custom tags for coloring
+        self.log_view = LogView(monitor_frame, self.log_store, self.mono_font)
+        self.log_view.pack(fill='both', expand=True, padx=5, pady=5)
+        self.uart_text = self.log_view.text
         
         # Configure text tags for different message types
         self.uart_text.tag_config('info', foreground=self.theme["secondary"])
@@ -485,6 +1171,7 @@ class App(tk.Tk):
         self.uart_text.tag_config('error', foreground=self.theme["error"])
         self.uart_text.tag_config('warning', foreground=self.theme["warning"])
         self.uart_text.tag_config('system', foreground=self.theme["accent"])
+        self.uart_text.tag_config('match', background=self.theme["highlight"])
 
         # --- Console Control Panel ---
         console_ctrl_frame = ttk.Frame(monitor_frame)
@@ -494,6 +1181,18 @@ class App(tk.Tk):
         self.clear_btn = ttk.Button(console_ctrl_frame, text=self.trans['clear_terminal'], 
                                   command=self.clear_terminal, style='Warning.TButton')
         self.clear_btn.pack(side='left', padx=(0, 10))
+
+        # Capture of the raw traffic to disk
+        self.record_btn = ttk.Button(console_ctrl_frame, text=self.trans['record'],
+                                     command=self.toggle_recording, style='TButton')
+        self.record_btn.pack(side='left', padx=(0, 5))
+        self.record_label = ttk.Label(console_ctrl_frame, text='', style='Status.TLabel')
+        self.record_label.pack(side='left', padx=(0, 10))
+
+        # Span tracing of the read and render paths (see toggle_trace)
+        self.trace_btn = ttk.Button(console_ctrl_frame, text=self.trans['trace'],
+                                    command=self.toggle_trace, style='TButton')
+        self.trace_btn.pack(side='left', padx=(0, 10))
         
         # Manual Command Input
         self.input_var = tk.StringVar()
@@ -514,6 +1213,10 @@ class App(tk.Tk):
         self.mode_btn = ttk.Button(footer_frame, text=self.trans['theme_toggle'], 
                                   command=self.toggle_mode, style='TButton')
         self.mode_btn.pack(side='right')
+
+        self.boards_btn = ttk.Button(footer_frame, text=self.trans['boards'], command=self.show_boards,
+                                     style='TButton')
+        self.boards_btn.pack(side='right', padx=(0, 10))
         
         self.version_label = ttk.Label(footer_frame, text=self.trans['version'], style='Status.TLabel')
         self.version_label.pack(side='left')
@@ -532,19 +1235,40 @@ class App(tk.Tk):
         self.status_label.config(text=self.trans['status_disconnected'])
         self.rx_label.config(text=self.trans['rx'].format(count=self.received_count))
         self.tx_label.config(text=self.trans['tx'].format(count=self.sent_count))
-        self.latency_label.config(text=self.trans['latency'].format(ms=self.update_interval))
+        self.dropped_label.config(text=self.trans['dropped'].format(count=self.serial_ctrl.dropped_lines))
+        self.latency_label.config(text=self.trans['latency'].format(**self.latency_stats.percentiles()))
+        self.rtt_label.config(text=self.trans['rtt'].format(**self.serial_ctrl.rtt_stats.percentiles()))
+        self._update_codec_stats()
+        self.live_label.config(text=self.trans['live_stats'].format(**self.coalescer.stats()))
+        self.wire_label.config(text=self.trans['wire_latency'].format(ms=self.serial_ctrl.tx_latency_ms))
+        self.tick_label.config(text=self.trans['tick'].format(interval=self.update_interval,
+                                                              render=self.scheduler.last_render_ms))
         self.connect_btn.config(text=self.trans['connect'])
         self.disconnect_btn.config(text=self.trans['disconnect'])
         self.send_btn.config(text=self.trans['transmit'])
         self.clear_btn.config(text=self.trans['clear_terminal'])
+        self._update_record_status()
+        self._update_trace_button()
         self.send_serial_btn.config(text=self.trans['send'])
         self.mode_btn.config(text=self.trans['theme_toggle'])
+        self.boards_btn.config(text=self.trans['boards'])
+        if self.device_window is not None:
+            self.device_window.change_language()
         self.version_label.config(text=self.trans['version'])
         # Update group/frame labels
         self.main_frame.winfo_children()[2].config(text=self.trans['connection_protocol'])
         self.main_frame.winfo_children()[3].winfo_children()[0].config(text=self.trans['amplitude'])
         self.main_frame.winfo_children()[3].winfo_children()[1].config(text=self.trans['frequency'])
-        self.main_frame.winfo_children()[5].config(text=self.trans['serial_monitor'])
+        self.monitor_frame.config(text=self.trans['serial_monitor'])
+        for key, widget in self.log_labels.items():
+            widget.config(text=self.trans[key])
+        self._set_log_tag_names()
+        self._update_log_status()
+        if self.plot_canvas is not None:
+            self.plot_frame.config(text=self.trans['waveform'])
+            self.sample_rate_label.config(text=self.trans['sample_rate'])
+            self._shown_analysis = None
+            self._update_analysis()
         # Update port/baud labels
         config_frame = self.main_frame.winfo_children()[2]
         config_frame.winfo_children()[0].config(text=self.trans['port'])
@@ -552,6 +1276,17 @@ class App(tk.Tk):
         # Update Auto Connect button
         if hasattr(self, 'autoconnect_btn'):
             self.autoconnect_btn.config(text=self.trans.get('autoconnect', 'Auto Connect'))
+        self.codec_label.config(text=self.trans['codec'])
+        self.replay_speed_label.config(text=self.trans['replay_speed'])
+        self._update_replay_button()
+        self.live_check.config(text=self.trans['live_drag'])
+        for key, label in self.sweep_labels.items():
+            label.config(text=self.trans[key])
+        self._update_sweep_button()
+        if self.upload_table_btn is not None:
+            for key, label in self.lut_labels.items():
+                label.config(text=self.trans[key])
+            self.upload_table_btn.config(text=self.trans['upload_table'])
 
     def _set_connection_state(self, connected):
         state = 'normal' if connected else 'disabled'
@@ -560,32 +1295,154 @@ class App(tk.Tk):
         self.freq_scale.config(state=state)
         self.freq_entry.config(state=state)
         self.send_btn.config(state=state)
+        self.live_check.config(state=state)
+        self.sweep_btn.config(state=state)
+        if not connected:
+            self.stop_sweep()
+        if self.upload_table_btn is not None:
+            self.upload_table_btn.config(state=state)
         self.input_entry.config(state=state)
         self.send_serial_btn.config(state=state)
+        self._update_replay_button()
         self.status_label.config(
             text=self.trans['status_connected'] if connected else self.trans['status_disconnected'],
             foreground=self.theme["success"] if connected else self.theme["error"]
         )
 
     # --- Core Functionality ---
-    def connect_serial(self):
+    def connect_serial(self, quiet=False):
         port, baud = self.port_var.get(), self.baud_var.get()
         if not port or not baud:
             messagebox.showerror(self.trans['connection_error'], self.trans['error_select_port_baud'])
             return
-            
-        if self.serial_ctrl.connect(port, int(baud)):
-            self._log_to_monitor(self.trans['connected_msg'].format(port=port, baud=baud), 'system')
-            self._set_connection_state(True)
-            # Reset metrics
-            self.received_count = 0
-            self.sent_count = 0
-            self._update_metrics()
+        if self._prober is not None:
+            # A probe must not reopen the live port at other baud rates; _on_probe_done sees the connection
+            self._prober.cancel()
+
+        try:
+            self.serial_ctrl.connect(port, int(baud))
+        except ControllerError as e:
+            if quiet:
+                print(e)
+            else:
+                messagebox.showerror(self.trans['connection_error'], str(e))
+            return False
+        self._log_to_monitor(self.trans['connected_msg'].format(port=port, baud=baud), 'system')
+        self._set_connection_state(True)
+        self._remember_profile(port, baud)
+        self.coalescer.forget()  # The board may have been reset or set by someone else meanwhile
+        # Reset metrics
+        self.received_count = 0
+        self.sent_count = 0
+        self._wake_monitor()
+        self._update_metrics()
+        return True
+
+    def _remember_profile(self, port, baud):
+        info = self._find_port(port=port)
+        self._connected_device = (device_key(info) if info else None, port, int(baud))
+        if info is not None:
+            self.profiles.remember(info, baud)
+
+    @staticmethod
+    def _find_port(key=None, port=None, port_infos=None):
+        """Port info matching a device key (preferred) or a device name, or None."""
+        if port_infos is None:
+            port_infos = serial.tools.list_ports.comports()
+        for info in port_infos:
+            if key is not None and device_key(info) == key:
+                return info
+        if key is None:
+            for info in port_infos:
+                if info.device == port:
+                    return info
+        return None
+
+    def _log_time_to_connect(self, method):
+        if self._autoconnect_started is None:
+            return
+        elapsed = (time.perf_counter() - self._autoconnect_started) * 1000
+        self._autoconnect_started = None
+        print(f"Time to connected: {elapsed:.0f} ms ({method})")
+        self._log_to_monitor(self.trans['time_to_connect'].format(ms=elapsed, method=method), 'system')
 
     def disconnect_serial(self):
         self.serial_ctrl.disconnect()
         self._log_to_monitor(self.trans['disconnected_msg'], 'system')
         self._set_connection_state(False)
+        # A user disconnect cancels any pending automatic reconnect
+        self._connected_device = None
+        self._cancel_reconnect()
+
+    def _on_link_lost(self, error):
+        """The I/O threads already closed the port; update the UI and try to get it back."""
+        self._log_to_monitor(self.trans['link_lost'].format(error=error), 'error')
+        self._set_connection_state(False)
+        if self._connected_device is not None:
+            self._reconnect_target = self._connected_device
+            self._connected_device = None
+            self._schedule_reconnect()
+
+    def _on_ports_changed(self, added, removed, port_infos):
+        self._apply_port_list([info.device for info in port_infos])
+        for info in removed:
+            self._log_to_monitor(self.trans['port_removed'].format(port=info.device), 'warning')
+        for info in added:
+            self._log_to_monitor(self.trans['port_added'].format(port=info.device), 'info')
+
+        device = self._connected_device
+        if device is not None and self.serial_ctrl.connected:
+            key, port, _ = device
+            if '://' in port:
+                return  # replay://, emulator://, socket://: not a port the watcher can see come and go
+            if self._find_port(key, port, port_infos) is None:
+                # Our device vanished before the reader noticed; tear down now
+                self.serial_ctrl.disconnect()
+                self._on_link_lost(self.trans['port_removed'].format(port=port).strip())
+        elif self._reconnect_target is not None:
+            key, port, _ = self._reconnect_target
+            if '://' not in port and self._find_port(key, port, added) is not None:
+                self._reconnect_attempts = 0
+                self._schedule_reconnect()
+
+    def _schedule_reconnect(self):
+        if self._reconnect_job is not None or self._reconnect_target is None:
+            return
+        first, longest = self.reconnect_backoff
+        delay = min(first * 2 ** self._reconnect_attempts, longest)
+        self._reconnect_job = self.after(int(delay * 1000), self._try_reconnect)
+
+    def _cancel_reconnect(self):
+        if self._reconnect_job is not None:
+            self.after_cancel(self._reconnect_job)
+        self._reconnect_job = None
+        self._reconnect_target = None
+        self._reconnect_attempts = 0
+
+    def _try_reconnect(self):
+        self._reconnect_job = None
+        target = self._reconnect_target
+        if target is None or self.serial_ctrl.connected:
+            return
+        key, port, baud = target
+        info = self._find_port(key, port)
+        if info is None:
+            return  # Wait for the port watcher to report the device back
+        self._reconnect_attempts += 1
+        self._log_to_monitor(self.trans['reconnecting'].format(port=info.device, attempt=self._reconnect_attempts),
+                             'system')
+        self.port_var.set(info.device)
+        self.baud_var.set(str(baud))
+        if self.connect_serial(quiet=True):
+            self.reconnect_count += 1
+            self.reconnects.inc()
+            self._reconnect_target = None
+            self._reconnect_attempts = 0
+        elif self._reconnect_attempts >= self.max_reconnect_attempts:
+            self._log_to_monitor(self.trans['reconnect_failed'].format(port=info.device), 'error')
+            self._cancel_reconnect()
+        else:
+            self._schedule_reconnect()
 
     def send_command(self):
         amp, freq = self.amp_var.get(), self.freq_var.get()
@@ -599,21 +1456,86 @@ class App(tk.Tk):
             return
             
         if self.serial_ctrl.send_amp_freq(amp, freq):
+            self.coalescer.forget((amp, freq))
             self._log_to_monitor(self.trans['transmitted'].format(amp=amp, freq=freq), 'sent')
             self.sent_count += 1
+            self._wake_monitor()  # Pick up the reply promptly
             self._update_metrics()
             # Visual feedback
             self.send_btn.config(text=self.trans['transmit_success'])
             self.after(1000, lambda: self.send_btn.config(text=self.trans['transmit']))
 
+    def upload_duty_table(self):
+        """Generate the duty table for the current amplitude and stream it to the board."""
+        try:
+            amp = self.amp_var.get()
+            length, bits = int(self.lut_length_var.get()), int(self.lut_bits_var.get())
+            dead = int(self.lut_dead_var.get())
+            table = stm32_dsp.duty_table(amp, length, bits, dead)
+        except (ValueError, tk.TclError) as e:
+            messagebox.showerror(self.trans['transmission_error'], self.trans['error_table'].format(error=e))
+            return
+        if self.serial_ctrl.upload_table(table, bits):
+            self.coalescer.forget()  # The table sets the amplitude
+            self._log_to_monitor(self.trans['table_uploaded'].format(
+                length=length, bits=bits, amp=amp, dead=dead, size=table.nbytes), 'sent')
+            self.sent_count += 1
+            self._wake_monitor()
+
+    def toggle_sweep(self):
+        if self.sweep is not None and self.sweep.is_running():
+            self.stop_sweep()
+            return
+        amp = self.amp_var.get()
+        try:
+            mode = self.sweep_mode_var.get()
+            start, stop = int(self.sweep_start_var.get()), int(self.sweep_stop_var.get())
+            count, dwell = int(self.sweep_steps_var.get()), float(self.sweep_dwell_var.get())
+            step_size = int(self.sweep_step_var.get())
+            amp_end = self.sweep_amp_end_var.get().strip()
+            if dwell < 1:
+                raise ValueError('dwell must be at least 1 ms')
+            steps = sweep_steps(mode, start, stop, count, step_size=step_size,
+                                amplitude=amp, amplitude_end=int(amp_end) if amp_end else None)
+        except (ValueError, tk.TclError) as e:
+            messagebox.showerror(self.trans['transmission_error'], self.trans['error_sweep'].format(error=e))
+            return
+        self.sweep = SweepRunner(self._send_sweep_step, steps, dwell / 1000,
+                                 on_done=lambda runner: self._ui_events.put(('sweep_done', (runner,)))).start()
+        self._log_to_monitor(self.trans['sweep_started'].format(
+            mode=mode, start=start, stop=stop, steps=len(steps), dwell=dwell), 'system')
+        self._update_sweep_button()
+        self._wake_monitor()
+
+    def stop_sweep(self):
+        if self.sweep is not None:
+            self.sweep.stop()
+
+    def _on_sweep_done(self, runner):
+        sent, total = runner.progress
+        self.sent_count += sum(1 for record in runner.records if record[5])
+        self._log_to_monitor(self.trans['sweep_done'].format(sent=sent, steps=total, **runner.jitter()), 'system')
+        if runner is self.sweep:
+            self.sweep = None
+        self._update_sweep_button()
+
+    def _update_sweep_button(self):
+        if self.sweep is not None and self.sweep.is_running():
+            index, steps = self.sweep.progress
+            self.sweep_btn.config(text=self.trans['sweep_stop'].format(index=index, steps=steps))
+        else:
+            self.sweep_btn.config(text=self.trans['sweep_start'])
+
     def send_serial(self):
         self.input_entry.update_idletasks()  # Ensure latest value is read
         data = self.input_var.get().strip()
         if data:
             padded = data.rjust(9, '0')[-9:]  # Always 8 chars, pad left with zeros, trim if too long
             if self.serial_ctrl.send(padded + '\n'):
+                self.coalescer.forget()  # Raw input may be any command
                 self._log_to_monitor(self.trans['sent'].format(data=padded), 'sent')
                 self.sent_count += 1
+                self._wake_monitor()
                 self._update_metrics()
                 self.input_var.set('')
                 # Visual feedback
@@ -622,72 +1544,433 @@ class App(tk.Tk):
 
     def _update_serial_monitor(self):
         """Check for new serial data and update the monitor"""
+        try:
+            self._monitor_tick()
+        finally:
+            # Re-arm even if the tick raised, or the monitor would stop for good
+            self._monitor_job = self.after(self.update_interval, self._update_serial_monitor)
+
+    def _monitor_tick(self):
+        """One monitor tick: drain the reader, render, and pick the next refresh interval."""
         current_time = time.time()
+        tick_start = time.perf_counter()
+        tracing = TRACER.enabled
         
+        # Handle results from background workers
+        events = self._process_ui_events()
+        if tracing:
+            mark = TRACER.lap('gui.ui_events', tick_start, events=events)
+
         # Process all available serial data
         data_lines = self.serial_ctrl.get_data()
+        if tracing:
+            mark = TRACER.lap('gui.drain', mark, lines=len(data_lines))
         if data_lines:
-            for line in data_lines:
-                self._log_to_monitor(self.trans['received'].format(line=line), 'received')
-                self.received_count += 1
+            received = self.trans['received']
+            records = [(received.format(line=line), 'received') for _, line in data_lines]
+            if tracing:
+                mark = TRACER.lap('gui.format', mark)
+            self._render_to_monitor(records)
+            self.received_count += len(data_lines)
+            rendered = time.perf_counter()
+            if tracing:
+                TRACER.complete('gui.render', mark, rendered)
+            self.latency_stats.extend([(rendered - arrived) * 1000 for arrived, _ in data_lines])
+
+            if self.sample_ring is not None:
+                if tracing:
+                    mark = time.perf_counter()
+                samples = stm32_dsp.parse_samples([line for _, line in data_lines])
+                if len(samples):
+                    self.sample_ring.extend(samples)
+                    self._redraw_plot()
+                if tracing:
+                    TRACER.lap('gui.plot', mark, samples=len(samples))
             
             # Update metrics immediately when we receive data
+            if tracing:
+                mark = time.perf_counter()
             self._update_metrics()
+            if tracing:
+                TRACER.lap('gui.metrics', mark)
             self.last_update = current_time
         else:
             # Only update metrics periodically if no new data
             if current_time - self.last_update > 0.5:  # Update every 500ms if no data
                 self._update_metrics()
         
-        # Schedule next update
-        self.after(self.update_interval, self._update_serial_monitor)
+        if self.analyzer is not None:
+            self._update_analysis()
+        if self.log_filter is not None and not data_lines:
+            self._refresh_log()  # Finish building the filter, slide its time window
+
+        # Schedule next update based on how busy this tick was
+        if tracing:
+            TRACER.lap('gui.tick', tick_start, lines=len(data_lines))
+        render_ms = (time.perf_counter() - tick_start) * 1000
+        busy = bool(data_lines or events) or self._prober is not None
+        self.update_interval = self.scheduler.update(busy, render_ms)
+        self.render_time.observe(render_ms / 1000)
+        self.tick_interval.set(self.update_interval / 1000)
+
+    def _wake_monitor(self):
+        """Reset the refresh interval and run the next monitor tick soon."""
+        self.scheduler.reset()
+        self.update_interval = self.scheduler.interval_ms
+        self.after_cancel(self._monitor_job)
+        self._monitor_job = self.after(self.update_interval, self._update_serial_monitor)
+
+    def _redraw_plot(self):
+        """Redraw the waveform as one min/max envelope polyline sized to the canvas."""
+        width, height = self.plot_canvas.winfo_width(), self.plot_canvas.winfo_height()
+        coords = stm32_dsp.envelope_coords(self.sample_ring.latest(self.plot_window), width, height)
+        if coords:
+            self.plot_canvas.coords(self.plot_line, coords)
+
+    def _update_analysis(self):
+        """Show the analyzer's newest result; it is computed off the Tk thread."""
+        result = self.analyzer.latest
+        if result is self._shown_analysis:
+            return
+        self._shown_analysis = result
+        if result is None:
+            self.analysis_label.config(text=self.trans['analysis_waiting'])
+            return
+        freq_err = '—' if result.frequency_error_pct is None else f'{result.frequency_error_pct:+.2f} %'
+        amp_err = '—' if result.amplitude_error_pct is None else f'{result.amplitude_error_pct:+.1f}'
+        self.analysis_label.config(text=self.trans['analysis'].format(
+            freq=result.frequency, freq_err=freq_err, amp=result.amplitude_pct, amp_err=amp_err,
+            thd=result.thd_pct, snr=result.snr_db))
+
+    def _on_sample_rate_change(self, *args):
+        try:
+            rate = float(self.sample_rate_var.get())
+        except ValueError:
+            return
+        if rate > 0:
+            self.analyzer.sample_rate = rate
 
     def _update_metrics(self):
         """Update performance metrics display"""
         self.rx_label.config(text=self.trans['rx'].format(count=self.received_count))
         self.tx_label.config(text=self.trans['tx'].format(count=self.sent_count))
-        self.latency_label.config(text=self.trans['latency'].format(ms=self.update_interval))
+        self.dropped_label.config(text=self.trans['dropped'].format(count=self.serial_ctrl.dropped_lines))
+        self.latency_label.config(text=self.trans['latency'].format(**self.latency_stats.percentiles()))
+        self.rtt_label.config(text=self.trans['rtt'].format(**self.serial_ctrl.rtt_stats.percentiles()))
+        self._update_codec_stats()
+        self.live_label.config(text=self.trans['live_stats'].format(**self.coalescer.stats()))
+        self.wire_label.config(text=self.trans['wire_latency'].format(ms=self.serial_ctrl.tx_latency_ms))
+        self.tick_label.config(text=self.trans['tick'].format(interval=self.update_interval,
+                                                              render=self.scheduler.last_render_ms))
+        if self.sweep is not None:
+            self._update_sweep_button()
+        if self.serial_ctrl.recorder is not None:
+            self._update_record_status()
+        if TRACER.enabled:
+            self._update_trace_button()
+        self._update_replay_button()
+        self._update_log_status()
+
+    def _update_codec_stats(self):
+        stats = self.serial_ctrl.codec.stats.snapshot()
+        self.codec_stats_label.config(text=self.trans['codec_stats'].format(
+            codec=self.serial_ctrl.codec.name,
+            rx=stats['rx_bytes_per_s'] / 1000,
+            tx=stats['tx_bytes_per_s'] / 1000,
+            errors=stats['errors']))
+
+    def change_codec(self, event=None):
+        self.serial_ctrl.set_codec(CODECS[self.codec_var.get()]())
+        self._update_codec_stats()
 
     def _log_to_monitor(self, message, tag='info'):
         """Helper to log messages to the serial monitor text area."""
-        self.uart_text.config(state='normal')
-        self.uart_text.insert('end', message, tag)
-        self.uart_text.see('end')
-        self.uart_text.config(state='disabled')
+        self._render_to_monitor([(message, tag)])
+
+    def _render_to_monitor(self, records):
+        """Append (message, tag) records to the log store, then redraw the rows on screen."""
+        if not records:
+            return
+        tracing = TRACER.enabled
+        if tracing:
+            mark = time.perf_counter()
+        self.log_store.extend(records)
+        if tracing:
+            mark = TRACER.lap('log.extend', mark, records=len(records))
+        self._refresh_log()
+        if tracing:
+            TRACER.lap('tk.refresh', mark)
+
+    def _refresh_log(self):
+        if self.log_filter is not None:
+            self.log_filter.update(limit=self.log_filter_batch)
+        self.log_view.refresh()
+
+    # --- Log Search ---
+    def _set_log_tag_names(self):
+        """(Re)label the tag filter in the current language, keeping the selection."""
+        selected = max(self.log_tag_menu.current(), 0)
+        self.log_tag_menu.config(values=[self.trans['log_tag_all']]
+                                 + [self.trans[f'log_tag_{tag}'] for tag in LOG_TAGS])
+        self.log_tag_menu.current(selected)
+
+    def _on_log_query(self, *args):
+        """Search or filter once typing pauses."""
+        if self._log_query_job is not None:
+            self.after_cancel(self._log_query_job)
+        self._log_query_job = self.after(150, self._apply_log_query)
+
+    def _apply_log_query(self):
+        self._log_query_job = None
+        text = self.log_search_var.get()
+        try:
+            pattern = compile_pattern(text, regex=self.log_regex_var.get(),
+                                      ignore_case=not self.log_case_var.get()) if text else None
+        except re.error as e:
+            self.log_pattern, self.log_query_error = None, e
+            self._update_log_status()
+            return
+        self.log_pattern, self.log_query_error = pattern, None
+        only = self.log_only_var.get() and pattern is not None
+        tags, window = self._log_scope()
+        if only or tags is not None or window is not None:
+            self.log_filter = LogFilter(self.log_store, pattern if only else None, tags, window)
+            self.log_view.index = self.log_filter.index
+        else:
+            self.log_filter = None
+            self.log_view.index = None
+        if pattern is None:
+            self.log_view.highlight = None
+        self._refresh_log()
+        self._update_log_status()
+        if pattern is not None and not only:
+            self.find_in_log(incremental=True)
+
+    def _log_scope(self):
+        """(tags, window in seconds) chosen in the filter menus; None for all."""
+        selected = self.log_tag_menu.current()
+        tags = [LOG_TAGS[selected - 1]] if selected > 0 else None
+        return tags, dict(LOG_WINDOWS).get(self.log_window_var.get())
+
+    def find_in_log(self, backward=False, incremental=False):
+        """Jump to the next (or previous) line matching the search box, within the tag and time filters.
+
+        An incremental search, run while typing, also accepts the line
+        already highlighted or, without one, the first line on screen.
+        """
+        pattern, view, store = self.log_pattern, self.log_view, self.log_store
+        if pattern is None:
+            return
+        tags, window = self._log_scope()
+        since = None if window is None else time.time() - window
+        current = view.highlight
+        if current is None:
+            current = view.line_at(view.top) if len(view) else store.end
+        elif not (incremental or backward):
+            current += 1
+        number = store.search(pattern, current, backward, tags, since)
+        if number is None:  # Wrap around
+            number = store.search(pattern, store.end if backward else store.first, backward, tags, since)
+        if number is None:
+            view.highlight = None
+            view.refresh()
+            self.log_status_label.config(text=self.trans['log_no_match'])
+            return
+        view.show(number)
+        self.log_status_label.config(text=self.trans['log_match'].format(line=number - store.first + 1))
+
+    def _update_log_status(self):
+        """Show a regex error, the filter's progress or the line counts; find_in_log() reports matches."""
+        log_filter = self.log_filter
+        if self.log_query_error is not None:
+            text = self.trans['log_bad_regex'].format(error=self.log_query_error)
+        elif log_filter is not None and log_filter.pending:
+            tested = len(self.log_store) - log_filter.pending
+            text = self.trans['log_filtering'].format(percent=tested / len(self.log_store) * 100)
+        elif self.log_pattern is not None and (log_filter is None or log_filter.pattern is None):
+            return
+        else:
+            text = self.trans['log_lines'].format(shown=len(self.log_view), total=len(self.log_store))
+        self.log_status_label.config(text=text)
 
     def clear_terminal(self):
         """Clear the terminal output."""
-        self.uart_text.config(state='normal')
-        self.uart_text.delete(1.0, 'end')
-        self.uart_text.config(state='disabled')
+        self.log_store.clear()
+        self.log_view.highlight = None
         self._log_to_monitor(self.trans['terminal_cleared_msg'], 'system')
         
         # Visual feedback
         self.clear_btn.config(text=self.trans['terminal_cleared'])
         self.after(1000, lambda: self.clear_btn.config(text=self.trans['clear_terminal']))
 
+    def toggle_recording(self):
+        """Start or stop teeing the raw serial traffic to capture files."""
+        if self._stopping_recorder is not None:
+            return  # Still saving the previous recording
+        recorder = self.serial_ctrl.recorder
+        if recorder is not None:
+            self.serial_ctrl.recorder = None
+            self._stopping_recorder = recorder
+            # Writing out what is still queued can take seconds under load: not on the Tk thread
+            threading.Thread(target=self._stop_recorder, args=(recorder,), daemon=True).start()
+        else:
+            try:
+                recorder = CaptureRecorder(compression=self.capture_compression).start()
+            except (OSError, ValueError) as e:
+                messagebox.showerror(self.trans['capture_error'], self.trans['error_record'].format(error=e))
+                return
+            self.serial_ctrl.recorder = recorder
+            self._log_to_monitor(self.trans['record_started'].format(path=recorder.path), 'system')
+        self._update_record_status()
+
+    def toggle_trace(self):
+        """Start tracing the read and render paths, or stop and save the spans as Chrome trace JSON."""
+        if not TRACER.enabled:
+            TRACER.start()
+            self._log_to_monitor(self.trans['trace_started'], 'system')
+            self._update_trace_button()
+            return
+        TRACER.stop()
+        self._update_trace_button()
+        path = filedialog.asksaveasfilename(
+            defaultextension='.json', initialfile='stm32_trace.json',
+            filetypes=[('Chrome trace', '*.json'), ('All files', '*.*')],
+        )
+        if not path:
+            return
+        try:
+            spans = TRACER.export(path)
+        except OSError as e:
+            messagebox.showerror(self.trans['trace_error'], self.trans['error_trace'].format(error=e))
+            return
+        self._log_to_monitor(self.trans['trace_saved'].format(spans=spans, path=path), 'system')
+
+    def _update_trace_button(self):
+        if TRACER.enabled:
+            self.trace_btn.config(text=self.trans['trace_stop'].format(spans=len(TRACER)))
+        else:
+            self.trace_btn.config(text=self.trans['trace'])
+
+    def toggle_replay(self):
+        """Play a capture file back as if it came from the board, or stop the replay."""
+        if isinstance(self.serial_ctrl.ser, ReplayPort):
+            self.disconnect_serial()
+            return
+        path = filedialog.askopenfilename(
+            initialdir=CaptureRecorder.DEFAULT_DIR,
+            filetypes=[('Captures', '*.cap *.cap.gz *.cap.zst'), ('All files', '*.*')],
+        )
+        if not path:
+            return
+        if self.serial_ctrl.connected:
+            self.disconnect_serial()
+        import urllib.parse
+        # ReplayPort.from_url() unquotes the path, so '#', '?' and '%' in file names survive
+        self.port_var.set(f'{ReplayPort.SCHEME}{urllib.parse.quote(path)}?speed={self.replay_speed_var.get()}')
+        if self.connect_serial():
+            self.serial_ctrl.ser.notify_end(lambda: self._ui_events.put(('replay_done', ())))
+
+    def _on_replay_done(self):
+        port = self.serial_ctrl.ser
+        if isinstance(port, ReplayPort):
+            stats = port.stats()
+            self._log_to_monitor(self.trans['replay_done'].format(mb=stats['bytes'] / 1e6, **stats), 'system')
+
+    def _update_replay_button(self):
+        port = self.serial_ctrl.ser
+        if isinstance(port, ReplayPort):
+            self.replay_btn.config(text=self.trans['replay_stop'].format(
+                position=port.position, duration=port.reader.duration))
+        else:
+            self.replay_btn.config(text=self.trans['replay'])
+
+    def _stop_recorder(self, recorder):
+        recorder.stop()
+        self._ui_events.put(('record_stopped', (recorder,)))
+
+    def _on_record_stopped(self, recorder):
+        self._stopping_recorder = None
+        stats = recorder.stats()
+        self._log_to_monitor(self.trans['record_stopped'].format(
+            records=stats['records'], mb=stats['bytes'] / 1e6, files=stats['files'],
+            dropped=stats['dropped']), 'system')
+        if self._closing:
+            self.after_idle(self.destroy)  # After the monitor tick that is handling this event
+            return
+        self._update_record_status()
+
+    def _update_record_status(self):
+        recorder = self.serial_ctrl.recorder
+        if self._stopping_recorder is not None:
+            self.record_btn.config(text=self.trans['record_saving'])
+            return
+        if recorder is None:
+            self.record_btn.config(text=self.trans['record'])
+            self.record_label.config(text='')
+            return
+        stats = recorder.stats()
+        self.record_btn.config(text=self.trans['record_stop'])
+        self.record_label.config(text=self.trans['record_stats'].format(
+            mb=stats['bytes'] / 1e6, dropped=stats['dropped']))
+
+    def show_boards(self):
+        """Open (or bring back) the window driving several boards at once."""
+        if self.device_manager is None:
+            self.device_manager = DeviceManager()
+            self.device_manager.on_link_lost = lambda name, error: self._ui_events.put(
+                ('board_link_lost', (name, str(error))))
+            self.device_manager.on_error = lambda name, message: self._ui_events.put(
+                ('controller_error', (f'{name}: {message}',)))
+        if self.device_window is None:
+            self.device_window = DeviceWindow(self, self.device_manager)
+        else:
+            self.device_window.deiconify()
+            self.device_window.lift()
+
     def toggle_mode(self):
         """Toggle between dark and light themes."""
         self.is_dark = not self.is_dark
         self.theme = DARK_THEME if self.is_dark else LIGHT_THEME
         self._setup_styles()
         self._apply_theme()
+        if self.device_window is not None:
+            self.device_window.apply_theme()
         self.mode_btn.config(text=self.trans['theme_toggle'])
 
     def refresh_ports(self):
         """Refresh the list of available serial ports"""
-        ports = [port.device for port in serial.tools.list_ports.comports()]
+        self._apply_port_list([port.device for port in serial.tools.list_ports.comports()])
+        self._log_to_monitor(self.trans['serial_ports_refreshed'], 'system')
+
+    def _apply_port_list(self, ports):
         current_value = self.port_var.get()
         self.port_menu['values'] = ports
         if ports and current_value not in ports:
             self.port_var.set(ports[0])
         elif not ports:
             self.port_var.set('')
-        self._log_to_monitor(self.trans['serial_ports_refreshed'], 'system')
 
     def on_closing(self):
         """Handle application closing"""
+        if self._prober is not None:
+            self._prober.cancel()
+        self.port_watcher.stop()
+        if self.analyzer is not None:
+            self.analyzer.stop()
+        self.coalescer.stop()
+        self.stop_sweep()
         self.serial_ctrl.disconnect()
+        if self.serial_ctrl.recorder is not None:
+            self.toggle_recording()
+        if self.device_window is not None:
+            self.device_window.close()
+        if self.device_manager is not None:
+            self.device_manager.close()
+        if self._stopping_recorder is not None:
+            # Hide now, destroy once the capture is complete on disk (see _on_record_stopped)
+            self._closing = True
+            self.withdraw()
+            return
         self.destroy()
 
     def _apply_theme(self):
@@ -707,43 +1990,181 @@ class App(tk.Tk):
             self.uart_text.tag_config('error', foreground=self.theme["error"])
             self.uart_text.tag_config('warning', foreground=self.theme["warning"])
             self.uart_text.tag_config('system', foreground=self.theme["accent"])
+            self.uart_text.tag_config('match', background=self.theme["highlight"])
+        if getattr(self, 'plot_canvas', None) is not None:
+            self.plot_canvas.configure(bg=self.theme["text_area_bg"])
+            self.plot_canvas.itemconfig(self.plot_line, fill=self.theme["success"])
 
     def _safe_set_amp(self, v):
         try:
             self.amp_var.set(int(float(v)))
         except (ValueError, TypeError):
-            pass
+            return
+        self._submit_live(amplitude=self.amp_var.get())
 
     def _safe_set_freq(self, v):
         try:
             self.freq_var.set(int(float(v)))
         except (ValueError, TypeError):
-            pass
+            return
+        self._submit_live(frequency=self.freq_var.get())
+
+    def _submit_live(self, amplitude=None, frequency=None):
+        """Queue a slider value for live sending; the coalescer keeps only the newest."""
+        if not (self.live_var.get() and self.serial_ctrl.connected):
+            return
+        if not self.coalescer.synced:
+            # The board's values are unknown, so the next command needs both parameters
+            amplitude, frequency = self.amp_var.get(), self.freq_var.get()
+        self.coalescer.submit(amplitude, frequency)
+
+    def _send_from_worker(self, amplitude, frequency):
+        """Called on the coalescer/sweep threads; skip quietly if the link went away meanwhile."""
+        if not self.serial_ctrl.connected:
+            return False
+        return self.serial_ctrl.send_amp_freq(amplitude, frequency)
+
+    def _send_sweep_step(self, amplitude, frequency):
+        """SweepRunner callback: send, then tell the coalescer what the board is set to."""
+        if not self._send_from_worker(amplitude, frequency):
+            return False
+        self.coalescer.forget((amplitude, frequency))
+        return True
+
+    def _send_live(self, amplitude, frequency):
+        """Coalescer callback: send, then have the GUI log the command like an explicit send."""
+        if not self._send_from_worker(amplitude, frequency):
+            return False
+        self._ui_events.put(('live_sent', (amplitude, frequency)))
+        return True
+
+    def _on_live_sent(self, amplitude, frequency):
+        self._log_to_monitor(self.trans['transmitted'].format(amp=amplitude, freq=frequency), 'sent')
+        self.sent_count += 1
 
     def autoconnect_serial(self):
-        ports = [port.device for port in serial.tools.list_ports.comports()]
-        baudrates = ["9600", "19200", "38400", "57600", "115200", "230400", "500000", "1000000", "2000000"]
-             
-        for port in ports:
-            print(f"Trying port: {port}")
-            # reversed(baudrates)
-           for baud in baudrates:
-               try:
-                   if self.serial_ctrl.connect(port, int(baud)):
-                       self.port_var.set(port)
-                       self.baud_var.set(baud)
-                       self._log_to_monitor(self.trans['connected_msg'].format(port=port, baud=baud), 'system')
-                       self._set_connection_state(True)
-                       self.received_count = 0
-                       self.sent_count = 0
-                       self._update_metrics()
-                       return True
-               except Exception:
-                   continue
-        self._log_to_monitor('No available COM port/baudrate for autoconnect\n', 'error')
-        return False
+        """Probe all ports in the background; the first one with valid traffic is connected."""
+        if self._prober is not None or self.serial_ctrl.connected:
+            return False
+        self._autoconnect_started = time.perf_counter()
+        port_infos = serial.tools.list_ports.comports()
+
+        # A device we have talked to before goes straight to its last port/baud
+        cached = self.profiles.lookup(port_infos)
+        if cached is not None:
+            port, baud = cached
+            self._log_to_monitor(self.trans['profile_hit'].format(port=port, baud=baud), 'system')
+            self.port_var.set(port)
+            self.baud_var.set(str(baud))
+            # A stale profile (board moved to another port) just falls through to probing
+            if self.connect_serial(quiet=True):
+                self._log_time_to_connect('cached profile')
+                return True
+            for info in port_infos:
+                if info.device == port:
+                    self.profiles.forget(info)
+
+        ports = [info.device for info in port_infos]
+        if not ports:
+            self._autoconnect_started = None
+            self._log_to_monitor(self.trans['probe_none'], 'error')
+            return False
+        # Try the currently selected baud rate first
+        selected = int(self.baud_var.get() or 115200)
+        baudrates = [selected] + [baud for baud in BAUDRATES if baud != selected]
+        self._prober = PortProber(
+            ports,
+            baudrates,
+            on_result=lambda port, baud, status: self._ui_events.put(('probe_result', (port, baud, status))),
+            on_done=lambda winner, silent: self._ui_events.put(('probe_done', (winner, silent))),
+        ).start()
+        self.autoconnect_btn.config(state='disabled')
+        self._log_to_monitor(self.trans['probe_started'].format(count=len(ports)), 'system')
+        self._wake_monitor()
+        return True
+
+    def _process_ui_events(self):
+        """Run handlers for events queued by worker threads; returns how many were handled."""
+        handled = 0
+        while True:
+            try:
+                kind, payload = self._ui_events.get_nowait()
+            except queue.Empty:
+                return handled
+            handled += 1
+            if kind == 'probe_result':
+                self._on_probe_result(*payload)
+            elif kind == 'probe_done':
+                self._on_probe_done(*payload)
+            elif kind == 'ports_changed':
+                self._on_ports_changed(*payload)
+            elif kind == 'link_lost':
+                self._on_link_lost(*payload)
+            elif kind == 'live_sent':
+                self._on_live_sent(*payload)
+            elif kind == 'sweep_done':
+                self._on_sweep_done(*payload)
+            elif kind == 'replay_done':
+                self._on_replay_done(*payload)
+            elif kind == 'record_stopped':
+                self._on_record_stopped(*payload)
+            elif kind == 'board_link_lost':
+                if self.device_window is not None:
+                    self.device_window.on_link_lost(*payload)
+            elif kind == 'controller_error':
+                messagebox.showerror(self.trans['transmission_error'], *payload)
+
+    def _on_probe_result(self, port, baud, status):
+        if status == PortProber.CONFIRMED:
+            self._log_to_monitor(self.trans['probe_confirmed'].format(port=port, baud=baud), 'info')
+        elif status == PortProber.FAILED:
+            self._log_to_monitor(self.trans['probe_failed'].format(port=port), 'warning')
+
+    def _on_probe_done(self, winner, silent_ports):
+        self._prober = None
+        self.autoconnect_btn.config(state='normal')
+        if self.serial_ctrl.connected:
+            self._autoconnect_started = None
+            return
+        if winner is None and silent_ports:
+            # The firmware may simply be quiet; fall back to the selected baud rate
+            winner = (silent_ports[0], int(self.baud_var.get() or 115200))
+            self._log_to_monitor(self.trans['probe_fallback'].format(port=winner[0], baud=winner[1]), 'warning')
+        if winner is None:
+            self._autoconnect_started = None
+            self._log_to_monitor(self.trans['probe_none'], 'error')
+            return
+        port, baud = winner
+        self.port_var.set(port)
+        self.baud_var.set(str(baud))
+        if self.connect_serial():
+            self._log_time_to_connect('full probe')
+
 
 if __name__ == '__main__':
-    app = App()
+    import argparse
+    parser = argparse.ArgumentParser(description='STM32 real-time serial interface')
+    parser.add_argument('--async', dest='transport', action='store_const', const='async', default='thread',
+                        help='drive the port from an asyncio event loop instead of reader/writer threads')
+    parser.add_argument('--metrics-port', type=int, help='serve Prometheus metrics on localhost at this port')
+    parser.add_argument('--metrics-json', help='append a JSON metrics snapshot to this file periodically')
+    parser.add_argument('--metrics-interval', type=float, default=10.0, help='seconds between JSON snapshots')
+    parser.add_argument('--trace', metavar='PATH', help='trace the read and render paths from startup and '
+                                                        'write them as Chrome trace JSON on exit')
+    args = parser.parse_args()
+    if args.trace:
+        TRACER.start()
+    exporters = []
+    if args.metrics_port is not None:
+        from stm32_metrics import MetricsServer
+        exporters.append(MetricsServer(port=args.metrics_port).start())
+    if args.metrics_json:
+        from stm32_metrics import SnapshotWriter
+        exporters.append(SnapshotWriter(args.metrics_json, interval=args.metrics_interval).start())
+    app = App(transport=args.transport)
     app.protocol("WM_DELETE_WINDOW", app.on_closing)
     app.mainloop()
+    for exporter in exporters:
+        exporter.stop()
+    if args.trace:
+        print(f"Trace: {TRACER.export(args.trace)} spans written to {args.trace}")
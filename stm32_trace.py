@@ -0,0 +1,93 @@
+"""Opt-in span tracing of the read and render paths, exported as Chrome trace JSON.
+
+Instrumented code checks `TRACER.enabled` once per read or tick and only
+then takes timestamps, so tracing costs one attribute test when it is off
+(the default). When on, each span is a tuple appended to a bounded deque;
+the oldest spans are overwritten once `capacity` is reached.
+
+    TRACER.start()
+    ...
+    TRACER.stop()
+    TRACER.export('trace.json')  # Open in chrome://tracing or ui.perfetto.dev
+"""
+import collections
+import os
+import threading
+import time
+
+
+class Tracer:
+    """Bounded in-memory buffer of timed spans, one timeline per thread."""
+    def __init__(self, capacity=200000):
+        self.enabled = False
+        self.capacity = capacity
+        self.recorded = 0  # Spans recorded since start(), including overwritten ones
+        self._spans = collections.deque(maxlen=capacity)
+        self._threads = {}  # thread ident -> name, for the exported timeline labels
+
+    def start(self):
+        """Clear the buffer and start recording."""
+        self._spans = collections.deque(maxlen=self.capacity)
+        self.recorded = 0
+        self.enabled = True
+        return self
+
+    def stop(self):
+        self.enabled = False
+
+    def __len__(self):
+        return len(self._spans)
+
+    def complete(self, name, start, end, **args):
+        """Record a span between two perf_counter() times on the calling thread."""
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        self._spans.append((name, start, end, tid, args))
+        self.recorded += 1
+
+    def lap(self, name, start, **args):
+        """Record a span from `start` to now and return now, the start of the next span."""
+        now = time.perf_counter()
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        self._spans.append((name, start, now, tid, args))
+        self.recorded += 1
+        return now
+
+    def mark(self, name, **args):
+        """Record an instant event, e.g. a dropped batch or a lost link."""
+        now = time.perf_counter()
+        self.complete(name, now, None, **args)
+
+    def to_chrome(self):
+        """The recorded spans as a Chrome trace event dict (timestamps in microseconds)."""
+        pid = os.getpid()
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                  for tid, name in list(self._threads.items())]
+        for name, start, end, tid, args in list(self._spans):
+            event = {'name': name, 'cat': name.split('.')[0], 'pid': pid, 'tid': tid, 'ts': start * 1e6}
+            if end is None:
+                event['ph'] = 'i'
+                event['s'] = 't'
+            else:
+                event['ph'] = 'X'
+                event['dur'] = (end - start) * 1e6
+            if args:
+                event['args'] = args
+            events.append(event)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'recorded': self.recorded, 'kept': len(self._spans)}}
+
+    def export(self, path):
+        """Write the Chrome/Perfetto trace JSON; returns the number of spans written."""
+        import json
+        trace = self.to_chrome()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(trace))
+        return trace['otherData']['kept']
+
+
+# The tracer the pipeline reports to; off until started
+TRACER = Tracer()
@@ -0,0 +1,37 @@
+"""analyze_sine and SineAnalyzer: measurements of clean tones, and tones too close to DC or Nyquist."""
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stm32_dsp import SampleRing, SineAnalyzer, analyze_sine
+
+
+def tone(frequency, length=4096, sample_rate=10000.0, amplitude=1024.0):
+    return amplitude * np.sin(2 * np.pi * frequency * np.arange(length) / sample_rate)
+
+
+def test_clean_tone():
+    result = analyze_sine(tone(100.0), 10000.0, commanded=(50, 100))
+    assert result.frequency == pytest.approx(100.0, abs=0.05)
+    assert result.amplitude_pct == pytest.approx(50.0, abs=0.5)
+    assert result.thd_pct < 0.1
+
+
+@pytest.mark.parametrize('frequency', [4990.0, 4995.0, 4999.0])
+def test_tone_near_nyquist_is_not_analysed(frequency):
+    assert analyze_sine(tone(frequency), 10000.0) is None
+
+
+def test_low_tones_get_a_longer_window():
+    ring = SampleRing()
+    ring.extend(tone(5.0, length=1 << 15))
+    analyzer = SineAnalyzer(ring, 10000.0, commanded=lambda: (50, 5))
+    assert analyze_sine(tone(5.0), 10000.0) is None
+    result = analyzer.analyze_now()
+    assert result.window_length > 4096
+    assert result.frequency == pytest.approx(5.0, abs=0.05)
@@ -0,0 +1,75 @@
+"""LineFramer: lines split across reads, multi-byte delimiters and the max_line_length guard."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stm32_serial import LineFramer
+
+
+def test_lines_in_one_chunk():
+    framer = LineFramer()
+    assert framer.feed(b'A050F0100\nS:1,2\n') == [b'A050F0100', b'S:1,2']
+    assert framer.pending == 0
+
+
+def test_line_split_across_chunks():
+    framer = LineFramer()
+    assert framer.feed(b'S:1,') == []
+    assert framer.feed(b'2\nS:3') == [b'S:1,2']
+    assert framer.pending == 3
+    assert framer.feed(b'\n') == [b'S:3']
+
+
+def test_delimiter_split_across_chunks():
+    framer = LineFramer(b'\r\n')
+    assert framer.feed(b'OK\r') == []
+    assert framer.feed(b'\nS:1\r') == [b'OK']
+    assert framer.feed(b'\n') == [b'S:1']
+    assert framer.pending == 0
+
+
+def test_max_line_length_cuts_unterminated_lines():
+    framer = LineFramer(max_line_length=4)
+    assert framer.feed(b'abcdefghij') == [b'abcd', b'efgh']
+    assert framer.overflows == 2
+    assert framer.feed(b'\n') == [b'ij']
+    assert framer.overflows == 2
+
+
+@pytest.mark.parametrize('delimiter', [b'\n', b'\r\n'])
+def test_cuts_do_not_depend_on_chunking(delimiter):
+    stream = delimiter.join([b'abcdefgh', b'ab', b'', b'abcd', b'abcdefghij', b'a\rbcde']) + delimiter
+    expected = LineFramer(delimiter, max_line_length=4)
+    whole = expected.feed(stream)
+    assert b'abcd' in whole and b'efgh' in whole and b'ij' in whole
+    for size in range(1, len(stream) + 1):
+        framer = LineFramer(delimiter, max_line_length=4)
+        lines = []
+        for start in range(0, len(stream), size):
+            lines += framer.feed(stream[start:start + size])
+        assert lines == whole, size
+        assert framer.overflows == expected.overflows
+        assert framer.pending == 0
+
+
+def test_cut_never_leaves_an_empty_line():
+    framer = LineFramer(b'\r\n', max_line_length=4)
+    assert framer.feed(b'abcd\r') == []
+    assert framer.feed(b'\n') == [b'abcd']
+    assert framer.overflows == 0
+
+
+def test_flush_returns_the_tail():
+    framer = LineFramer()
+    framer.feed(b'A1\nA2')
+    assert framer.flush() == b'A2'
+    assert framer.pending == 0
+    assert framer.feed(b'\n') == [b'']
+
+
+def test_empty_delimiter_is_rejected():
+    with pytest.raises(ValueError):
+        LineFramer(b'')
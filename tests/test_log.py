@@ -0,0 +1,92 @@
+"""LogStore and LogFilter: forward and backward search, tag filters and line numbering across trims."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stm32_log import LogFilter, LogStore, compile_pattern
+
+
+def make_store(lines=10, max_lines=1000000):
+    store = LogStore(max_lines=max_lines)
+    store.extend([(f'Received: S:{k}', 'received') if k % 3 else (f'Transmitted: A050F{k:04d}', 'sent')
+                  for k in range(lines)], when=100.0)
+    return store
+
+
+def test_forward_search_is_inclusive():
+    store = make_store()
+    pattern = compile_pattern('transmitted')
+    assert store.search(pattern, 0) == 0
+    assert store.search(pattern, 1) == 3
+    assert store.search(pattern, 10) is None
+
+
+def test_backward_search_is_exclusive():
+    store = make_store()
+    pattern = compile_pattern('transmitted')
+    assert store.search(pattern, store.end, backward=True) == 9
+    assert store.search(pattern, 9, backward=True) == 6
+    assert store.search(pattern, 0, backward=True) is None
+
+
+def test_search_case_regex_and_tags():
+    store = make_store()
+    assert store.search(compile_pattern('TRANSMITTED', ignore_case=False), 0) is None
+    assert store.search(compile_pattern(r'S:\d$', regex=True), 0) == 1
+    assert store.search(compile_pattern('s:'), 0, tags=['sent']) is None
+    assert list(store.matches(compile_pattern('S:'), tags=['received'])) == [1, 2, 4, 5, 7, 8]
+
+
+def test_multi_line_messages():
+    store = LogStore()
+    store.extend([('one\ntwo\n', 'info'), ('three', 'sent')])
+    assert store.end == 3
+    assert store.get(range(3)) == [('one', 'info'), ('two', 'info'), ('three', 'sent')]
+
+
+def test_trim_keeps_line_numbers():
+    store = make_store(lines=12, max_lines=10)  # Over max_lines + 10%: back to max_lines
+    assert store.first == 2
+    assert store.trimmed == 2
+    assert len(store) == 10
+    assert store.end == 12
+    assert store.line(2)[0] == 'Received: S:2'
+    with pytest.raises(IndexError):
+        store.line(1)
+    pattern = compile_pattern('transmitted')
+    assert store.search(pattern, 0) == 3
+    assert store.search(pattern, 3, backward=True) is None
+    assert list(store.tag_lines(['sent'])) == [3, 6, 9]
+
+
+def test_clear_carries_numbering_on():
+    store = make_store()
+    store.clear()
+    assert store.first == store.end == 10
+    store.extend([('after', 'info')])
+    assert store.line(10)[0] == 'after'
+
+
+def test_filter_follows_appends_and_trims():
+    store = make_store(max_lines=10)  # 12 lines after the second extend: lines 0 and 1 are trimmed
+    view = LogFilter(store, compile_pattern('transmitted'))
+    assert list(view.update(limit=5)) == [0, 3]
+    assert view.pending == 5
+    assert list(view.update()) == [0, 3, 6, 9]
+    store.extend([('Transmitted: A050F0011', 'sent'), ('Received: S:12', 'received')], when=100.0)
+    assert list(view.update()) == [3, 6, 9, 10]
+
+
+@pytest.mark.parametrize('text', ['.*', 'a*', '^', '$', '()'])
+def test_empty_matches_stay_inside_the_range(text):
+    store = LogStore()
+    store.extend([('abc', 'info'), ('def', 'info')])
+    pattern = compile_pattern(text, regex=True)
+    assert list(store.matches(pattern)) == [0, 1]
+    assert list(store.matches(pattern, 0, 1)) == [0]
+    assert store.search(pattern, store.end, backward=True) == 1
+    assert store.search(pattern, 2) is None
+    assert list(LogFilter(store, pattern).update()) == [0, 1]
@@ -0,0 +1,37 @@
+"""sweep_steps: frequencies and amplitudes of linear, log and stepped sweeps."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stm32_serial import sweep_steps
+
+
+def test_stepped_sweep_ends_on_stop():
+    frequencies = [f for _, f in sweep_steps('stepped', 1, 1000, step_size=10)]
+    assert frequencies[:3] == [1, 11, 21]
+    assert frequencies[-2:] == [991, 1000]
+    assert [f for _, f in sweep_steps('stepped', 1000, 1, step_size=10)][-2:] == [10, 1]
+
+
+def test_stepped_sweep_that_divides_evenly():
+    assert [f for _, f in sweep_steps('stepped', 100, 130, step_size=10)] == [100, 110, 120, 130]
+
+
+def test_linear_and_log_sweeps_hit_both_ends():
+    for mode in ('linear', 'log'):
+        steps = sweep_steps(mode, 10, 1000, steps=5, amplitude=20, amplitude_end=60)
+        assert steps[0] == (20, 10)
+        assert steps[-1] == (60, 1000)
+        assert len(steps) == 5
+
+
+def test_bad_sweeps_are_rejected():
+    with pytest.raises(ValueError):
+        sweep_steps('stepped', 1, 100, step_size=0)
+    with pytest.raises(ValueError):
+        sweep_steps('linear', 0, 100)
+    with pytest.raises(ValueError):
+        sweep_steps('spiral', 1, 100)